@@ -0,0 +1 @@
+# Modèle IA médical : entraînement, génération de données et évaluateur aplati
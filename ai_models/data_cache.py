@@ -0,0 +1,219 @@
+"""
+CACHE BINAIRE DES DONNÉES D'ENTRAÎNEMENT
+Convertit medical_training_data.csv en tableaux NumPy (.npy) chargés par
+memory-map : pas d'analyse du CSV ni de copie au chargement, quel que soit le
+nombre de lignes. Le cache est un dossier à côté du CSV :
+
+    ai_models/medical_training_data.cache/
+        features.npy    (n, 5) float64, colonnes dans l'ordre de FEATURES
+        target.npy      (n,) int64
+        manifest.json   taille, date et sha256 du CSV source, lignes, colonnes
+
+Le cache est reconstruit automatiquement quand le CSV change : la taille et
+la date de modification sont comparées d'abord ; si elles diffèrent, le sha256
+décide (un simple touch ne force pas de conversion).
+
+Le même format sert aux exports de SensorData (commande Django
+train_from_sensor_data) : allocate_cache, write_manifest, open_cache.
+
+Utilisation en ligne de commande (depuis ai_models/ ou la racine du backend):
+    python data_cache.py medical_training_data.csv
+    python data_cache.py medical_training_data.csv --rebuild
+"""
+
+import argparse
+import json
+import os
+import shutil
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+try:
+    from .inference import FEATURES
+    from .registry import _atomic_write_text, file_sha256
+except ImportError:  # Exécution directe depuis ai_models/
+    from inference import FEATURES
+    from registry import _atomic_write_text, file_sha256
+
+TARGET = 'status'
+
+FEATURES_NAME = 'features.npy'
+TARGET_NAME = 'target.npy'
+MANIFEST_NAME = 'manifest.json'
+CACHE_FORMAT = 1
+
+# Lignes du CSV analysées à la fois pendant la conversion
+CONVERT_CHUNK_ROWS = 1_000_000
+
+
+def cache_dir_for(csv_path):
+    return os.path.splitext(os.path.abspath(csv_path))[0] + '.cache'
+
+
+def _source_stat(csv_path):
+    stat = os.stat(csv_path)
+    return {'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns}
+
+
+def read_manifest(cache_dir):
+    try:
+        with open(os.path.join(cache_dir, MANIFEST_NAME)) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def fresh_manifest(csv_path, cache_dir):
+    """
+    Manifeste du cache s'il correspond encore au CSV, sinon None. Si seule la
+    date a changé (contenu identique), le manifeste est mis à jour.
+    """
+    manifest = read_manifest(cache_dir)
+    if manifest is None or manifest.get('format') != CACHE_FORMAT:
+        return None
+    if manifest['features'] != FEATURES or manifest['target'] != TARGET:
+        return None
+
+    stat = _source_stat(csv_path)
+    source = manifest['source']
+    if stat['size'] == source['size'] and stat['mtime_ns'] == source['mtime_ns']:
+        return manifest
+    if stat['size'] != source['size'] or file_sha256(csv_path) != source['sha256']:
+        return None
+
+    source.update(stat)
+    _atomic_write_text(os.path.join(cache_dir, MANIFEST_NAME), json.dumps(manifest, indent=2))
+    return manifest
+
+
+def _write_npy(path, raw_path, dtype, shape):
+    """Écrit un .npy à partir de l'entête et des octets bruts accumulés"""
+    with open(path, 'wb') as output:
+        np.lib.format.write_array_header_1_0(output, {
+            'descr': np.lib.format.dtype_to_descr(np.dtype(dtype)),
+            'fortran_order': False,
+            'shape': shape,
+        })
+        with open(raw_path, 'rb') as raw:
+            shutil.copyfileobj(raw, output)
+
+
+def build_cache(csv_path, cache_dir=None, chunk_rows=CONVERT_CHUNK_ROWS):
+    """
+    Convertit le CSV par paquets de chunk_rows lignes : la mémoire utilisée
+    ne dépend pas de la taille du fichier.
+
+    Returns:
+        manifeste du cache
+    """
+    cache_dir = cache_dir or cache_dir_for(csv_path)
+    os.makedirs(cache_dir, exist_ok=True)
+    start = time.perf_counter()
+    stat = _source_stat(csv_path)
+    sha256 = file_sha256(csv_path)
+
+    staging = tempfile.mkdtemp(prefix='.staging-', dir=cache_dir)
+    try:
+        features_raw = os.path.join(staging, 'features.raw')
+        target_raw = os.path.join(staging, 'target.raw')
+        rows = 0
+        with open(features_raw, 'wb') as features_out, open(target_raw, 'wb') as target_out:
+            for chunk in pd.read_csv(csv_path, usecols=FEATURES + [TARGET], chunksize=chunk_rows,
+                                     float_precision='round_trip'):
+                features_out.write(np.ascontiguousarray(chunk[FEATURES].to_numpy(dtype=np.float64)).tobytes())
+                target_out.write(chunk[TARGET].to_numpy(dtype=np.int64).tobytes())
+                rows += len(chunk)
+
+        _write_npy(os.path.join(staging, FEATURES_NAME), features_raw, np.float64, (rows, len(FEATURES)))
+        _write_npy(os.path.join(staging, TARGET_NAME), target_raw, np.int64, (rows,))
+
+        # Le manifeste est retiré d'abord et réécrit en dernier : un cache à moitié remplacé n'est jamais considéré à jour
+        manifest_path = os.path.join(cache_dir, MANIFEST_NAME)
+        if os.path.exists(manifest_path):
+            os.remove(manifest_path)
+        for name in (FEATURES_NAME, TARGET_NAME):
+            os.replace(os.path.join(staging, name), os.path.join(cache_dir, name))
+    finally:
+        shutil.rmtree(staging, ignore_errors=True)
+
+    return write_manifest(cache_dir, rows, {'file': os.path.basename(csv_path), 'sha256': sha256, **stat},
+                          convert_seconds=round(time.perf_counter() - start, 3))
+
+
+def allocate_cache(cache_dir, rows):
+    """
+    Crée features.npy et target.npy de rows lignes, ouverts en écriture par
+    memory-map (export de SensorData). Le manifeste est écrit par
+    write_manifest une fois les tableaux remplis.
+    """
+    os.makedirs(cache_dir, exist_ok=True)
+    manifest_path = os.path.join(cache_dir, MANIFEST_NAME)
+    if os.path.exists(manifest_path):
+        os.remove(manifest_path)
+    X = np.lib.format.open_memmap(os.path.join(cache_dir, FEATURES_NAME), mode='w+',
+                                  dtype=np.float64, shape=(rows, len(FEATURES)))
+    y = np.lib.format.open_memmap(os.path.join(cache_dir, TARGET_NAME), mode='w+', dtype=np.int64, shape=(rows,))
+    return X, y
+
+
+def write_manifest(cache_dir, rows, source, **extra):
+    manifest = {
+        'format': CACHE_FORMAT,
+        'source': source,
+        'rows': rows,
+        'features': FEATURES,
+        'target': TARGET,
+        **extra,
+    }
+    _atomic_write_text(os.path.join(cache_dir, MANIFEST_NAME), json.dumps(manifest, indent=2, default=str))
+    return manifest
+
+
+def open_cache(cache_dir):
+    """(X, y, manifest) d'un cache existant, en memory-map lecture seule, sans vérifier la source"""
+    manifest = read_manifest(cache_dir)
+    if manifest is None:
+        raise FileNotFoundError(f"Pas de cache valide dans {cache_dir}")
+    X = np.load(os.path.join(cache_dir, FEATURES_NAME), mmap_mode='r')
+    y = np.load(os.path.join(cache_dir, TARGET_NAME), mmap_mode='r')
+    return X, y, manifest
+
+
+def load_training_data(csv_path, cache_dir=None, rebuild=False):
+    """
+    Charge (X, y) depuis le cache binaire, reconstruit au besoin. X et y sont
+    des memory-maps en lecture seule : les pages sont lues à la demande et
+    partagées entre process.
+
+    Returns:
+        (X, y, manifest)
+    """
+    cache_dir = cache_dir or cache_dir_for(csv_path)
+    manifest = None if rebuild else fresh_manifest(csv_path, cache_dir)
+    rebuilt = manifest is None
+    if rebuilt:
+        build_cache(csv_path, cache_dir)
+    X, y, manifest = open_cache(cache_dir)
+    if rebuilt:
+        manifest['rebuilt'] = True
+    return X, y, manifest
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Convertit le CSV d'entraînement en cache binaire memory-mappé")
+    parser.add_argument('csv', nargs='?', default=os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                                            'medical_training_data.csv'))
+    parser.add_argument('--rebuild', action='store_true', help="Reconvertir même si le cache est à jour")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    X, y, manifest = load_training_data(args.csv, rebuild=args.rebuild)
+    elapsed = (time.perf_counter() - start) * 1000
+    if manifest.get('rebuilt'):
+        print(f"🔄 Cache reconstruit en {manifest['convert_seconds']:.2f} s: {cache_dir_for(args.csv)}")
+    else:
+        print(f"✅ Cache à jour ({elapsed:.1f} ms): {cache_dir_for(args.csv)}")
+    print(f"📊 {manifest['rows']} lignes, {len(manifest['features'])} features, sha256 {manifest['source']['sha256'][:12]}")
@@ -0,0 +1,88 @@
+"""
+RAPPORT D'ÉVALUATION PROGRESSIVE (EARLY EXIT)
+Compare FlatForest.predict_proba_early à l'évaluation complète des 100 arbres
+sur medical_training_data.csv : accord des classes prédites, précision par
+rapport aux étiquettes, nombre moyen d'arbres évalués et latence (lecture
+unitaire et lot complet).
+
+Utilisation (depuis ai_models/ ou la racine du backend):
+    python early_exit_report.py
+    python early_exit_report.py --chunk-sizes 5 10 20 --confidences 0.8 0.9 0.95
+"""
+
+import argparse
+import os
+import time
+
+import numpy as np
+
+try:
+    from .data_cache import load_training_data
+    from .flat_forest import FlatForest
+    from .inference import predict_many
+except ImportError:  # Exécution directe: python early_exit_report.py
+    from data_cache import load_training_data
+    from flat_forest import FlatForest
+    from inference import predict_many
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+DATA_PATH = os.path.join(SCRIPT_DIR, 'medical_training_data.csv')
+FLAT_MODEL_PATH = os.path.join(SCRIPT_DIR, 'medical_model_flat.bin')
+
+
+def median_ms(func, repeat):
+    func()  # Échauffement
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        timings.append((time.perf_counter() - start) * 1000)
+    return float(np.median(timings))
+
+
+def report(flat, X, y, chunk_sizes, confidences, repeat=20, single_rows=200):
+    full = predict_many(X, flat)
+    full_probabilities, full_predictions = full['probabilities'], full['status']
+    full_accuracy = (full_predictions == y).mean()
+
+    # Lectures unitaires : échantillon fixe, comme les POST du hardware
+    singles = X[np.random.default_rng(42).integers(0, len(X), single_rows)]
+
+    def per_reading_ms(predict):
+        return median_ms(lambda: [predict(row[np.newaxis, :]) for row in singles], max(1, repeat // 4)) / single_rows
+
+    full_batch_ms = median_ms(lambda: flat.predict_proba(X), repeat)
+    full_single_ms = per_reading_ms(flat.predict_proba)
+
+    print(f"📊 {len(X)} lectures, {flat.n_trees} arbres, précision forêt complète: {full_accuracy:.4f}")
+    print(f"⏱️  Forêt complète: lot {full_batch_ms:.2f} ms, lecture unitaire {full_single_ms * 1000:.1f} µs\n")
+    print(f"{'mode':<22} | {'accord':>8} | {'précision':>9} | {'arbres moy.':>11} | {'écart proba max':>15} | {'lot (ms)':>9} | {'unitaire (µs)':>13}")
+    print("-" * 105)
+
+    configs = [(chunk_size, None) for chunk_size in chunk_sizes]
+    configs += [(chunk_sizes[0], confidence) for confidence in confidences]
+    for chunk_size, confidence in configs:
+        def predict(X_part, chunk_size=chunk_size, confidence=confidence):
+            return flat.predict_proba_early(X_part, chunk_size=chunk_size, confidence=confidence)
+
+        probabilities, trees_used = predict(X)
+        predictions = flat.classes[np.argmax(probabilities, axis=1)]
+        label = f"marge, paquets de {chunk_size}" if confidence is None else f"confiance {confidence:.2f} / {chunk_size}"
+        print(
+            f"{label:<22} | {(predictions == full_predictions).mean():>8.4f} | "
+            f"{(predictions == y).mean():>9.4f} | {trees_used.mean():>11.1f} | "
+            f"{np.max(np.abs(probabilities - full_probabilities)):>15.4f} | "
+            f"{median_ms(lambda: predict(X), repeat):>9.2f} | {per_reading_ms(predict) * 1000:>13.1f}"
+        )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Rapport accord/latence de l'évaluation progressive de la forêt")
+    parser.add_argument('--chunk-sizes', type=int, nargs='+', default=[10, 5, 20])
+    parser.add_argument('--confidences', type=float, nargs='+', default=[0.8, 0.9, 0.95])
+    parser.add_argument('--repeat', type=int, default=20)
+    args = parser.parse_args()
+
+    X, y, _ = load_training_data(DATA_PATH)
+    report(FlatForest.load(FLAT_MODEL_PATH), X, y,
+           args.chunk_sizes, args.confidences, repeat=args.repeat)
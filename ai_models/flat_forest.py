@@ -0,0 +1,300 @@
+"""
+ÉVALUATEUR RANDOM FOREST EN TABLEAUX PLATS
+Le RandomForestClassifier et le StandardScaler entraînés sont aplatis en
+quelques tableaux NumPy contigus (feature, threshold, enfants, valeurs des
+feuilles). L'inférence parcourt ensuite tous les arbres niveau par niveau
+pour tout un lot, sans validation sklearn ni dispatch joblib par appel.
+
+Format de fichier mappable en mémoire (.bin) :
+    MAGIC (8 octets) | longueur de l'en-tête (uint32 little-endian) | en-tête JSON
+    puis chaque tableau aligné sur 64 octets.
+Le fichier est ouvert en lecture seule avec np.memmap : tous les workers
+gunicorn partagent les mêmes pages du cache disque au lieu d'avoir chacun
+une copie du modèle. Il est toujours remplacé par rename atomique.
+"""
+
+import json
+import os
+import struct
+
+import numpy as np
+
+# Écart maximal toléré avec predict_proba de sklearn
+PARITY_TOLERANCE = 1e-9
+
+MAGIC = b'FLATRF01'
+ALIGNMENT = 64
+
+
+def _align(offset):
+    return (offset + ALIGNMENT - 1) // ALIGNMENT * ALIGNMENT
+
+
+def _flatten_tree(tree, max_depth=None):
+    """
+    Noeuds atteignables d'un arbre sklearn (parcours en largeur), index locaux.
+    Un noeud à la profondeur max_depth devient une feuille qui pointe sur elle-même.
+
+    Returns:
+        (feature, threshold, children (n, 2), valeurs normalisées (n, k), profondeur)
+    """
+    # (n, 1, k) pour un classifieur, (n, k, 1) pour un régresseur multi-sorties
+    raw_values = tree.value.reshape(tree.node_count, -1).astype(np.float64)
+
+    order = [0]
+    depths = {0: 0}
+    index = {0: 0}
+    for node in order:
+        is_leaf = tree.children_left[node] == -1 or (max_depth is not None and depths[node] >= max_depth)
+        if not is_leaf:
+            for child in (tree.children_left[node], tree.children_right[node]):
+                depths[child] = depths[node] + 1
+                index[child] = len(order)
+                order.append(child)
+
+    n = len(order)
+    feature = np.zeros(n, dtype=np.int32)
+    threshold = np.zeros(n, dtype=np.float64)
+    children = np.repeat(np.arange(n, dtype=np.int32)[:, np.newaxis], 2, axis=1)
+    for new_index, node in enumerate(order):
+        left = tree.children_left[node]
+        if left != -1 and left in index:
+            feature[new_index] = tree.feature[node]
+            threshold[new_index] = tree.threshold[node]
+            children[new_index] = (index[left], index[tree.children_right[node]])
+
+    # Même normalisation que DecisionTreeClassifier.predict_proba
+    value = np.clip(raw_values[order], 0.0, None)
+    normalizer = value.sum(axis=1, keepdims=True)
+    normalizer[normalizer == 0.0] = 1.0
+    return feature, threshold, children, value / normalizer, max(depths[node] for node in order)
+
+
+class FlatForest:
+    """
+    Forêt aplatie : les noeuds de tous les arbres sont concaténés.
+
+    children[i] = (gauche, droite) avec des index absolus dans les tableaux
+    concaténés. Une feuille pointe sur elle-même dans les deux cas, ce qui
+    permet de faire exactement max_depth itérations pour tout le lot sans
+    masque.
+    """
+
+    ARRAYS = ('mean', 'scale', 'feature', 'threshold', 'children', 'value', 'roots', 'classes')
+
+    def __init__(self, mean, scale, feature, threshold, children, value, roots, classes, max_depth):
+        self.mean = np.ascontiguousarray(mean, dtype=np.float64)
+        self.scale = np.ascontiguousarray(scale, dtype=np.float64)
+        self.feature = np.ascontiguousarray(feature, dtype=np.int32)
+        self.threshold = np.ascontiguousarray(threshold, dtype=np.float64)
+        self.children = np.ascontiguousarray(children, dtype=np.int32).reshape(-1, 2)
+        self.value = np.ascontiguousarray(value, dtype=np.float64)
+        self.roots = np.ascontiguousarray(roots, dtype=np.int32)
+        self.classes = np.ascontiguousarray(classes, dtype=np.int64)
+        self.max_depth = int(max_depth)
+
+    @property
+    def n_trees(self):
+        return len(self.roots)
+
+    @property
+    def n_nodes(self):
+        return len(self.feature)
+
+    @classmethod
+    def from_sklearn(cls, model, scaler, tree_indices=None, max_depth=None):
+        """
+        Aplatit un RandomForestClassifier entraîné et son StandardScaler.
+
+        tree_indices ne garde qu'une sélection d'arbres et max_depth élague
+        chaque arbre à cette profondeur (les noeuds coupés deviennent des
+        feuilles avec la distribution des classes vue à l'entraînement).
+        """
+        estimators = model.estimators_
+        if tree_indices is not None:
+            estimators = [estimators[i] for i in tree_indices]
+        return cls.from_estimators(estimators, scaler, model.classes_, max_depth=max_depth)
+
+    @classmethod
+    def from_estimators(cls, estimators, scaler, classes, max_depth=None):
+        """
+        Aplatit des arbres sklearn quelconques : DecisionTreeClassifier, ou
+        DecisionTreeRegressor multi-sorties prédisant les probabilités des
+        classes (modèle distillé). Seuls les noeuds atteignables après
+        élagage sont conservés.
+        """
+        features, thresholds, children, values, roots = [], [], [], [], []
+        offset = 0
+        depth = 0
+
+        for estimator in estimators:
+            tree = estimator.tree_
+            tree_features, tree_thresholds, tree_children, tree_values, tree_depth = _flatten_tree(tree, max_depth)
+            features.append(tree_features)
+            thresholds.append(tree_thresholds)
+            children.append(tree_children + offset)
+            values.append(tree_values)
+            roots.append(offset)
+            offset += len(tree_features)
+            depth = max(depth, tree_depth)
+
+        return cls(
+            mean=scaler.mean_,
+            scale=scaler.scale_,
+            feature=np.concatenate(features),
+            threshold=np.concatenate(thresholds),
+            children=np.concatenate(children),
+            value=np.concatenate(values),
+            roots=np.array(roots),
+            classes=classes,
+            max_depth=depth,
+        )
+
+    def save(self, path):
+        """
+        Écrit le modèle au format mappable (.bin), ou .npz selon l'extension.
+        Le fichier est écrit à côté puis renommé : un lecteur voit toujours
+        soit l'ancien fichier complet, soit le nouveau.
+        """
+        tmp_path = f"{path}.tmp-{os.getpid()}"
+        try:
+            if str(path).endswith('.npz'):
+                with open(tmp_path, 'wb') as f:
+                    np.savez(f, max_depth=self.max_depth, **{name: getattr(self, name) for name in self.ARRAYS})
+            else:
+                self._write_binary(tmp_path)
+            os.replace(tmp_path, path)
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+    def _write_binary(self, path):
+        arrays = {name: np.ascontiguousarray(getattr(self, name)) for name in self.ARRAYS}
+
+        # Les offsets dépendent de la taille de l'en-tête : on la fixe à un multiple de l'alignement
+        layout = {}
+        header = b''
+        data_start = ALIGNMENT
+        while True:
+            offset = data_start
+            for name, array in arrays.items():
+                layout[name] = {'dtype': array.dtype.str, 'shape': list(array.shape), 'offset': offset}
+                offset = _align(offset + array.nbytes)
+            header = json.dumps({'max_depth': self.max_depth, 'arrays': layout}).encode()
+            needed = _align(len(MAGIC) + 4 + len(header))
+            if needed <= data_start:
+                break
+            data_start = needed
+
+        with open(path, 'wb') as f:
+            f.write(MAGIC + struct.pack('<I', len(header)) + header)
+            for name, array in arrays.items():
+                f.seek(layout[name]['offset'])
+                f.write(array.tobytes())
+            f.flush()
+            os.fsync(f.fileno())
+
+    @classmethod
+    def load(cls, path):
+        """Charge un modèle .npz (en mémoire) ou .bin (mappé en lecture seule)"""
+        if str(path).endswith('.npz'):
+            with np.load(path) as data:
+                arrays = {name: data[name] for name in cls.ARRAYS}
+                return cls(max_depth=int(data['max_depth']), **arrays)
+        return cls.load_mmap(path)
+
+    @classmethod
+    def load_mmap(cls, path):
+        with open(path, 'rb') as f:
+            if f.read(len(MAGIC)) != MAGIC:
+                raise ValueError(f"Fichier modèle invalide: {path}")
+            header_length, = struct.unpack('<I', f.read(4))
+            header = json.loads(f.read(header_length))
+
+        mapped = np.memmap(path, mode='r')
+        arrays = {}
+        for name, spec in header['arrays'].items():
+            dtype = np.dtype(spec['dtype'])
+            count = int(np.prod(spec['shape'])) if spec['shape'] else 1
+            arrays[name] = np.frombuffer(
+                mapped, dtype=dtype, count=count, offset=spec['offset']
+            ).reshape(spec['shape'])
+        return cls(max_depth=header['max_depth'], **arrays)
+
+    def transform(self, X):
+        """
+        Équivalent de StandardScaler.transform, suivi de la conversion en
+        float32 que font les arbres sklearn avant de comparer aux seuils
+        """
+        X = np.asarray(X, dtype=np.float64)
+        if not np.isfinite(X).all():
+            raise ValueError("Les features contiennent des valeurs NaN ou infinies")
+        return ((X - self.mean) / self.scale).astype(np.float32)
+
+    def apply(self, X_scaled, roots=None):
+        """
+        Index de la feuille atteinte dans chaque arbre, shape (n, n_trees).
+        roots permet de ne parcourir qu'une partie des arbres.
+        """
+        roots = self.roots if roots is None else roots
+        n_samples, n_features = X_scaled.shape
+        flat_X = X_scaled.ravel()
+        row_offsets = (np.arange(n_samples, dtype=np.int32) * n_features)[:, np.newaxis]
+        flat_children = self.children.ravel()
+
+        nodes = np.repeat(roots[np.newaxis, :], n_samples, axis=0)
+        for _ in range(self.max_depth):
+            x = np.take(flat_X, row_offsets + np.take(self.feature, nodes))
+            go_right = x > np.take(self.threshold, nodes)
+            nodes = np.take(flat_children, 2 * nodes + go_right)
+        return nodes
+
+    def predict_proba(self, X):
+        """Probabilités moyennes sur les arbres, à partir des features brutes (non normalisées)"""
+        leaves = self.apply(self.transform(X))
+        return np.take(self.value, leaves, axis=0).sum(axis=1) / self.n_trees
+
+    def predict_proba_early(self, X, chunk_size=10, confidence=None):
+        """
+        Évaluation progressive : les arbres sont parcourus par paquets de
+        chunk_size et une ligne s'arrête dès que sa classe en tête ne peut plus
+        être dépassée (chaque arbre restant apporte au plus 1 à une classe).
+        La classe prédite est alors toujours celle de l'évaluation complète.
+
+        confidence (optionnel) arrête aussi une ligne dès que la probabilité
+        moyenne de la classe en tête sur les arbres déjà évalués atteint ce
+        seuil ; plus rapide, mais sans garantie d'accord avec la forêt complète.
+
+        Returns:
+            (probabilités moyennes sur les arbres évalués (n, k), nombre d'arbres évalués (n,))
+        """
+        X_scaled = self.transform(X)
+        n_samples, n_classes = len(X_scaled), len(self.classes)
+        sums = np.zeros((n_samples, n_classes))
+        trees_used = np.full(n_samples, self.n_trees, dtype=np.int32)
+        active = np.arange(n_samples)
+
+        for start in range(0, self.n_trees, chunk_size):
+            stop = min(start + chunk_size, self.n_trees)
+            leaves = self.apply(X_scaled[active], self.roots[start:stop])
+            sums[active] += np.take(self.value, leaves, axis=0).sum(axis=1)
+            remaining = self.n_trees - stop
+            if remaining == 0:
+                break
+
+            # Deux plus grandes sommes de chaque ligne encore active : [seconde, première]
+            top = np.partition(sums[active], n_classes - 2, axis=1)[:, -2:]
+            done = top[:, 1] - top[:, 0] > remaining + 1e-9
+            if confidence is not None:
+                done |= top[:, 1] / stop >= confidence
+            trees_used[active[done]] = stop
+            active = active[~done]
+            if not len(active):
+                break
+
+        return sums / trees_used[:, np.newaxis], trees_used
+
+    def max_difference(self, model, scaler, X):
+        """Écart maximal avec predict_proba de sklearn sur X"""
+        expected = model.predict_proba(scaler.transform(X))
+        return float(np.max(np.abs(self.predict_proba(X) - expected)))
@@ -0,0 +1,106 @@
+"""
+API D'INFÉRENCE COMMUNE DU MODÈLE MÉDICAL
+Point d'entrée unique, orienté lots, partagé par ai_models (entraînement,
+évaluation, compaction) et par le backend Django (devices.ai_service).
+
+    predictions = predict_many(X, backend)        # X: (n, 5) dans l'ordre de FEATURES
+    predictions['status']                          # (n,) int64
+    predictions['confidence']                      # (n,) probabilité de la classe prédite, entre 0 et 1
+    predictions['probabilities']                   # (n, 4)
+    to_dicts(predictions)                          # format JSON historique de l'API
+
+Un backend est tout objet exposant predict_proba(X) et classes : FlatForest
+(forêt aplatie) ou SklearnBackend (pickles sklearn). La fonction scalaire
+predict_one n'est qu'une enveloppe de predict_many sur une ligne.
+"""
+
+import numpy as np
+
+FEATURES = ['cov_ppb', 'eco2_ppm', 'heart_rate', 'spo2', 'temperature']
+
+CLASS_NAMES = {
+    0: 'Sain',
+    1: 'Infection légère',
+    2: 'Infection modérée',
+    3: 'Hypoxie sévère'
+}
+
+PREDICTION_DTYPE = np.dtype([
+    ('status', np.int64),
+    ('confidence', np.float64),
+    ('probabilities', np.float64, (len(CLASS_NAMES),)),
+])
+
+_STATUS_NAMES = np.array([CLASS_NAMES[i] for i in sorted(CLASS_NAMES)], dtype=object)
+
+
+class SklearnBackend:
+    """Backend sklearn : RandomForest picklé + StandardScaler"""
+
+    def __init__(self, model, scaler):
+        self.model = model
+        self.scaler = scaler
+        self.classes = model.classes_
+
+    def predict_proba(self, X):
+        return self.model.predict_proba(self.scaler.transform(X))
+
+
+def as_matrix(X):
+    """Lectures sous forme de matrice float (n, 5) ; une seule lecture est acceptée"""
+    return np.asarray(X, dtype=float).reshape(-1, len(FEATURES))
+
+
+def build_predictions(statuses, probabilities):
+    """Tableau structuré (PREDICTION_DTYPE) à partir des classes et probabilités"""
+    probabilities = np.asarray(probabilities, dtype=np.float64)
+    predictions = np.empty(len(probabilities), dtype=PREDICTION_DTYPE)
+    predictions['status'] = statuses
+    predictions['probabilities'] = probabilities
+    predictions['confidence'] = probabilities.max(axis=1) if len(probabilities) else 0.0
+    return predictions
+
+
+def predict_many(X, backend):
+    """
+    Prédit l'état de santé de n lectures en une seule passe dans la forêt.
+    Les classes sont l'argmax des probabilités (exactement ce que fait
+    RandomForestClassifier.predict).
+
+    Returns:
+        tableau structuré (n,) de PREDICTION_DTYPE
+    """
+    probabilities = backend.predict_proba(as_matrix(X))
+    return build_predictions(backend.classes[np.argmax(probabilities, axis=1)], probabilities)
+
+
+def to_dicts(predictions, model_version=None):
+    """
+    Met en forme n prédictions au format JSON de l'API : arrondis et noms
+    calculés en bloc avec NumPy, puis une seule conversion en types Python
+    natifs
+    """
+    statuses = predictions['status']
+    percents = np.round(predictions['probabilities'] * 100, 2)
+    confidences = percents[np.arange(len(statuses)), statuses]
+    names = _STATUS_NAMES[statuses]
+
+    class_names = _STATUS_NAMES.tolist()
+    return [
+        {
+            'status': status,
+            'status_name': name,
+            'confidence': confidence,
+            'probabilities': dict(zip(class_names, row)),
+            'model_version': model_version,
+        }
+        for status, name, confidence, row in zip(
+            statuses.tolist(), names.tolist(), confidences.tolist(), percents.tolist()
+        )
+    ]
+
+
+def predict_one(backend, cov_ppb, eco2_ppm, heart_rate, spo2, temperature, model_version=None):
+    """Enveloppe scalaire de predict_many : une lecture, un dict"""
+    predictions = predict_many([cov_ppb, eco2_ppm, heart_rate, spo2, temperature], backend)
+    return to_dicts(predictions, model_version)[0]
@@ -1,12 +1,38 @@
 """
 GÉNÉRATEUR DE DONNÉES RÉALISTES
 Basé sur des plages physiologiques médicalement validées
+
+La génération est vectorisée par profil. Pour les grands volumes (10^7 à
+10^8 lignes), generate_to_file écrit le dataset par paquets de chunk_size
+lignes, en CSV ou en format colonnaire binaire (un fichier .npy par colonne,
+lisible en memory-map avec load_columnar). Chaque paquet a sa propre graine,
+dérivée de (random_seed, numéro du paquet) : le résultat est identique quel
+que soit le nombre de process (--workers) et la mémoire utilisée ne dépend
+que de chunk_size.
 """
 
+import argparse
+import json
+import os
+import shutil
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+
 import numpy as np
 import pandas as pd
-import matplotlib.pyplot as plt
-import seaborn as sns
+
+PARAMS = ['cov_ppb', 'eco2_ppm', 'heart_rate', 'spo2', 'temperature']
+
+# Paramètres qui peuvent recevoir une valeur atypique (x1.3 à x1.7)
+OUTLIER_PARAMS = ['cov_ppb', 'eco2_ppm', 'heart_rate']
+OUTLIER_RATE = 0.05
+
+# Format colonnaire : un .npy par colonne + un manifeste
+COLUMNAR_MANIFEST = 'manifest.json'
+COLUMN_DTYPES = {param: np.float64 for param in PARAMS}
+COLUMN_DTYPES['status'] = np.int8
+
 
 class MedicalDataGenerator:
     """
@@ -14,7 +40,8 @@ class MedicalDataGenerator:
     """
     
     def __init__(self, random_seed=42):
-        np.random.seed(random_seed)
+        self.random_seed = random_seed
+        self.rng = np.random.default_rng(random_seed)
         
         # Définition des profils médicaux basés sur la littérature
         self.profiles = {
@@ -66,39 +93,53 @@ class MedicalDataGenerator:
     
     def generate_sample(self, profile_name):
         """Génère un échantillon pour un profil donné"""
+        sample = {param: values[0] for param, values in self.generate_profile(profile_name, 1).items()}
+        sample['status'] = self.class_mapping[profile_name]
+        sample['status_name'] = profile_name
+        return sample
+
+    def generate_profile(self, profile_name, n, rng=None):
+        """Génère n échantillons d'un profil (un tableau par paramètre)"""
+        rng = self.rng if rng is None else rng
         profile = self.profiles[profile_name]
-        
-        sample = {}
-        for param in ['cov_ppb', 'eco2_ppm', 'heart_rate', 'spo2', 'temperature']:
+
+        columns = {}
+        for param in PARAMS:
             min_val, max_val, std = profile[param]
             mean_val = (min_val + max_val) / 2
-            
+
             # Distribution normale tronquée
-            value = np.random.normal(mean_val, std)
-            value = np.clip(value, min_val, max_val)
-            
-            sample[param] = value
-        
-        sample['status'] = self.class_mapping[profile_name]
-        sample['status_name'] = profile_name
-        
-        return sample
+            columns[param] = np.clip(rng.normal(mean_val, std, n), min_val, max_val)
+
+        return columns
+
+    def class_counts(self, n_samples):
+        """
+        Nombre d'échantillons par profil. Le reste des arrondis va au profil
+        le plus fréquent pour que le total soit exactement n_samples.
+        """
+        counts = {name: int(n_samples * profile['probability']) for name, profile in self.profiles.items()}
+        most_frequent = max(self.profiles, key=lambda name: self.profiles[name]['probability'])
+        counts[most_frequent] += n_samples - sum(counts.values())
+        return counts
     
-    def add_noise_and_variations(self, df):
+    def add_noise_and_variations(self, df, rng=None):
         """
         Ajoute du bruit et des variations pour simuler:
         - Erreurs de mesure des capteurs
         - Variations individuelles
         - Conditions environnementales
         """
+        rng = self.rng if rng is None else rng
+
         # Bruit des capteurs (±5%)
         noise_level = 0.05
         
-        df['cov_ppb'] *= np.random.uniform(1-noise_level, 1+noise_level, len(df))
-        df['eco2_ppm'] *= np.random.uniform(1-noise_level, 1+noise_level, len(df))
-        df['heart_rate'] *= np.random.uniform(1-noise_level/2, 1+noise_level/2, len(df))
-        df['spo2'] *= np.random.uniform(1-noise_level/10, 1+noise_level/10, len(df))
-        df['temperature'] += np.random.normal(0, 0.1, len(df))
+        df['cov_ppb'] *= rng.uniform(1-noise_level, 1+noise_level, len(df))
+        df['eco2_ppm'] *= rng.uniform(1-noise_level, 1+noise_level, len(df))
+        df['heart_rate'] *= rng.uniform(1-noise_level/2, 1+noise_level/2, len(df))
+        df['spo2'] *= rng.uniform(1-noise_level/10, 1+noise_level/10, len(df))
+        df['temperature'] += rng.normal(0, 0.1, len(df))
         
         # S'assurer que les valeurs restent réalistes
         df['cov_ppb'] = df['cov_ppb'].clip(100, 2000)
@@ -125,10 +166,50 @@ class MedicalDataGenerator:
         df['heart_rate'] = df['heart_rate'].clip(40, 180)
         
         return df
+
+    def add_outliers(self, df, rng=None):
+        """
+        Cas atypiques : OUTLIER_RATE des lignes ont un paramètre de
+        OUTLIER_PARAMS multiplié par 1.3 à 1.7
+        """
+        rng = self.rng if rng is None else rng
+        n_outliers = int(len(df) * OUTLIER_RATE)
+        rows = rng.choice(len(df), n_outliers, replace=False)
+        params = rng.integers(0, len(OUTLIER_PARAMS), n_outliers)
+        factors = rng.uniform(1.3, 1.7, n_outliers)
+
+        for param_index, param in enumerate(OUTLIER_PARAMS):
+            selected = params == param_index
+            values = df[param].to_numpy(copy=True)
+            values[rows[selected]] *= factors[selected]
+            df[param] = values
+
+        return df
+
+    def generate_block(self, n_samples, add_outliers=True, rng=None):
+        """Génère n_samples lignes mélangées, toutes classes confondues"""
+        rng = self.rng if rng is None else rng
+        counts = self.class_counts(n_samples)
+
+        parts = [self.generate_profile(name, count, rng) for name, count in counts.items()]
+        df = pd.DataFrame({param: np.concatenate([part[param] for part in parts]) for param in PARAMS})
+        df['status'] = np.repeat([self.class_mapping[name] for name in counts], list(counts.values()))
+        df['status_name'] = np.repeat(list(counts), list(counts.values()))
+
+        # Ajouter du bruit et des corrélations
+        df = self.add_noise_and_variations(df, rng)
+        df = self.add_correlations(df)
+
+        # Ajouter des outliers (cas atypiques)
+        if add_outliers:
+            df = self.add_outliers(df, rng)
+
+        # Mélanger le dataset
+        return df.iloc[rng.permutation(len(df))].reset_index(drop=True)
     
     def generate_dataset(self, n_samples=2000, add_outliers=True):
         """
-        Génère un dataset complet
+        Génère un dataset complet en mémoire
         
         Parameters:
         -----------
@@ -137,43 +218,90 @@ class MedicalDataGenerator:
         add_outliers : bool
             Ajouter des cas atypiques (5% du dataset)
         """
-        samples = []
-        
-        # Calculer le nombre d'échantillons par classe
-        for profile_name, profile in self.profiles.items():
-            n_class = int(n_samples * profile['probability'])
-            
-            for _ in range(n_class):
-                sample = self.generate_sample(profile_name)
-                samples.append(sample)
-        
-        df = pd.DataFrame(samples)
-        
-        # Ajouter du bruit et des corrélations
-        df = self.add_noise_and_variations(df)
-        df = self.add_correlations(df)
-        
-        # Ajouter des outliers (cas atypiques)
-        if add_outliers:
-            n_outliers = int(len(df) * 0.05)
-            outlier_indices = np.random.choice(df.index, n_outliers, replace=False)
-            
-            for idx in outlier_indices:
-                # Modifier aléatoirement un paramètre
-                param = np.random.choice(['cov_ppb', 'eco2_ppm', 'heart_rate'])
-                df.loc[idx, param] *= np.random.uniform(1.3, 1.7)
-        
-        # Mélanger le dataset
-        df = df.sample(frac=1).reset_index(drop=True)
-        
-        return df
+        return self.generate_block(n_samples, add_outliers)
+
+    def generate_chunk(self, chunk_index, n_samples, add_outliers=True):
+        """
+        Génère le paquet chunk_index. Sa graine ne dépend que de random_seed
+        et de chunk_index : n'importe quel process peut le produire.
+        """
+        rng = np.random.default_rng([self.random_seed, chunk_index])
+        return self.generate_block(n_samples, add_outliers, rng)
+
+    def generate_to_file(self, path, n_samples, chunk_size=1_000_000, file_format='csv',
+                         workers=1, add_outliers=True):
+        """
+        Écrit un dataset de n_samples lignes par paquets de chunk_size.
+
+        Parameters:
+        -----------
+        path : str
+            Fichier CSV, ou dossier du format colonnaire ('npy')
+        file_format : str
+            'csv' ou 'npy' (un .npy par colonne, status_name omis)
+        workers : int
+            Process en parallèle ; le fichier produit est le même
+        """
+        if file_format not in ('csv', 'npy'):
+            raise ValueError(f"Format inconnu: {file_format}")
+
+        chunks = [
+            (index, start, min(chunk_size, n_samples - start))
+            for index, start in enumerate(range(0, n_samples, chunk_size))
+        ]
+
+        if file_format == 'npy':
+            self._create_columnar(path, n_samples, chunk_size)
+            tasks = [(self.random_seed, index, start, size, add_outliers, path) for index, start, size in chunks]
+            self._run(_write_columnar_chunk, tasks, workers)
+            return path
+
+        # CSV : un fichier par paquet, concaténés dans l'ordre à la fin
+        parts_dir = tempfile.mkdtemp(prefix='medical_dataset_', dir=os.path.dirname(os.path.abspath(path)))
+        try:
+            tasks = [
+                (self.random_seed, index, size, add_outliers, os.path.join(parts_dir, f'{index:06d}.csv'), index == 0)
+                for index, _, size in chunks
+            ]
+            parts = self._run(_write_csv_chunk, tasks, workers)
+            with open(path, 'wb') as output:
+                for part in sorted(parts):
+                    with open(part, 'rb') as chunk_file:
+                        shutil.copyfileobj(chunk_file, output)
+        finally:
+            shutil.rmtree(parts_dir, ignore_errors=True)
+        return path
+
+    def _run(self, func, tasks, workers):
+        if workers <= 1:
+            return [func(*task) for task in tasks]
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            return list(executor.map(func, *zip(*tasks)))
+
+    def _create_columnar(self, path, n_samples, chunk_size):
+        os.makedirs(path, exist_ok=True)
+        for column, dtype in COLUMN_DTYPES.items():
+            np.lib.format.open_memmap(os.path.join(path, f'{column}.npy'), mode='w+', dtype=dtype, shape=(n_samples,))
+        manifest = {
+            'rows': n_samples,
+            'chunk_size': chunk_size,
+            'random_seed': self.random_seed,
+            'columns': {column: np.dtype(dtype).name for column, dtype in COLUMN_DTYPES.items()},
+            'class_mapping': self.class_mapping,
+        }
+        with open(os.path.join(path, COLUMNAR_MANIFEST), 'w') as f:
+            json.dump(manifest, f, indent=2)
     
     def visualize_dataset(self, df):
         """Visualise la distribution des données"""
+        # Import tardif : la génération (et les process du pool) n'en ont pas besoin
+        import matplotlib.pyplot as plt
+        import seaborn as sns
+
         fig, axes = plt.subplots(2, 3, figsize=(15, 10))
         fig.suptitle('Distribution des Paramètres Physiologiques', fontsize=16)
         
-        params = ['cov_ppb', 'eco2_ppm', 'heart_rate', 'spo2', 'temperature']
+        params = PARAMS
         colors = ['#FF6B6B', '#4ECDC4', '#45B7D1', '#FFA07A', '#98D8C8']
         
         for idx, param in enumerate(params):
@@ -210,17 +338,71 @@ class MedicalDataGenerator:
         print(df.describe())
 
 
+def _write_csv_chunk(random_seed, chunk_index, n_samples, add_outliers, path, header):
+    df = MedicalDataGenerator(random_seed).generate_chunk(chunk_index, n_samples, add_outliers)
+    df.to_csv(path, index=False, header=header)
+    return path
+
+
+def _write_columnar_chunk(random_seed, chunk_index, start, n_samples, add_outliers, path):
+    df = MedicalDataGenerator(random_seed).generate_chunk(chunk_index, n_samples, add_outliers)
+    for column, dtype in COLUMN_DTYPES.items():
+        output = np.load(os.path.join(path, f'{column}.npy'), mmap_mode='r+')
+        output[start:start + n_samples] = df[column].to_numpy(dtype=dtype)
+        output.flush()
+        del output
+    return start
+
+
+def load_columnar(path, mmap=True):
+    """
+    Charge un dataset écrit au format colonnaire. Avec mmap=True les colonnes
+    sont des memory-maps en lecture seule : rien n'est lu avant usage.
+
+    Returns:
+        dict colonne -> tableau NumPy
+    """
+    with open(os.path.join(path, COLUMNAR_MANIFEST)) as f:
+        manifest = json.load(f)
+    return {
+        column: np.load(os.path.join(path, f'{column}.npy'), mmap_mode='r' if mmap else None)
+        for column in manifest['columns']
+    }
+
+
 # ============================================
 # UTILISATION
 # ============================================
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Génère le dataset médical synthétique")
+    parser.add_argument('--n-samples', type=int, default=2000)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--output', help="Fichier CSV ou dossier colonnaire (défaut: medical_training_data.csv)")
+    parser.add_argument('--format', choices=['csv', 'npy'], default='csv', dest='file_format')
+    parser.add_argument('--chunk-size', type=int, default=1_000_000, help="Lignes par paquet en mode flux")
+    parser.add_argument('--workers', type=int, default=1, help="Process en parallèle en mode flux")
+    parser.add_argument('--no-plot', action='store_true', help="Ne pas créer les visualisations")
+    args = parser.parse_args()
+
     print("=" * 70)
     print("GÉNÉRATEUR DE DONNÉES MÉDICALES RÉALISTES")
     print("=" * 70)
     
     # Créer le générateur
-    generator = MedicalDataGenerator(random_seed=42)
+    generator = MedicalDataGenerator(random_seed=args.seed)
+
+    # Grands volumes : écriture par paquets, sans tout garder en mémoire
+    if args.file_format == 'npy' or args.n_samples > args.chunk_size:
+        output = args.output or ('medical_training_data' if args.file_format == 'npy' else 'medical_training_data.csv')
+        print(f"\n🔄 Génération de {args.n_samples} lignes par paquets de {args.chunk_size} "
+              f"({args.workers} process, format {args.file_format})...")
+        start = time.perf_counter()
+        generator.generate_to_file(output, args.n_samples, chunk_size=args.chunk_size,
+                                   file_format=args.file_format, workers=args.workers)
+        elapsed = time.perf_counter() - start
+        print(f"✅ Dataset écrit: {output} en {elapsed:.1f} s ({args.n_samples / elapsed:,.0f} lignes/s)")
+        raise SystemExit(0)
     
     # Afficher les profils
     print("\n📋 Profils médicaux disponibles:\n")
@@ -230,14 +412,15 @@ if __name__ == "__main__":
     
     # Générer le dataset
     print("\n🔄 Génération du dataset...")
-    df = generator.generate_dataset(n_samples=2000, add_outliers=True)
+    df = generator.generate_dataset(n_samples=args.n_samples, add_outliers=True)
     
     # Sauvegarder
-    generator.save_dataset(df)
+    generator.save_dataset(df, args.output or 'medical_training_data.csv')
     
     # Visualiser
-    print("\n📊 Création des visualisations...")
-    generator.visualize_dataset(df)
+    if not args.no_plot:
+        print("\n📊 Création des visualisations...")
+        generator.visualize_dataset(df)
     
     print("\n" + "=" * 70)
     print("✅ Dataset prêt à être utilisé pour l'entraînement !")
@@ -246,4 +429,4 @@ if __name__ == "__main__":
     print("1. Utiliser 'medical_training_data.csv' pour entraîner votre modèle")
     print("2. Vérifier les visualisations dans 'dataset_visualization.png'")
     print("3. Adapter les profils si nécessaire dans le code")
-    print("=" * 70)
\ No newline at end of file
+    print("=" * 70)
@@ -7,23 +7,35 @@ import numpy as np
 import pandas as pd
 from sklearn.model_selection import train_test_split, cross_val_score
 from sklearn.ensemble import RandomForestClassifier
+from sklearn.tree import DecisionTreeRegressor
 from sklearn.preprocessing import StandardScaler
 from sklearn.metrics import classification_report, accuracy_score
+import argparse
 import joblib
+import json
 import os
+import sys
+import tempfile
+import time
 
-FEATURES = ['cov_ppb', 'eco2_ppm', 'heart_rate', 'spo2', 'temperature']
-TARGET = 'status'
+try:
+    from .data_cache import load_training_data
+    from .flat_forest import FlatForest, PARITY_TOLERANCE
+    from .inference import CLASS_NAMES, FEATURES, SklearnBackend, predict_many, predict_one
+    from .registry import ModelRegistry, file_sha256
+except ImportError:  # Exécution directe: python medical_model.py
+    from data_cache import load_training_data
+    from flat_forest import FlatForest, PARITY_TOLERANCE
+    from inference import CLASS_NAMES, FEATURES, SklearnBackend, predict_many, predict_one
+    from registry import ModelRegistry, file_sha256
 
-CLASS_NAMES = {
-    0: 'Sain',
-    1: 'Infection légère',
-    2: 'Infection modérée',
-    3: 'Hypoxie sévère'
-}
+TARGET = 'status'
 
 MODEL_PATH = 'medical_model.pkl'
 SCALER_PATH = 'medical_scaler.pkl'
+FLAT_MODEL_PATH = 'medical_model_flat.bin'
+COMPACT_MODEL_PATH = 'medical_model_compact.bin'
+COMPACT_REPORT_PATH = 'medical_model_compact_report.json'
 
 
 class MedicalClassifier:
@@ -39,32 +51,47 @@ class MedicalClassifier:
         self.scaler = StandardScaler()
         self.is_trained = False
     
-    def load_data(self, filepath='medical_training_data.csv'):
+    def load_data(self, filepath='medical_training_data.csv', use_cache=True):
+        """
+        Charge (X, y). Par défaut depuis le cache binaire memory-mappé
+        (data_cache.py), reconverti automatiquement si le CSV a changé.
+        """
         print(f"📂 Chargement des données: {filepath}")
-        df = pd.read_csv(filepath)
-        X = df[FEATURES].values
-        y = df[TARGET].values
-        print(f"✅ {len(df)} échantillons chargés")
+        if use_cache:
+            start = time.perf_counter()
+            X, y, manifest = load_training_data(filepath)
+            if manifest.get('rebuilt'):
+                print(f"🔄 Cache binaire reconstruit en {manifest['convert_seconds']:.2f} s")
+            else:
+                print(f"⚡ Cache binaire à jour ({(time.perf_counter() - start) * 1000:.1f} ms)")
+        else:
+            df = pd.read_csv(filepath)
+            X = df[FEATURES].values
+            y = df[TARGET].values
+        print(f"✅ {len(X)} échantillons chargés")
         return X, y
     
     def train(self, X, y, test_size=0.2):
         print("\n🔄 Entraînement du modèle...")
+        # predict_many / to_dicts supposent classes_ == [0, 1, 2, 3]
+        classes = sorted(np.unique(y).tolist())
+        if classes != sorted(CLASS_NAMES):
+            raise ValueError(f"Classes d'entraînement {classes}, attendu {sorted(CLASS_NAMES)}")
         X_train, X_test, y_train, y_test = train_test_split(
             X, y, test_size=test_size, random_state=42, stratify=y
         )
         X_train_scaled = self.scaler.fit_transform(X_train)
-        X_test_scaled = self.scaler.transform(X_test)
         
         self.model.fit(X_train_scaled, y_train)
         self.is_trained = True
         
-        y_pred = self.model.predict(X_test_scaled)
+        y_pred = self.predict_many(X_test)['status']
         accuracy = accuracy_score(y_test, y_pred)
         
         print(f"\n✅ Entraînement terminé!")
         print(f"📊 Précision: {accuracy*100:.2f}%")
         print("\n📋 Rapport:")
-        print(classification_report(y_test, y_pred, target_names=[CLASS_NAMES[i] for i in sorted(CLASS_NAMES.keys())]))
+        print(classification_report(y_test, y_pred, labels=sorted(CLASS_NAMES), target_names=[CLASS_NAMES[i] for i in sorted(CLASS_NAMES.keys())], zero_division=0))
         
         print("\n🔍 Importance des paramètres:")
         for feat, imp in sorted(zip(FEATURES, self.model.feature_importances_), key=lambda x: x[1], reverse=True):
@@ -80,6 +107,126 @@ class MedicalClassifier:
         print(f"\n💾 Modèle sauvegardé: {model_path}")
         print(f"💾 Scaler sauvegardé: {scaler_path}")
     
+    def export_flat(self, path=FLAT_MODEL_PATH, X_check=None):
+        """
+        Exporte la forêt et le scaler en tableaux NumPy plats (backend
+        d'inférence par défaut de MedicalAIService). Le fichier .bin est
+        mappé en lecture seule par les workers et remplacé par rename atomique.
+        Si X_check est fourni, vérifie que les probabilités sont identiques
+        à celles de sklearn avant d'écrire le fichier.
+        """
+        if not self.is_trained:
+            raise Exception("Le modèle n'est pas encore entraîné!")
+        flat = FlatForest.from_sklearn(self.model, self.scaler)
+        if X_check is not None:
+            difference = flat.max_difference(self.model, self.scaler, X_check)
+            if difference > PARITY_TOLERANCE:
+                raise Exception(f"Export plat non conforme à sklearn (écart max {difference:.2e})")
+            print(f"🔍 Parité sklearn vérifiée (écart max {difference:.2e})")
+        flat.save(path)
+        print(f"💾 Modèle plat exporté: {path} ({flat.n_trees} arbres, {flat.n_nodes} noeuds)")
+        return flat
+    
+    def publish(self, metrics=None, training_data=None, activate=True, registry=None, flat=None, training_info=None):
+        """
+        Publie le modèle entraîné (ou un modèle plat déjà construit, par
+        exemple compacté) comme nouvelle version du registre
+        (ai_models/registry). Si activate, les workers basculent dessus sans
+        redémarrage. training_info décrit des données qui ne sont pas un
+        fichier (export de SensorData).
+        """
+        if not self.is_trained:
+            raise Exception("Le modèle n'est pas encore entraîné!")
+        extra = {}
+        if training_info is not None:
+            extra['training_data'] = training_info
+        elif training_data is not None:
+            extra['training_data'] = {
+                'file': os.path.basename(training_data),
+                'sha256': file_sha256(training_data),
+            }
+        registry = registry or ModelRegistry()
+        flat = flat or FlatForest.from_sklearn(self.model, self.scaler)
+        version = registry.publish(flat, FEATURES, CLASS_NAMES, metrics=metrics, extra=extra, activate=activate)
+        print(f"📦 Version publiée dans le registre: {version}{' (active)' if activate else ''}")
+        return version
+    
+    def compact(self, X, y, n_trees=20, max_depth=6, distill=False, distill_depth=8,
+                distill_samples=20000, test_size=0.2):
+        """
+        Compacte la forêt entraînée :
+          1. élagage de chaque arbre à max_depth ;
+          2. sélection gloutonne des n_trees arbres élagués qui contribuent le
+             plus à l'accord avec la forêt d'origine ;
+          3. (distill) distillation de la forêt d'origine dans un seul arbre de
+             régression qui prédit ses probabilités, entraîné sur les données
+             d'entraînement et des variantes bruitées étiquetées par la forêt.
+        La sélection et la distillation utilisent la partie entraînement du
+        découpage de train() ; le rapport est calculé sur la partie test.
+        
+        Returns:
+            (FlatForest compacte retenue, rapport)
+        """
+        if not self.is_trained:
+            raise Exception("Le modèle n'est pas encore entraîné!")
+        X_train, X_test, y_train, y_test = train_test_split(
+            X, y, test_size=test_size, random_state=42, stratify=y
+        )
+        original = FlatForest.from_sklearn(self.model, self.scaler)
+        target = predict_many(X_train, original)['status']
+        target_index = np.searchsorted(original.classes, target)
+        
+        print(f"\n✂️  Élagage des arbres à la profondeur {max_depth}...")
+        pruned = FlatForest.from_sklearn(self.model, self.scaler, max_depth=max_depth)
+        # Probabilités de chaque arbre élagué : (n, n_arbres, k)
+        tree_probabilities = np.take(pruned.value, pruned.apply(pruned.transform(X_train)), axis=0)
+        
+        print(f"🌲 Sélection de {n_trees} arbres sur {pruned.n_trees}...")
+        selected = []
+        sums = np.zeros((len(X_train), len(pruned.classes)))
+        rows = np.arange(len(X_train))
+        for _ in range(min(n_trees, pruned.n_trees)):
+            candidates = np.array([i for i in range(pruned.n_trees) if i not in selected])
+            totals = sums[:, np.newaxis, :] + tree_probabilities[:, candidates, :]
+            agreement = (np.argmax(totals, axis=2) == target_index[:, np.newaxis]).mean(axis=0)
+            # À accord égal : l'arbre qui renforce le plus la classe de la forêt d'origine
+            support = totals[rows, :, target_index].mean(axis=0) / (len(selected) + 1)
+            best = candidates[np.lexsort((support, agreement))[-1]]
+            selected.append(int(best))
+            sums += tree_probabilities[:, best, :]
+        compact = FlatForest.from_sklearn(self.model, self.scaler, tree_indices=selected, max_depth=max_depth)
+        
+        candidates = {'original': original, 'compact': compact}
+        if distill:
+            print(f"🧪 Distillation dans un arbre de profondeur {distill_depth}...")
+            candidates['distilled'] = self._distill(original, X_train, distill_depth, distill_samples)
+        
+        report = {
+            'n_trees': n_trees,
+            'max_depth': max_depth,
+            'selected_trees': selected,
+            'test_rows': len(X_test),
+            'models': {name: _evaluate_flat(flat, original, X_test, y_test) for name, flat in candidates.items()},
+        }
+        chosen = 'distilled' if distill else 'compact'
+        report['chosen'] = chosen
+        return candidates[chosen], report
+    
+    def _distill(self, teacher, X_train, max_depth, n_samples, noise=0.3, seed=42):
+        """Arbre de régression multi-sorties imitant les probabilités de la forêt"""
+        rng = np.random.default_rng(seed)
+        X_scaled = self.scaler.transform(X_train)
+        # Variantes bruitées (dans l'espace normalisé) autour des lectures réelles
+        base = X_scaled[rng.integers(0, len(X_scaled), n_samples)]
+        X_augmented = np.vstack([X_scaled, base + rng.normal(0.0, noise, base.shape)])
+        X_augmented_raw = self.scaler.inverse_transform(X_augmented)
+        soft_labels = teacher.predict_proba(X_augmented_raw)
+        
+        student = DecisionTreeRegressor(max_depth=max_depth, min_samples_leaf=5, random_state=seed)
+        # Même conversion float32 que l'évaluateur plat
+        student.fit(teacher.transform(X_augmented_raw), soft_labels)
+        return FlatForest.from_estimators([student], self.scaler, teacher.classes)
+    
     def load(self, model_path=MODEL_PATH, scaler_path=SCALER_PATH):
         if not os.path.exists(model_path):
             raise FileNotFoundError(f"Modèle non trouvé: {model_path}")
@@ -96,20 +243,64 @@ class MedicalClassifier:
         """
         if not self.is_trained:
             raise Exception("Le modèle n'est pas chargé!")
+        return predict_one(SklearnBackend(self.model, self.scaler), cov_ppb, eco2_ppm, heart_rate, spo2, temperature)
+    
+    def predict_many(self, X):
+        """
+        Prédit l'état de santé de n lectures (voir inference.predict_many)
         
-        X = np.array([[cov_ppb, eco2_ppm, heart_rate, spo2, temperature]])
-        X_scaled = self.scaler.transform(X)
-        
-        prediction = self.model.predict(X_scaled)[0]
-        probabilities = self.model.predict_proba(X_scaled)[0]
-        confidence = probabilities[prediction] * 100
-        
-        return {
-            'status': int(prediction),
-            'status_name': CLASS_NAMES[prediction],
-            'confidence': round(confidence, 2),
-            'probabilities': {CLASS_NAMES[i]: round(p*100, 2) for i, p in enumerate(probabilities)}
-        }
+        Returns: tableau structuré avec status, confidence, probabilities
+        """
+        if not self.is_trained:
+            raise Exception("Le modèle n'est pas chargé!")
+        return predict_many(X, SklearnBackend(self.model, self.scaler))
+
+
+def _latency_ms(predict, X, repeat=300, seed=42):
+    """p50/p99 d'une lecture unitaire et temps du lot complet, en millisecondes"""
+    rows = X[np.random.default_rng(seed).integers(0, len(X), repeat)]
+    predict(rows[:1])  # Échauffement
+    timings = []
+    for row in rows:
+        start = time.perf_counter()
+        predict(row[np.newaxis, :])
+        timings.append((time.perf_counter() - start) * 1000)
+    start = time.perf_counter()
+    predict(X)
+    batch_ms = (time.perf_counter() - start) * 1000
+    return float(np.percentile(timings, 50)), float(np.percentile(timings, 99)), batch_ms
+
+
+def _evaluate_flat(flat, original, X_test, y_test):
+    """Précision, accord avec la forêt d'origine, taille de l'artefact et latence"""
+    predictions = predict_many(X_test, flat)['status']
+    reference = predict_many(X_test, original)['status']
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        path = os.path.join(tmp_dir, 'model.bin')
+        flat.save(path)
+        size_bytes = os.path.getsize(path)
+    p50, p99, batch_ms = _latency_ms(flat.predict_proba, X_test)
+    return {
+        'n_trees': flat.n_trees,
+        'n_nodes': flat.n_nodes,
+        'max_depth': flat.max_depth,
+        'accuracy': round(float((predictions == y_test).mean()), 4),
+        'agreement': round(float((predictions == reference).mean()), 4),
+        'size_bytes': size_bytes,
+        'p50_ms': round(p50, 4),
+        'p99_ms': round(p99, 4),
+        'batch_ms': round(batch_ms, 3),
+    }
+
+
+def print_compaction_report(report):
+    print(f"\n{'modèle':<10} | {'arbres':>6} | {'noeuds':>6} | {'précision':>9} | {'accord':>7} | "
+          f"{'taille (Ko)':>11} | {'p50 (ms)':>8} | {'p99 (ms)':>8} | {'lot (ms)':>8}")
+    print("-" * 100)
+    for name, metrics in report['models'].items():
+        print(f"{name:<10} | {metrics['n_trees']:>6} | {metrics['n_nodes']:>6} | {metrics['accuracy']:>9.4f} | "
+              f"{metrics['agreement']:>7.4f} | {metrics['size_bytes'] / 1024:>11.1f} | "
+              f"{metrics['p50_ms']:>8.3f} | {metrics['p99_ms']:>8.3f} | {metrics['batch_ms']:>8.2f}")
 
 
 # ============================================
@@ -146,6 +337,16 @@ def predict_health_status(cov_ppb, eco2_ppm, heart_rate, spo2, temperature):
 # ============================================
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Entraînement du modèle de classification médicale")
+    parser.add_argument('--export-flat', action='store_true', help="Réexporter le modèle existant sans réentraîner")
+    parser.add_argument('--publish', action='store_true', help="Publier le modèle dans le registre")
+    parser.add_argument('--compact', action='store_true', help="Compacter le modèle existant (élagage, sélection d'arbres)")
+    parser.add_argument('--trees', type=int, default=20, help="Nombre d'arbres gardés par --compact")
+    parser.add_argument('--depth', type=int, default=6, help="Profondeur maximale après élagage")
+    parser.add_argument('--distill', action='store_true', help="Distiller la forêt dans un seul arbre")
+    parser.add_argument('--no-cache', action='store_true', help="Relire le CSV sans passer par le cache binaire")
+    args = parser.parse_args()
+    
     print("=" * 60)
     print("ENTRAÎNEMENT DU MODÈLE DE CLASSIFICATION MÉDICALE")
     print("=" * 60)
@@ -154,13 +355,39 @@ if __name__ == "__main__":
     
     script_dir = os.path.dirname(os.path.abspath(__file__))
     data_path = os.path.join(script_dir, 'medical_training_data.csv')
-    
-    X, y = classifier.load_data(data_path)
-    classifier.train(X, y)
-    
     model_path = os.path.join(script_dir, MODEL_PATH)
     scaler_path = os.path.join(script_dir, SCALER_PATH)
+    flat_path = os.path.join(script_dir, FLAT_MODEL_PATH)
+    
+    X, y = classifier.load_data(data_path, use_cache=not args.no_cache)
+    
+    # --export-flat : réexporte le modèle existant sans réentraîner
+    if args.export_flat:
+        classifier.load(model_path, scaler_path)
+        classifier.export_flat(flat_path, X_check=X)
+        sys.exit(0)
+    
+    # --compact : artefact compact servi avec AI_FLAT_MODEL_PATH=medical_model_compact.bin (ou --publish)
+    if args.compact:
+        classifier.load(model_path, scaler_path)
+        compact, report = classifier.compact(X, y, n_trees=args.trees, max_depth=args.depth, distill=args.distill)
+        compact.save(os.path.join(script_dir, COMPACT_MODEL_PATH))
+        with open(os.path.join(script_dir, COMPACT_REPORT_PATH), 'w') as f:
+            json.dump(report, f, indent=2)
+        print_compaction_report(report)
+        print(f"\n💾 Modèle compact ({report['chosen']}) exporté: {COMPACT_MODEL_PATH}, rapport: {COMPACT_REPORT_PATH}")
+        if args.publish:
+            metrics = {key: report['models'][report['chosen']][key] for key in ('accuracy', 'agreement')}
+            classifier.publish(metrics=metrics, training_data=data_path, flat=compact)
+        sys.exit(0)
+    
+    accuracy = classifier.train(X, y)
     classifier.save(model_path, scaler_path)
+    classifier.export_flat(flat_path, X_check=X)
+    
+    # --publish : nouvelle version dans le registre, servie à chaud par le backend
+    if args.publish:
+        classifier.publish(metrics={'accuracy': round(float(accuracy), 4)}, training_data=data_path)
     
     print("\n" + "=" * 60)
     print("TEST DE PRÉDICTION")
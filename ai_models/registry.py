@@ -0,0 +1,161 @@
+"""
+REGISTRE VERSIONNÉ DES MODÈLES
+Chaque version publiée est un dossier immuable contenant l'artefact aplati
+(model.bin, voir flat_forest.py) et un manifest.json : checksum, métriques,
+liste des features et classes. Le fichier CURRENT désigne la version servie
+et est remplacé par rename atomique ; MedicalAIService le surveille et bascule
+sur la nouvelle version sans redémarrage.
+
+    ai_models/registry/
+        CURRENT            -> "v0002"
+        v0001/model.bin
+        v0001/manifest.json
+        v0002/...
+
+Le dossier est ignoré par git (.gitignore) : publier une version ne laisse
+pas d'artefact binaire à committer par erreur.
+
+Utilisation en ligne de commande (depuis la racine du backend):
+    python -m ai_models.registry list
+    python -m ai_models.registry activate v0001
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import shutil
+import sys
+from datetime import datetime, timezone
+
+try:
+    from .flat_forest import FlatForest
+except ImportError:  # Exécution directe depuis ai_models/
+    from flat_forest import FlatForest
+
+REGISTRY_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'registry')
+ARTIFACT_NAME = 'model.bin'
+MANIFEST_NAME = 'manifest.json'
+CURRENT_NAME = 'CURRENT'
+
+
+def file_sha256(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _atomic_write_text(path, text):
+    tmp_path = f"{path}.tmp-{os.getpid()}"
+    with open(tmp_path, 'w') as f:
+        f.write(text)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+
+class ModelRegistry:
+    def __init__(self, root=REGISTRY_DIR):
+        self.root = root
+
+    def versions(self):
+        if not os.path.isdir(self.root):
+            return []
+        return sorted(
+            name for name in os.listdir(self.root)
+            if name.startswith('v') and os.path.isfile(os.path.join(self.root, name, MANIFEST_NAME))
+        )
+
+    def current_version(self):
+        """Version active, ou None si le registre est vide"""
+        try:
+            with open(os.path.join(self.root, CURRENT_NAME)) as f:
+                return f.read().strip() or None
+        except FileNotFoundError:
+            return None
+
+    def manifest(self, version):
+        with open(os.path.join(self.root, version, MANIFEST_NAME)) as f:
+            return json.load(f)
+
+    def load(self, version):
+        """Charge (mmap) l'artefact d'une version après vérification du checksum"""
+        manifest = self.manifest(version)
+        path = os.path.join(self.root, version, manifest['artifact'])
+        checksum = file_sha256(path)
+        if checksum != manifest['sha256']:
+            raise ValueError(f"Checksum invalide pour {version}: {checksum} != {manifest['sha256']}")
+        return FlatForest.load(path), manifest
+
+    def publish(self, flat, features, class_names, metrics=None, extra=None, activate=True):
+        """
+        Publie une nouvelle version. Le dossier est préparé à côté puis
+        renommé, une version n'est donc jamais visible à moitié écrite.
+        """
+        os.makedirs(self.root, exist_ok=True)
+        versions = self.versions()
+        version = f"v{int(versions[-1][1:]) + 1:04d}" if versions else 'v0001'
+
+        staging = os.path.join(self.root, f".{version}.tmp-{os.getpid()}")
+        os.makedirs(staging)
+        try:
+            artifact = os.path.join(staging, ARTIFACT_NAME)
+            flat.save(artifact)
+            manifest = {
+                'version': version,
+                'created_at': datetime.now(timezone.utc).isoformat(),
+                'artifact': ARTIFACT_NAME,
+                'sha256': file_sha256(artifact),
+                'size_bytes': os.path.getsize(artifact),
+                'features': list(features),
+                'classes': [int(c) for c in flat.classes],
+                'class_names': {str(k): v for k, v in class_names.items()},
+                'n_trees': flat.n_trees,
+                'n_nodes': flat.n_nodes,
+                'max_depth': flat.max_depth,
+                'metrics': metrics or {},
+                **(extra or {}),
+            }
+            _atomic_write_text(os.path.join(staging, MANIFEST_NAME), json.dumps(manifest, indent=2, ensure_ascii=False))
+            os.rename(staging, os.path.join(self.root, version))
+        except Exception:
+            shutil.rmtree(staging, ignore_errors=True)
+            raise
+
+        if activate:
+            self.activate(version)
+        return version
+
+    def activate(self, version):
+        """Désigne la version servie (rename atomique du fichier CURRENT)"""
+        if version not in self.versions():
+            raise ValueError(f"Version inconnue: {version}")
+        _atomic_write_text(os.path.join(self.root, CURRENT_NAME), version + '\n')
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Registre des modèles IA médicaux")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    subparsers.add_parser('list', help="Lister les versions publiées")
+    activate_parser = subparsers.add_parser('activate', help="Activer une version (rollback compris)")
+    activate_parser.add_argument('version')
+    args = parser.parse_args()
+
+    registry = ModelRegistry()
+    if args.command == 'list':
+        current = registry.current_version()
+        for version in registry.versions():
+            manifest = registry.manifest(version)
+            marker = '*' if version == current else ' '
+            print(f"{marker} {version}  {manifest['created_at']}  {manifest['n_trees']} arbres  "
+                  f"métriques: {json.dumps(manifest['metrics'])}")
+        if current is None:
+            print("Aucune version active (le service utilise medical_model_flat.bin)")
+    elif args.command == 'activate':
+        try:
+            registry.activate(args.version)
+        except ValueError as e:
+            sys.exit(str(e))
+        print(f"✅ Version active: {args.version}")
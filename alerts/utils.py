@@ -1,4 +1,6 @@
 # alerts/utils.py
+from django.conf import settings
+
 from .models import Alert
 
 def check_vital_signs(user, spo2, heart_rate, tcov, temp):
@@ -74,3 +76,60 @@ def check_vital_signs(user, spo2, heart_rate, tcov, temp):
     # Sauvegarder toutes les alertes générées
     for alert in alerts:
         alert.save()
+
+
+# Classes IA qui déclenchent une alerte (voir devices.ai_service.medical_classifier.CLASS_NAMES)
+AI_ALERT_LEVELS = {
+    2: 'warning',  # Infection modérée
+    3: 'danger',   # Hypoxie sévère
+}
+
+
+def build_ai_alert(user_id, ai_results):
+    """
+    Construit (sans l'enregistrer) une alerte pour le pire statut IA d'un lot de lectures.
+    Une seule alerte par lot pour ne pas inonder l'utilisateur.
+    Retourne None si aucune lecture ne nécessite d'alerte.
+    """
+    worst = max(ai_results, key=lambda result: result['status'], default=None)
+    if worst is None or worst['status'] not in AI_ALERT_LEVELS:
+        return None
+
+    return Alert(
+        user_id=user_id,
+        title=f"Analyse IA : {worst['status_name']}",
+        message=f"Le modèle IA a détecté un état « {worst['status_name']} » (confiance {worst['confidence']}%).",
+        level=AI_ALERT_LEVELS[worst['status']]
+    )
+
+
+# Paramètres suivis par devices.analytics
+ANOMALY_LABELS = {
+    'heart_rate': "Fréquence cardiaque",
+    'spo2': "SpO₂",
+    'temperature': "Température",
+    'cov_ppb': "COV",
+}
+
+
+def build_anomaly_alert(user_id, deviations):
+    """
+    Construit (sans l'enregistrer) une alerte pour les paramètres d'un lot qui
+    s'écartent de la référence personnelle du patient (devices.analytics).
+    deviations : {paramètre: pire z-score du lot}, déjà filtré au-delà de
+    ANALYTICS_Z_WARNING. Retourne None s'il n'y a pas d'écart.
+    """
+    if not deviations:
+        return None
+
+    worst = max(abs(z) for z in deviations.values())
+    details = ", ".join(
+        f"{ANOMALY_LABELS.get(signal, signal)} {'au-dessus' if z > 0 else 'en dessous'} ({abs(z):.1f} écarts-types)"
+        for signal, z in sorted(deviations.items(), key=lambda item: -abs(item[1]))
+    )
+    return Alert(
+        user_id=user_id,
+        title="Écart inhabituel de vos constantes",
+        message=f"Par rapport à vos valeurs habituelles : {details}.",
+        level='danger' if worst >= settings.ANALYTICS_Z_DANGER else 'warning'
+    )
@@ -1,6 +1,7 @@
 # alerts/views.py
 from rest_framework import viewsets
 from rest_framework.permissions import IsAuthenticated
+from users.cohort import invalidate_cohort
 from .models import Alert
 from .serializers import AlertSerializer
 
@@ -23,3 +24,13 @@ class AlertViewSet(viewsets.ModelViewSet):
     def perform_create(self, serializer):
         """Associe l'alerte à l'utilisateur connecté lors de la création"""
         serializer.save(user=self.request.user)
+        invalidate_cohort(self.request.user.medecin_id)
+
+    def perform_update(self, serializer):
+        """Les alertes non lues apparaissent dans la vue patientèle du médecin"""
+        serializer.save()
+        invalidate_cohort(self.request.user.medecin_id)
+
+    def perform_destroy(self, instance):
+        instance.delete()
+        invalidate_cohort(self.request.user.medecin_id)
@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import Device, SensorData
+from .models import Device, SensorData, PendingReading, RescoreCheckpoint, DeviceRollup, UserRollup, PatientBaseline
 
 
 @admin.register(Device)
@@ -18,7 +18,7 @@ class DeviceAdmin(admin.ModelAdmin):
 @admin.register(SensorData)
 class SensorDataAdmin(admin.ModelAdmin):
     list_display = ('device', 'heart_rate', 'spo2', 'temperature', 'ai_status_name', 'ai_confidence', 'created_at')
-    list_filter = ('ai_status', 'processed', 'created_at')
+    list_filter = ('ai_status', 'ai_model_version', 'processed', 'created_at')
     search_fields = ('device__name', 'device__user__username')
     readonly_fields = ('created_at',)
     ordering = ('-created_at',)
@@ -26,6 +26,45 @@ class SensorDataAdmin(admin.ModelAdmin):
     fieldsets = (
         ('Device', {'fields': ('device',)}),
         ('Données Capteur', {'fields': ('cov_ppb', 'eco2_ppm', 'heart_rate', 'spo2', 'temperature')}),
-        ('Résultat IA', {'fields': ('ai_status', 'ai_status_name', 'ai_confidence', 'ai_probabilities', 'processed')}),
+        ('Résultat IA', {'fields': ('ai_status', 'ai_status_name', 'ai_confidence', 'ai_probabilities', 'ai_model_version', 'processed')}),
         ('Métadonnées', {'fields': ('created_at',)}),
     )
+
+
+@admin.register(PendingReading)
+class PendingReadingAdmin(admin.ModelAdmin):
+    list_display = ('device', 'received_at', 'measured_at', 'attempts', 'last_error')
+    list_filter = ('attempts', 'received_at')
+    search_fields = ('device__name', 'device__user__username')
+    readonly_fields = ('received_at',)
+    ordering = ('id',)
+
+
+@admin.register(RescoreCheckpoint)
+class RescoreCheckpointAdmin(admin.ModelAdmin):
+    list_display = ('job', 'model_version', 'start_pk', 'end_pk', 'last_pk', 'rows_scored', 'completed', 'updated_at')
+    list_filter = ('job', 'completed')
+    readonly_fields = ('updated_at',)
+
+
+@admin.register(DeviceRollup)
+class DeviceRollupAdmin(admin.ModelAdmin):
+    list_display = ('device', 'resolution', 'bucket', 'count', 'status_0', 'status_1', 'status_2', 'status_3')
+    list_filter = ('resolution',)
+    search_fields = ('device__name', 'device__user__username')
+    ordering = ('-bucket',)
+
+
+@admin.register(UserRollup)
+class UserRollupAdmin(admin.ModelAdmin):
+    list_display = ('user', 'resolution', 'bucket', 'count', 'status_0', 'status_1', 'status_2', 'status_3')
+    list_filter = ('resolution',)
+    search_fields = ('user__username', 'user__email')
+    ordering = ('-bucket',)
+
+
+@admin.register(PatientBaseline)
+class PatientBaselineAdmin(admin.ModelAdmin):
+    list_display = ('user', 'count', 'last_at', 'updated_at')
+    search_fields = ('user__username', 'user__email')
+    readonly_fields = ('deviations', 'updated_at')
@@ -0,0 +1,162 @@
+"""
+Coordinateur de micro-batching pour l'inférence IA.
+
+Sous gunicorn en mode threads, plusieurs requêtes appellent le modèle au même
+moment avec une seule ligne chacune. Le coordinateur regroupe les appels
+concurrents arrivés dans une courte fenêtre (ou jusqu'à max_rows lignes),
+fait une seule inférence sur la matrice empilée et résout le Future de chaque
+appelant avec sa part du résultat.
+"""
+
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+import numpy as np
+
+
+class _PendingCall:
+    __slots__ = ('X', 'future', 'enqueued_at')
+
+    def __init__(self, X):
+        self.X = X
+        self.future = Future()
+        self.enqueued_at = time.monotonic()
+
+
+class MicroBatcher:
+    """
+    Regroupe les appels concurrents à infer(X) -> (statuts, probabilités, version du modèle).
+
+    Le thread de traitement est démarré au premier appel dans chaque process
+    (et redémarré après un fork), jamais dans le master gunicorn.
+    """
+
+    def __init__(self, infer, window_ms=2.0, max_rows=64):
+        self.infer = infer
+        self.window = window_ms / 1000
+        self.max_rows = max_rows
+        self._lock = threading.Lock()
+        self._queue = queue.Queue()
+        self._thread = None
+        self._pid = None
+        self._reset_stats()
+
+    def _reset_stats(self):
+        self._batches = 0
+        self._calls = 0
+        self._rows = 0
+        self._max_batch_rows = 0
+        self._flush_full = 0
+        self._flush_window = 0
+        self._wait_seconds = 0.0
+        self._cancelled = 0
+        # Histogramme des tailles de lot par puissances de 2 (1, 2, 4, ..., 64+)
+        self._histogram = {}
+
+    def submit(self, X):
+        """Ajoute X (n, 5) au prochain lot ; retourne un Future (statuts, probabilités)"""
+        self._ensure_worker()
+        call = _PendingCall(X)
+        self._queue.put(call)
+        return call.future
+
+    def _ensure_worker(self):
+        pid = os.getpid()
+        if self._pid == pid and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._pid == pid and self._thread.is_alive():
+                return
+            if self._pid != pid:
+                # Process fils après un fork : ne pas réutiliser l'état du parent
+                self._queue = queue.Queue()
+                self._reset_stats()
+            self._thread = threading.Thread(target=self._run, name='ai-microbatch', daemon=True)
+            self._pid = pid
+            self._thread.start()
+
+    def _run(self):
+        while True:
+            first = self._queue.get()
+            calls = [first]
+            rows = len(first.X)
+            deadline = time.monotonic() + self.window
+
+            while rows < self.max_rows:
+                timeout = deadline - time.monotonic()
+                if timeout <= 0:
+                    break
+                try:
+                    call = self._queue.get(timeout=timeout)
+                except queue.Empty:
+                    break
+                calls.append(call)
+                rows += len(call.X)
+
+            try:
+                self._process(calls)
+            except Exception as e:
+                # Le thread ne doit jamais s'arrêter : les appelants restants reçoivent l'erreur
+                for call in calls:
+                    if not call.future.done():
+                        call.future.set_exception(e)
+
+    def _process(self, calls):
+        started = time.monotonic()
+        # Appels annulés par leur appelant (délai dépassé) : ignorés ; les autres ne sont plus annulables
+        pending = len(calls)
+        calls = [call for call in calls if call.future.set_running_or_notify_cancel()]
+        with self._lock:
+            self._cancelled += pending - len(calls)
+        if not calls:
+            return
+        rows = sum(len(call.X) for call in calls)
+        try:
+            result = self.infer(np.concatenate([call.X for call in calls]))
+        except Exception as e:
+            for call in calls:
+                call.future.set_exception(e)
+        else:
+            # Les tableaux (n, ...) sont découpés par appel, le reste (version du modèle) est transmis tel quel
+            offset = 0
+            for call in calls:
+                end = offset + len(call.X)
+                call.future.set_result(tuple(
+                    part[offset:end] if isinstance(part, np.ndarray) else part for part in result
+                ))
+                offset = end
+
+        with self._lock:
+            self._batches += 1
+            self._calls += len(calls)
+            self._rows += rows
+            self._max_batch_rows = max(self._max_batch_rows, rows)
+            if rows >= self.max_rows:
+                self._flush_full += 1
+            else:
+                self._flush_window += 1
+            self._wait_seconds += sum(started - call.enqueued_at for call in calls)
+            bucket = str(min(1 << (rows - 1).bit_length(), self.max_rows))
+            self._histogram[bucket] = self._histogram.get(bucket, 0) + 1
+
+    def stats(self):
+        """Statistiques du process courant : file d'attente et tailles de lot"""
+        with self._lock:
+            return {
+                'window_ms': self.window * 1000,
+                'max_rows': self.max_rows,
+                'queue_depth': self._queue.qsize(),
+                'batches': self._batches,
+                'calls': self._calls,
+                'rows': self._rows,
+                'mean_batch_rows': round(self._rows / self._batches, 2) if self._batches else 0,
+                'max_batch_rows': self._max_batch_rows,
+                'mean_wait_ms': round(self._wait_seconds * 1000 / self._calls, 3) if self._calls else 0,
+                'flush_full': self._flush_full,
+                'flush_window': self._flush_window,
+                'cancelled': self._cancelled,
+                'batch_rows_histogram': dict(sorted(self._histogram.items(), key=lambda item: int(item[0]))),
+            }
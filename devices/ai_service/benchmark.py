@@ -0,0 +1,87 @@
+"""
+Micro-benchmark de l'inférence du modèle IA médical.
+
+Compare, pour plusieurs tailles de lot, le chemin historique (predict puis
+predict_proba sklearn, mise en forme ligne par ligne), MedicalAIService.predict_batch
+sur le backend sklearn (un seul predict_proba, mise en forme vectorisée) et
+predict_batch sur le backend par défaut (forêt aplatie).
+
+Exécuter depuis la racine du backend:
+    python -m devices.ai_service.benchmark
+    python -m devices.ai_service.benchmark --sizes 1 16 256 4096 --repeat 50
+"""
+
+import argparse
+import os
+import time
+
+import joblib
+import numpy as np
+
+from ai_models.data_cache import load_training_data
+from ai_models.inference import CLASS_NAMES, SklearnBackend, predict_many, to_dicts
+from .medical_classifier import AI_MODEL_DIR, MODEL_PATH, SCALER_PATH, ai_service
+
+DATA_PATH = os.path.join(AI_MODEL_DIR, 'medical_training_data.csv')
+
+
+_sklearn = SklearnBackend(joblib.load(MODEL_PATH), joblib.load(SCALER_PATH))
+
+
+def legacy_predict_batch(X):
+    """Chemin d'origine : la forêt est parcourue deux fois et chaque ligne est formatée en Python"""
+    X_scaled = _sklearn.scaler.transform(X)
+    predictions = _sklearn.model.predict(X_scaled)
+    probabilities = _sklearn.model.predict_proba(X_scaled)
+    return [{
+        'status': int(prediction),
+        'status_name': CLASS_NAMES[prediction],
+        'confidence': round(proba[prediction] * 100, 2),
+        'probabilities': {CLASS_NAMES[i]: round(p*100, 2) for i, p in enumerate(proba)}
+    } for prediction, proba in zip(predictions, probabilities)]
+
+
+def sklearn_predict_batch(X):
+    """predict_batch avec le backend sklearn : une passe, mise en forme vectorisée"""
+    return to_dicts(predict_many(X, _sklearn))
+
+
+def time_call(func, X, repeat):
+    """Temps par appel en millisecondes (médiane et p90)"""
+    func(X)  # Échauffement
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func(X)
+        timings.append((time.perf_counter() - start) * 1000)
+    return np.median(timings), np.percentile(timings, 90)
+
+
+def run(sizes, repeat, seed=42):
+    if not ai_service.load_model():
+        raise SystemExit("Modèle IA non disponible")
+
+    pool, _, _ = load_training_data(DATA_PATH)
+    rng = np.random.default_rng(seed)
+
+    print(f"Backend par défaut: {ai_service.backend_name}")
+    print(f"{'lot':>6} | {'historique (ms)':>15} | {'sklearn x1 (ms)':>15} | {'predict_batch (ms)':>25} | {'µs/lecture':>10} | gain")
+    print("-" * 92)
+    for size in sizes:
+        X = pool[rng.integers(0, len(pool), size)]
+        legacy_median, _ = time_call(legacy_predict_batch, X, repeat)
+        sklearn_median, _ = time_call(sklearn_predict_batch, X, repeat)
+        batch_median, batch_p90 = time_call(ai_service.predict_batch, X, repeat)
+        print(
+            f"{size:>6} | {legacy_median:>15.3f} | {sklearn_median:>15.3f} | "
+            f"{batch_median:>10.3f} (p90 {batch_p90:>8.3f}) | "
+            f"{batch_median * 1000 / size:>10.1f} | x{legacy_median / batch_median:.1f}"
+        )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark de l'inférence du modèle IA médical")
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1, 16, 256, 4096])
+    parser.add_argument('--repeat', type=int, default=30)
+    args = parser.parse_args()
+    run(args.sizes, args.repeat)
@@ -5,15 +5,20 @@ Service d'intégration du modèle IA médical pour le backend Django
 import numpy as np
 import os
 import joblib
+import threading
+import time
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from concurrent.futures.process import BrokenProcessPool
 
-FEATURES = ['cov_ppb', 'eco2_ppm', 'heart_rate', 'spo2', 'temperature']
-
-CLASS_NAMES = {
-    0: 'Sain',
-    1: 'Infection légère',
-    2: 'Infection modérée',
-    3: 'Hypoxie sévère'
-}
+from ai_models.flat_forest import FlatForest
+from ai_models.inference import (
+    CLASS_NAMES, FEATURES, SklearnBackend, as_matrix, build_predictions, to_dicts,
+)
+from ai_models.registry import ModelRegistry, file_sha256
+from .batching import MicroBatcher
+from .prediction_cache import PredictionCache
+from .process_pool import InferencePool
+from .shadow import ShadowEvaluator
 
 # Chemin vers les fichiers du modèle (dans le dossier ai_models du backend)
 AI_MODEL_DIR = os.path.join(
@@ -22,40 +27,232 @@ AI_MODEL_DIR = os.path.join(
 )
 MODEL_PATH = os.path.join(AI_MODEL_DIR, 'medical_model.pkl')
 SCALER_PATH = os.path.join(AI_MODEL_DIR, 'medical_scaler.pkl')
+FLAT_MODEL_PATH = os.path.join(AI_MODEL_DIR, 'medical_model_flat.bin')
+MODEL_REGISTRY_DIR = os.path.join(AI_MODEL_DIR, 'registry')
+
+# Lectures de référence pour valider le modèle au démarrage (Sain, Hypoxie sévère)
+WARMUP_READINGS = [
+    [400, 420, 75, 98, 36.8],
+    [1000, 650, 125, 82, 39.2],
+]
+
+
+def _setting(name, default):
+    """Lit un réglage Django s'il est disponible (le service reste utilisable hors Django)"""
+    from django.conf import settings
+    if not settings.configured:
+        return default
+    return getattr(settings, name, default)
+
+
+def load_backend(source):
+    """
+    Charge un backend d'inférence à partir de sa source :
+    ('registry', dossier, version), ('flat', chemin) ou ('sklearn', modèle, scaler).
+    Utilisé aussi par les process du pool d'inférence (process_pool.py).
+    """
+    kind = source[0]
+    if kind == 'registry':
+        backend, _ = ModelRegistry(source[1]).load(source[2])
+        return backend
+    if kind == 'flat':
+        return FlatForest.load(source[1])
+    if kind == 'sklearn':
+        return SklearnBackend(joblib.load(source[1]), joblib.load(source[2]))
+    raise ValueError(f"Source de modèle inconnue: {source!r}")
 
 
 class MedicalAIService:
     """Service singleton pour les prédictions IA médicales"""
     
     _instance = None
-    _model = None
-    _scaler = None
+    # (backend, version, source) : remplacé en une seule affectation lors d'un rechargement à chaud
+    _active = None
     _is_loaded = False
+    _batcher = None
+    _prediction_cache = None
+    _process_pool = None
+    _shadow = None
+    _shadow_error = None
+    pool_fallbacks = 0
+    _watcher_pid = None
+    _lock = threading.Lock()
+    backend_name = None
+    is_validated = False
+    load_seconds = None
+    loaded_pid = None
+    reloads = 0
+    last_reload_error = None
+    _rejected_version = None
     
     def __new__(cls):
         if cls._instance is None:
             cls._instance = super().__new__(cls)
         return cls._instance
     
+    @property
+    def model_version(self):
+        active = self._active
+        return active[1] if active is not None else None
+    
     def load_model(self):
-        """Charge le modèle et le scaler"""
+        """
+        Charge le modèle et le scaler.
+        Ordre de priorité : version active du registre (MODEL_REGISTRY_DIR),
+        puis modèle aplati (FLAT_MODEL_PATH), puis pickles sklearn.
+        Le modèle aplati est mappé en lecture seule, tous les workers
+        partagent donc les mêmes pages mémoire.
+        """
         if self._is_loaded:
             return True
         
+        with self._lock:
+            if self._is_loaded:
+                return True
+            return self._load()
+    
+    def _load(self):
+        started = time.perf_counter()
         try:
-            if not os.path.exists(MODEL_PATH):
+            # AI_FLAT_MODEL_PATH : autre artefact plat, ex. medical_model_compact.bin (relatif à ai_models/)
+            flat_path = os.path.join(AI_MODEL_DIR, _setting('AI_FLAT_MODEL_PATH', None) or FLAT_MODEL_PATH)
+            registry_version = ModelRegistry(MODEL_REGISTRY_DIR).current_version()
+            registry_backend = self._load_version(registry_version) if registry_version else None
+            if registry_backend is not None:
+                self._active = (registry_backend, registry_version, ('registry', MODEL_REGISTRY_DIR, registry_version))
+                self.backend_name = 'flat'
+                path = f"{MODEL_REGISTRY_DIR} ({registry_version})"
+            elif os.path.exists(flat_path):
+                source = ('flat', flat_path)
+                self._active = (load_backend(source), f"flat-{file_sha256(flat_path)[:12]}", source)
+                self.backend_name = 'flat'
+                path = flat_path
+            elif os.path.exists(MODEL_PATH):
+                source = ('sklearn', MODEL_PATH, SCALER_PATH)
+                self._active = (load_backend(source), f"sklearn-{file_sha256(MODEL_PATH)[:12]}", source)
+                self.backend_name = 'sklearn'
+                path = MODEL_PATH
+            else:
                 print(f"⚠️ Modèle non trouvé: {MODEL_PATH}")
                 return False
             
-            self._model = joblib.load(MODEL_PATH)
-            self._scaler = joblib.load(SCALER_PATH)
+            self.load_seconds = time.perf_counter() - started
+            self.loaded_pid = os.getpid()
+            # Validé ici et pas seulement dans warm_up : un worker qui charge le modèle à la
+            # première prédiction (sans préchargement) doit aussi répondre 200 sur /ai/health
+            self.is_validated = self._validate(self._active[0])
             self._is_loaded = True
-            print(f"✅ Modèle IA chargé depuis: {MODEL_PATH}")
+            print(f"✅ Modèle IA chargé depuis: {path} (backend {self.backend_name}, {self.load_seconds * 1000:.0f} ms)")
+            if not self.is_validated:
+                print("❌ Le modèle chargé ne passe pas la validation")
             return True
         except Exception as e:
             print(f"❌ Erreur chargement modèle: {e}")
             return False
     
+    @staticmethod
+    def _check_manifest(manifest):
+        if manifest['features'] != FEATURES:
+            raise ValueError(f"Features du modèle {manifest['version']} incompatibles: {manifest['features']}")
+    
+    @staticmethod
+    def _validate(backend):
+        """Vérifie un backend sur les lectures de référence (forme et somme des probabilités)"""
+        try:
+            probabilities = backend.predict_proba(np.array(WARMUP_READINGS, dtype=float))
+            statuses = backend.classes[np.argmax(probabilities, axis=1)]
+            return bool(
+                probabilities.shape == (len(WARMUP_READINGS), len(CLASS_NAMES))
+                and np.allclose(probabilities.sum(axis=1), 1.0)
+                and set(statuses.tolist()) <= set(CLASS_NAMES)
+            )
+        except Exception as e:
+            print(f"❌ Validation du modèle impossible: {e}")
+            return False
+    
+    def warm_up(self):
+        """
+        Charge le modèle et le valide sur des lectures de référence.
+        Appelé dans le master gunicorn avant le fork (gunicorn.conf.py) pour
+        que les workers héritent du modèle déjà chargé.
+        """
+        if not self.load_model():
+            return False
+        return self.is_validated
+    
+    def reload_model(self, version=None):
+        """
+        Bascule à chaud sur une version du registre (la version active par défaut).
+        Le nouveau modèle est chargé et validé à côté de l'ancien, puis les deux
+        sont échangés en une seule affectation : les prédictions en cours
+        terminent sur l'ancien modèle, aucune n'attend le chargement.
+        """
+        version = version or ModelRegistry(MODEL_REGISTRY_DIR).current_version()
+        if version is None or version == self.model_version:
+            return False
+        
+        backend = self._load_version(version)
+        if backend is None:
+            return False
+        
+        previous = self.model_version
+        self._active = (backend, version, ('registry', MODEL_REGISTRY_DIR, version))
+        self.backend_name = 'flat'
+        self._is_loaded = True
+        self.is_validated = True
+        self.reloads += 1
+        self.last_reload_error = None
+        print(f"🔄 Modèle IA rechargé à chaud: {previous} -> {version}")
+        return True
+    
+    def _load_version(self, version):
+        """
+        Charge et valide une version du registre. En cas d'échec l'erreur est
+        conservée et la version n'est plus retentée par la surveillance.
+        """
+        try:
+            backend, manifest = ModelRegistry(MODEL_REGISTRY_DIR).load(version)
+            self._check_manifest(manifest)
+            if not self._validate(backend):
+                raise ValueError("validation sur les lectures de référence échouée")
+            return backend
+        except Exception as e:
+            self.last_reload_error = f"{version}: {e}"
+            self._rejected_version = version
+            print(f"❌ Chargement du modèle {version} impossible: {e}")
+            return None
+    
+    def _ensure_watcher(self):
+        """
+        Démarre (une fois par process) le thread qui surveille le fichier
+        CURRENT du registre toutes les AI_MODEL_RELOAD_INTERVAL secondes.
+        """
+        pid = os.getpid()
+        if self._watcher_pid == pid:
+            return
+        interval = _setting('AI_MODEL_RELOAD_INTERVAL', 30)
+        with self._lock:
+            if self._watcher_pid == pid:
+                return
+            self._watcher_pid = pid
+            if not interval:
+                return
+            thread = threading.Thread(
+                target=self._watch_registry, args=(interval,), name='ai-model-watcher', daemon=True
+            )
+            thread.start()
+    
+    def _watch_registry(self, interval):
+        registry = ModelRegistry(MODEL_REGISTRY_DIR)
+        while True:
+            time.sleep(interval)
+            try:
+                version = registry.current_version()
+                if version not in (None, self.model_version, self._rejected_version):
+                    self.reload_model(version)
+            except Exception as e:
+                self.last_reload_error = str(e)
+    
     def predict(self, cov_ppb, eco2_ppm, heart_rate, spo2, temperature):
         """
         Prédit l'état de santé à partir des paramètres du capteur
@@ -70,38 +267,276 @@ class MedicalAIService:
         Returns:
             dict avec status, status_name, confidence, probabilities
         """
+        return self.predict_batch([[cov_ppb, eco2_ppm, heart_rate, spo2, temperature]])[0]
+    
+    def predict_batch(self, X):
+        """
+        Prédit l'état de santé pour plusieurs lectures en un seul passage du modèle
+        
+        Args:
+            X: matrice (n, 5) dont les colonnes suivent l'ordre de FEATURES
+            
+        Returns:
+            liste de n dicts au même format que predict()
+        """
+        X = as_matrix(X)
+        try:
+            predictions, version = self.predict_many(X, with_version=True)
+            return to_dicts(predictions, version)
+        except Exception as e:
+            return [_error_result(str(e)) for _ in range(len(X))]
+    
+    def predict_many(self, X, with_version=False):
+        """
+        API vectorielle du service (voir ai_models.inference.predict_many) :
+        cache, micro-batching, pool de process et rechargement à chaud compris.
+        Contrairement à predict_batch, les erreurs sont levées.
+        
+        Returns:
+            tableau structuré (n,) de PREDICTION_DTYPE, ou
+            (tableau, version du modèle) si with_version
+        """
+        X = as_matrix(X)
         if not self._is_loaded:
             if not self.load_model():
-                return {
-                    'status': -1,
-                    'status_name': 'Erreur',
-                    'confidence': 0,
-                    'probabilities': {},
-                    'error': 'Modèle IA non disponible'
-                }
+                raise RuntimeError('Modèle IA non disponible')
+        self._ensure_watcher()
         
-        try:
-            X = np.array([[cov_ppb, eco2_ppm, heart_rate, spo2, temperature]])
-            X_scaled = self._scaler.transform(X)
-            
-            prediction = self._model.predict(X_scaled)[0]
-            probabilities = self._model.predict_proba(X_scaled)[0]
-            confidence = probabilities[prediction] * 100
-            
+        cache = self.get_prediction_cache()
+        if cache is not None and np.isfinite(X).all():
+            statuses, probabilities, version = self._predict_proba_cached(cache, X)
+        else:
+            statuses, probabilities, version = self.predict_proba(X)
+        predictions = build_predictions(statuses, probabilities)
+        
+        shadow = self.get_shadow()
+        if shadow is not None:
+            shadow.offer(X, statuses, version)
+        return (predictions, version) if with_version else predictions
+    
+    def predict_proba(self, X):
+        """
+        Passe unique dans la forêt : les classes sont l'argmax des probabilités
+        (c'est exactement ce que fait RandomForestClassifier.predict)
+        
+        Si le micro-batching est activé (AI_MICROBATCH_ENABLED), les petits
+        appels concurrents sont regroupés en une seule inférence.
+        
+        Returns:
+            (statuts (n,), probabilités (n, 4), version du modèle)
+        """
+        batcher = self.get_batcher()
+        if batcher is not None and len(X) < batcher.max_rows:
+            future = batcher.submit(X)
+            try:
+                return future.result(timeout=_setting('AI_MICROBATCH_TIMEOUT', 1.0))
+            except FutureTimeoutError:
+                # Coordinateur saturé : inférence directe plutôt que d'échouer
+                future.cancel()
+        return self._predict_proba_direct(X)
+    
+    def _predict_proba_cached(self, cache, X):
+        """
+        predict_proba derrière le cache des lectures quantifiées : seules les
+        lignes absentes du cache passent par la forêt, sur leurs valeurs
+        brutes (la clé quantifiée ne sert qu'à la recherche et au stockage).
+        """
+        keys, _ = cache.quantize(X)
+        version = self.model_version
+        cached = cache.get_many(keys, version)
+        missing = [i for i, entry in enumerate(cached) if entry is None]
+        if not missing:
+            return (
+                np.array([entry[0] for entry in cached], dtype=np.int64),
+                np.array([entry[1] for entry in cached], dtype=float),
+                version,
+            )
+        
+        missing_statuses, missing_probabilities, missing_version = self.predict_proba(X[missing])
+        cache.set_many([keys[i] for i in missing], missing_statuses, missing_probabilities, missing_version)
+        if missing_version != version:
+            # Rechargement pendant l'appel : tout le lot est recalculé sur la nouvelle version
+            return self.predict_proba(X)
+        
+        statuses = np.empty(len(X), dtype=np.int64)
+        probabilities = np.empty((len(X), missing_probabilities.shape[1]), dtype=float)
+        statuses[missing] = missing_statuses
+        probabilities[missing] = missing_probabilities
+        hits = [i for i, entry in enumerate(cached) if entry is not None]
+        if hits:
+            statuses[hits] = [cached[i][0] for i in hits]
+            probabilities[hits] = [cached[i][1] for i in hits]
+        return statuses, probabilities, version
+    
+    def _predict_proba_direct(self, X):
+        # Instantané : un rechargement concurrent ne mélange pas deux versions
+        backend, version, source = self._active
+        early_exit = self._early_exit_options(backend, X)
+        
+        probabilities = None
+        pool = self.get_process_pool()
+        if pool is not None and len(X) >= _setting('AI_PROCESS_POOL_MIN_ROWS', 1):
+            try:
+                probabilities = pool.predict_proba(source, X, len(backend.classes), early_exit)
+            except Exception as e:
+                if not _setting('AI_PROCESS_POOL_FALLBACK', True):
+                    raise
+                self.pool_fallbacks += 1
+                if isinstance(e, BrokenProcessPool):
+                    # Un process du pool est mort : le pool sera recréé au prochain appel
+                    self._process_pool = None
+                    pool.shutdown()
+        
+        if probabilities is None:
+            if early_exit is not None:
+                probabilities, _ = backend.predict_proba_early(X, **early_exit)
+            else:
+                probabilities = backend.predict_proba(X)
+        statuses = backend.classes[np.argmax(probabilities, axis=1)]
+        return statuses, probabilities, version
+    
+    @staticmethod
+    def _early_exit_options(backend, X):
+        """
+        Paramètres de l'évaluation progressive de la forêt (AI_EARLY_EXIT_ENABLED),
+        ou None. Backend plat uniquement. Chaque paquet d'arbres coûte un
+        parcours complet en profondeur : elle n'est rentable qu'à partir de
+        AI_EARLY_EXIT_MIN_ROWS lignes (voir ai_models/early_exit_report.py).
+        """
+        if (
+            _setting('AI_EARLY_EXIT_ENABLED', False)
+            and hasattr(backend, 'predict_proba_early')
+            and len(X) >= _setting('AI_EARLY_EXIT_MIN_ROWS', 32)
+        ):
             return {
-                'status': int(prediction),
-                'status_name': CLASS_NAMES[prediction],
-                'confidence': round(confidence, 2),
-                'probabilities': {CLASS_NAMES[i]: round(p*100, 2) for i, p in enumerate(probabilities)}
+                'chunk_size': _setting('AI_EARLY_EXIT_CHUNK', 20),
+                'confidence': _setting('AI_EARLY_EXIT_CONFIDENCE', None),
             }
-        except Exception as e:
+        return None
+    
+    def get_process_pool(self):
+        """
+        Pool de process d'inférence du worker courant (None si
+        AI_PROCESS_POOL_SIZE vaut 0). Créé à la demande, et recréé dans un
+        process forké : les process d'un pool n'appartiennent qu'à son créateur.
+        """
+        processes = _setting('AI_PROCESS_POOL_SIZE', 0)
+        if not processes:
+            return None
+        pool = self._process_pool
+        if pool is None or pool.pid != os.getpid():
+            with self._lock:
+                pool = self._process_pool
+                if pool is None or pool.pid != os.getpid():
+                    pool = self._process_pool = InferencePool(
+                        self._active[2],
+                        processes=processes,
+                        timeout=_setting('AI_PROCESS_POOL_TIMEOUT', 2.0),
+                    )
+        return pool
+    
+    def get_batcher(self):
+        """Coordinateur de micro-batching, créé à la demande (None si désactivé)"""
+        if self._batcher is None and _setting('AI_MICROBATCH_ENABLED', False):
+            with self._lock:
+                if self._batcher is None:
+                    self._batcher = MicroBatcher(
+                        self._predict_proba_direct,
+                        window_ms=_setting('AI_MICROBATCH_WINDOW_MS', 2.0),
+                        max_rows=_setting('AI_MICROBATCH_MAX_ROWS', 64),
+                    )
+        return self._batcher
+    
+    def get_prediction_cache(self):
+        """Cache des lectures quantifiées, créé à la demande (None si désactivé)"""
+        if self._prediction_cache is None and _setting('AI_PREDICTION_CACHE_ENABLED', False):
+            with self._lock:
+                if self._prediction_cache is None:
+                    self._prediction_cache = PredictionCache(
+                        FEATURES, max_size=_setting('AI_PREDICTION_CACHE_SIZE', 10000)
+                    )
+        return self._prediction_cache
+    
+    def get_shadow(self):
+        """
+        Évaluation du modèle candidat AI_SHADOW_MODEL (version du registre ou
+        artefact plat de ai_models/), None si désactivée. Le thread de fond
+        est propre au process : l'évaluateur est recréé après un fork.
+        """
+        name = _setting('AI_SHADOW_MODEL', None)
+        if not name:
+            return None
+        shadow = self._shadow
+        if shadow is not None and shadow.pid == os.getpid() and shadow.candidate_name == name:
+            return shadow
+        if self._shadow_error is not None and self._shadow_error[0] == name:
+            return None
+        
+        with self._lock:
+            shadow = self._shadow
+            if shadow is None or shadow.pid != os.getpid() or shadow.candidate_name != name:
+                if name in ModelRegistry(MODEL_REGISTRY_DIR).versions():
+                    source = ('registry', MODEL_REGISTRY_DIR, name)
+                else:
+                    source = ('flat', os.path.join(AI_MODEL_DIR, name))
+                try:
+                    candidate = load_backend(source)
+                except Exception as e:
+                    self._shadow_error = (name, str(e))
+                    print(f"❌ Modèle candidat {name} indisponible: {e}")
+                    return None
+                shadow = self._shadow = ShadowEvaluator(
+                    candidate,
+                    name,
+                    sample_rate=_setting('AI_SHADOW_SAMPLE_RATE', 0.05),
+                    queue_size=_setting('AI_SHADOW_QUEUE_SIZE', 256),
+                )
+        return shadow
+    
+    def shadow_report(self):
+        """Rapport du modèle candidat pour le process courant"""
+        shadow = self.get_shadow()
+        if shadow is None:
+            error = self._shadow_error
             return {
-                'status': -1,
-                'status_name': 'Erreur',
-                'confidence': 0,
-                'probabilities': {},
-                'error': str(e)
+                'enabled': False,
+                'candidate': _setting('AI_SHADOW_MODEL', None),
+                'error': error[1] if error is not None else None,
             }
+        return {'enabled': True, 'pid': os.getpid(), **shadow.report()}
+    
+    def stats(self):
+        """État du service : backend chargé, micro-batching et cache des prédictions"""
+        batcher = self._batcher
+        prediction_cache = self._prediction_cache
+        process_pool = self._process_pool
+        return {
+            'loaded': self._is_loaded,
+            'validated': self.is_validated,
+            'backend': self.backend_name,
+            'model_version': self.model_version,
+            'reloads': self.reloads,
+            'last_reload_error': self.last_reload_error,
+            'load_ms': round(self.load_seconds * 1000, 1) if self.load_seconds is not None else None,
+            # Différent du pid courant si le modèle a été préchargé par le master gunicorn
+            'loaded_pid': self.loaded_pid,
+            'pid': os.getpid(),
+            'microbatch': batcher.stats() if batcher is not None else None,
+            'prediction_cache': prediction_cache.stats() if prediction_cache is not None else None,
+            'process_pool': dict(
+                process_pool.stats(), fallbacks=self.pool_fallbacks
+            ) if process_pool is not None else None,
+        }
+
+
+def _error_result(message):
+    return {
+        'status': -1,
+        'status_name': 'Erreur',
+        'confidence': 0,
+        'probabilities': {},
+        'error': message
+    }
 
 
 # Instance globale du service
@@ -117,3 +552,25 @@ def predict_health_status(cov_ppb, eco2_ppm, heart_rate, spo2, temperature):
         print(result['status_name'])  # 'Sain'
     """
     return ai_service.predict(cov_ppb, eco2_ppm, heart_rate, spo2, temperature)
+
+
+def predict_many(X, with_version=False):
+    """
+    Prédiction vectorielle : tableau structuré (status, confidence, probabilities)
+    
+    Exemple:
+        predictions = predict_many([[400, 420, 75, 98, 36.8], [1000, 650, 125, 82, 39.2]])
+        print(predictions['status'])  # [0 3]
+    """
+    return ai_service.predict_many(X, with_version=with_version)
+
+
+def predict_health_status_batch(X):
+    """
+    Fonction utilitaire pour prédire l'état de santé de plusieurs lectures
+    
+    Exemple:
+        results = predict_health_status_batch([[400, 420, 75, 98, 36.8], [1000, 650, 125, 82, 39.2]])
+        print([r['status_name'] for r in results])  # ['Sain', 'Hypoxie sévère']
+    """
+    return ai_service.predict_batch(X)
@@ -0,0 +1,100 @@
+"""
+Cache des prédictions IA sur les lectures quantifiées.
+
+Un patient en bonne santé envoie toute la journée des lectures quasi
+identiques : fréquence cardiaque au bpm près, SpO2 et température au dixième.
+Les 5 valeurs sont ramenées à la résolution du capteur et servent de clé
+d'un cache LRU borné. L'inférence se fait toujours sur les valeurs brutes :
+une lecture absente du cache a exactement la prédiction sans cache. Une
+lecture trouvée reçoit celle de la première lecture de même clé, qui n'en
+diffère que sous la résolution du capteur.
+
+Les entrées sont liées à la version du modèle : dès qu'une autre version est
+servie (rechargement à chaud du registre), le cache est vidé.
+"""
+
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+# Résolution des capteurs (unité de la valeur envoyée par le hardware)
+SENSOR_RESOLUTION = {
+    'cov_ppb': 1.0,
+    'eco2_ppm': 1.0,
+    'heart_rate': 1.0,
+    'spo2': 0.1,
+    'temperature': 0.1,
+}
+
+
+class PredictionCache:
+    """Cache LRU thread-safe : lecture quantifiée -> (statut, probabilités)"""
+
+    def __init__(self, features, max_size=10000, resolution=SENSOR_RESOLUTION):
+        self.max_size = max_size
+        self.resolution = np.array([resolution[name] for name in features], dtype=float)
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._version = None
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    def quantize(self, X):
+        """
+        Returns:
+            (clés hashables, une par ligne ; matrice des valeurs quantifiées)
+        """
+        steps = np.rint(X / self.resolution).astype(np.int64)
+        return [tuple(row) for row in steps.tolist()], steps * self.resolution
+
+    def get_many(self, keys, version):
+        """Résultat en cache de chaque clé pour cette version du modèle, None si absent"""
+        with self._lock:
+            if version != self._version:
+                self._reset(version)
+            results = []
+            for key in keys:
+                entry = self._entries.get(key)
+                if entry is not None:
+                    self._entries.move_to_end(key)
+                results.append(entry)
+            found = sum(entry is not None for entry in results)
+            self.hits += found
+            self.misses += len(keys) - found
+            return results
+
+    def set_many(self, keys, statuses, probabilities, version):
+        with self._lock:
+            # Modèle remplacé pendant l'inférence : résultats d'une autre version
+            if version != self._version:
+                return
+            for key, status, row in zip(keys, statuses.tolist(), probabilities.tolist()):
+                self._entries[key] = (status, tuple(row))
+                self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def _reset(self, version):
+        if self._entries:
+            self.invalidations += 1
+        self._entries.clear()
+        self._version = version
+
+    def clear(self):
+        with self._lock:
+            self._reset(None)
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'size': len(self._entries),
+                'max_size': self.max_size,
+                'model_version': self._version,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': round(self.hits / lookups, 4) if lookups else 0.0,
+                'invalidations': self.invalidations,
+            }
@@ -0,0 +1,216 @@
+"""
+Pool de process pour l'inférence IA.
+
+Sous gunicorn en mode threads, le parcours de la forêt garde le GIL et bloque
+les autres threads du worker (chat, tableaux de bord). Avec
+AI_PROCESS_POOL_SIZE > 0, l'inférence est déléguée à quelques process qui
+chargent le modèle une fois chacun ; le thread appelant attend le résultat
+sans tenir le GIL.
+
+Les entrées et les probabilités transitent par des segments de mémoire
+partagée (multiprocessing.shared_memory) : seuls leurs noms et la forme de la
+matrice passent par le pipe du pool. Les segments sont réutilisés d'un appel
+à l'autre (un par appel concurrent) et restent attachés dans les process du
+pool ; seuls les lots plus grands que slot_rows ont des segments dédiés.
+
+Après un timeout, le process du pool peut encore écrire dans les segments de
+l'appel abandonné : ils ne sont rendus (ou libérés) que par le callback de
+fin de la tâche, et comptés comme occupés d'ici là.
+"""
+
+import atexit
+import multiprocessing
+import os
+import queue
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from multiprocessing.shared_memory import SharedMemory
+
+import numpy as np
+
+# Backend chargé dans un process du pool, par source (voir medical_classifier.load_backend)
+_worker_backends = {}
+# Segments déjà attachés dans un process du pool, par nom
+_worker_segments = {}
+
+
+def _worker_backend(source):
+    backend = _worker_backends.get(source)
+    if backend is None:
+        from .medical_classifier import load_backend
+        # Un seul modèle par process : l'ancien est libéré après un rechargement à chaud
+        _worker_backends.clear()
+        backend = _worker_backends[source] = load_backend(source)
+    return backend
+
+
+def _worker_initializer(source):
+    _worker_backend(source)
+
+
+def _worker_segment(name, keep):
+    segment = _worker_segments.get(name)
+    if segment is None:
+        segment = SharedMemory(name=name)
+        if keep:
+            _worker_segments[name] = segment
+    return segment
+
+
+def _worker_predict_proba(source, input_name, output_name, shape, early_exit, keep):
+    """Exécuté dans un process du pool : lit X et écrit les probabilités en mémoire partagée"""
+    input_shm = _worker_segment(input_name, keep)
+    output_shm = _worker_segment(output_name, keep)
+    try:
+        backend = _worker_backend(source)
+        X = np.ndarray(shape, dtype=np.float64, buffer=input_shm.buf)
+        if early_exit is not None and hasattr(backend, 'predict_proba_early'):
+            probabilities, _ = backend.predict_proba_early(X, **early_exit)
+        else:
+            probabilities = backend.predict_proba(X)
+        output = np.ndarray(probabilities.shape, dtype=np.float64, buffer=output_shm.buf)
+        output[:] = probabilities
+        del X, output
+    finally:
+        if not keep:
+            input_shm.close()
+            output_shm.close()
+
+
+class _Slot:
+    """Paire de segments (entrées, probabilités) pour un appel en cours"""
+
+    def __init__(self, rows, n_features, n_classes, reusable):
+        self.rows = rows
+        self.reusable = reusable
+        self.input = SharedMemory(create=True, size=max(rows * n_features * 8, 1))
+        self.output = SharedMemory(create=True, size=max(rows * n_classes * 8, 1))
+
+    def release(self):
+        for segment in (self.input, self.output):
+            segment.close()
+            segment.unlink()
+
+
+class InferencePool:
+    """ProcessPoolExecutor (spawn) dont chaque process garde le modèle chargé"""
+
+    def __init__(self, source, processes=2, timeout=2.0, slot_rows=512):
+        self.processes = processes
+        self.timeout = timeout
+        self.slot_rows = slot_rows
+        self._slots = queue.LifoQueue()
+        self._all_slots = []
+        # spawn : pas de fork d'un worker gunicorn qui a déjà des threads
+        self._executor = ProcessPoolExecutor(
+            max_workers=processes,
+            mp_context=multiprocessing.get_context('spawn'),
+            initializer=_worker_initializer,
+            initargs=(source,),
+        )
+        self.pid = os.getpid()
+        self._lock = threading.Lock()
+        self.calls = 0
+        self.rows = 0
+        self.timeouts = 0
+        self.errors = 0
+        # Segments d'appels expirés dont la tâche tourne encore dans le pool
+        self.abandoned_slots = 0
+        self._closed = False
+        self._seconds = 0.0
+        atexit.register(self.shutdown)
+
+    def predict_proba(self, source, X, n_classes, early_exit=None):
+        """
+        Probabilités (n, n_classes) calculées dans un process du pool.
+        Lève FutureTimeoutError après self.timeout secondes.
+        """
+        started = time.perf_counter()
+        X = np.ascontiguousarray(X, dtype=np.float64)
+        slot = self._acquire_slot(X.shape, n_classes)
+        try:
+            np.ndarray(X.shape, dtype=np.float64, buffer=slot.input.buf)[:] = X
+            future = self._executor.submit(
+                _worker_predict_proba, source, slot.input.name, slot.output.name, X.shape, early_exit, slot.reusable
+            )
+        except Exception:
+            self._return_slot(slot)
+            raise
+
+        try:
+            future.result(timeout=self.timeout)
+        except FutureTimeoutError:
+            # Le process peut encore écrire dans ce segment : rendu seulement à la fin de la tâche
+            # (immédiatement si elle n'avait pas commencé et a pu être annulée)
+            future.cancel()
+            with self._lock:
+                self.timeouts += 1
+                self.abandoned_slots += 1
+            future.add_done_callback(lambda _: self._return_abandoned_slot(slot))
+            raise
+        except Exception:
+            with self._lock:
+                self.errors += 1
+            self._return_slot(slot)
+            raise
+        try:
+            probabilities = np.ndarray((len(X), n_classes), dtype=np.float64, buffer=slot.output.buf).copy()
+        finally:
+            self._return_slot(slot)
+
+        with self._lock:
+            self.calls += 1
+            self.rows += len(X)
+            self._seconds += time.perf_counter() - started
+        return probabilities
+
+    def _acquire_slot(self, shape, n_classes):
+        rows, n_features = shape
+        if rows > self.slot_rows:
+            return _Slot(rows, n_features, n_classes, reusable=False)
+        try:
+            return self._slots.get_nowait()
+        except queue.Empty:
+            slot = _Slot(self.slot_rows, n_features, n_classes, reusable=True)
+            with self._lock:
+                self._all_slots.append(slot)
+            return slot
+
+    def _return_slot(self, slot):
+        if slot.reusable and not self._closed:
+            self._slots.put(slot)
+        elif not slot.reusable:
+            slot.release()
+
+    def _return_abandoned_slot(self, slot):
+        """Callback de fin d'une tâche expirée : le process n'écrit plus dans le segment"""
+        with self._lock:
+            self.abandoned_slots -= 1
+        self._return_slot(slot)
+
+    def shutdown(self):
+        # Un process forké hérite de l'objet (et de l'atexit) mais pas des segments du pool
+        if os.getpid() != self.pid:
+            return
+        self._closed = True
+        self._executor.shutdown(wait=False, cancel_futures=True)
+        with self._lock:
+            slots, self._all_slots = self._all_slots, []
+        for slot in slots:
+            slot.release()
+
+    def stats(self):
+        with self._lock:
+            return {
+                'processes': self.processes,
+                'timeout': self.timeout,
+                'calls': self.calls,
+                'rows': self.rows,
+                'timeouts': self.timeouts,
+                'shared_slots': len(self._all_slots),
+                'abandoned_slots': self.abandoned_slots,
+                'errors': self.errors,
+                'mean_ms': round(self._seconds * 1000 / self.calls, 3) if self.calls else 0,
+            }
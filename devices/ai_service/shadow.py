@@ -0,0 +1,126 @@
+"""
+Évaluation d'un modèle candidat sur le trafic réel (shadow mode).
+
+Une fraction (AI_SHADOW_SAMPLE_RATE) des lectures prédites par le modèle servi
+est aussi soumise au modèle candidat (AI_SHADOW_MODEL), hors du chemin de la
+requête : les lectures échantillonnées sont déposées dans une file bornée et
+un thread de fond les évalue. Si la file est pleine, l'échantillon est
+abandonné (compté dans 'dropped') : l'ingestion n'attend jamais le candidat.
+
+Le rapport agrège le taux de désaccord, la matrice de confusion
+(modèle servi x candidat) et la latence du candidat. Les compteurs sont
+propres à chaque process.
+"""
+
+import os
+import queue
+import random
+import threading
+import time
+from collections import deque
+
+import numpy as np
+
+from ai_models.inference import CLASS_NAMES
+
+# Latences conservées pour les percentiles
+LATENCY_WINDOW = 2000
+
+
+class ShadowEvaluator:
+    def __init__(self, candidate, candidate_name, sample_rate=0.05, queue_size=256):
+        self.candidate = candidate
+        self.candidate_name = candidate_name
+        self.sample_rate = sample_rate
+        self._queue = queue.Queue(maxsize=queue_size)
+        self._lock = threading.Lock()
+        self._n_classes = len(CLASS_NAMES)
+        self._confusion = np.zeros((self._n_classes, self._n_classes), dtype=np.int64)
+        self._latencies = deque(maxlen=LATENCY_WINDOW)
+        self._live_versions = set()
+        self.offered = 0
+        self.dropped = 0
+        self.errors = 0
+        self.started_at = time.time()
+        self.pid = os.getpid()
+        self._thread = threading.Thread(target=self._run, name='ai-shadow', daemon=True)
+        self._thread.start()
+
+    def offer(self, X, live_statuses, live_version):
+        """
+        Appelé sur le chemin de la requête : échantillonne et dépose sans
+        jamais bloquer
+        """
+        if len(X) == 1:
+            if random.random() >= self.sample_rate:
+                return
+            rows = slice(None)
+        else:
+            rows = np.flatnonzero(np.random.random(len(X)) < self.sample_rate)
+            if not len(rows):
+                return
+        sample = (np.array(X[rows], dtype=float), np.array(live_statuses[rows]), live_version)
+        try:
+            self._queue.put_nowait(sample)
+        except queue.Full:
+            with self._lock:
+                self.dropped += len(sample[0])
+        else:
+            with self._lock:
+                self.offered += len(sample[0])
+
+    def _run(self):
+        while True:
+            X, live_statuses, live_version = self._queue.get()
+            started = time.perf_counter()
+            try:
+                probabilities = self.candidate.predict_proba(X)
+            except Exception:
+                with self._lock:
+                    self.errors += len(X)
+                continue
+            elapsed_ms = (time.perf_counter() - started) * 1000
+            candidate_statuses = self.candidate.classes[np.argmax(probabilities, axis=1)]
+            with self._lock:
+                np.add.at(self._confusion, (live_statuses, candidate_statuses), 1)
+                self._latencies.append((elapsed_ms, len(X)))
+                self._live_versions.add(live_version)
+
+    def report(self):
+        with self._lock:
+            confusion = self._confusion.copy()
+            latencies = list(self._latencies)
+            live_versions = sorted(self._live_versions, key=str)
+            errors = self.errors
+            offered = self.offered
+            dropped = self.dropped
+        scored = int(confusion.sum())
+        agreed = int(np.trace(confusion))
+        names = [CLASS_NAMES[i] for i in range(self._n_classes)]
+        per_row_ms = np.array([elapsed / rows for elapsed, rows in latencies]) if latencies else None
+
+        return {
+            'candidate': self.candidate_name,
+            'live_versions': live_versions,
+            'sample_rate': self.sample_rate,
+            'since': self.started_at,
+            'offered': offered,
+            'dropped': dropped,
+            'queue_depth': self._queue.qsize(),
+            'scored': scored,
+            'errors': errors,
+            'disagreement_rate': round(1 - agreed / scored, 4) if scored else None,
+            # Lignes : classe du modèle servi, colonnes : classe du candidat
+            'confusion': {
+                live: dict(zip(names, row)) for live, row in zip(names, confusion.tolist())
+            },
+            'per_class_agreement': {
+                name: round(confusion[i, i] / confusion[i].sum(), 4) if confusion[i].sum() else None
+                for i, name in enumerate(names)
+            },
+            'candidate_latency_ms': {
+                'p50_per_row': round(float(np.percentile(per_row_ms, 50)), 4),
+                'p99_per_row': round(float(np.percentile(per_row_ms, 99)), 4),
+                'mean_per_call': round(float(np.mean([elapsed for elapsed, _ in latencies])), 4),
+            } if latencies else None,
+        }
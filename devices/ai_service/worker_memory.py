@@ -0,0 +1,108 @@
+"""
+Mesure du démarrage et de la mémoire des workers gunicorn.
+
+    # Temps de démarrage à froid (django.setup + chargement/validation du modèle)
+    python -m devices.ai_service.worker_memory --startup
+
+    # RSS / PSS / mémoire partagée du master et de chaque worker (Linux)
+    gunicorn -c gunicorn.conf.py --pid /tmp/gunicorn.pid esante_backend.wsgi:application
+    python -m devices.ai_service.worker_memory --pidfile /tmp/gunicorn.pid
+
+Le PSS répartit les pages partagées entre les process : c'est la bonne mesure
+du coût réel par worker quand le modèle est préchargé dans le master.
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+
+FIELDS = ('Rss', 'Pss', 'Shared_Clean', 'Shared_Dirty', 'Private_Clean', 'Private_Dirty')
+
+STARTUP_SNIPPET = """
+import json, os, time
+started = time.perf_counter()
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'esante_backend.settings')
+import django
+django.setup()
+setup_done = time.perf_counter()
+from devices.ai_service.medical_classifier import ai_service
+ready = ai_service.warm_up()
+print(json.dumps({
+    'django_setup_ms': (setup_done - started) * 1000,
+    'model_warm_up_ms': (time.perf_counter() - setup_done) * 1000,
+    'backend': ai_service.backend_name,
+    'ready': ready,
+}))
+"""
+
+
+def read_smaps(pid):
+    """Compteurs mémoire d'un process en kB (/proc/<pid>/smaps_rollup)"""
+    values = {}
+    with open(f'/proc/{pid}/smaps_rollup') as f:
+        for line in f:
+            parts = line.split()
+            if parts and parts[0].rstrip(':') in FIELDS:
+                values[parts[0].rstrip(':')] = int(parts[1])
+    return values
+
+
+def children_of(pid):
+    children = []
+    for entry in os.listdir('/proc'):
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f'/proc/{entry}/stat') as f:
+                # Le nom du process est entre parenthèses et peut contenir des espaces
+                ppid = int(f.read().rsplit(')', 1)[1].split()[1])
+        except (OSError, IndexError, ValueError):
+            continue
+        if ppid == pid:
+            children.append(int(entry))
+    return sorted(children)
+
+
+def report_memory(master_pid):
+    rows = [('master', master_pid)] + [('worker', pid) for pid in children_of(master_pid)]
+    print(f"{'process':>8} {'pid':>8} | " + " | ".join(f"{field:>13}" for field in FIELDS))
+    totals = dict.fromkeys(FIELDS, 0)
+    for role, pid in rows:
+        values = read_smaps(pid)
+        for field in FIELDS:
+            totals[field] += values.get(field, 0)
+        print(f"{role:>8} {pid:>8} | " + " | ".join(f"{values.get(field, 0) / 1024:>10.1f} MB" for field in FIELDS))
+    print(f"{'total':>17} | " + " | ".join(f"{totals[field] / 1024:>10.1f} MB" for field in FIELDS))
+    print(f"\n{len(rows) - 1} workers, PSS total: {totals['Pss'] / 1024:.1f} MB")
+
+
+def report_startup():
+    result = subprocess.run(
+        [sys.executable, '-c', STARTUP_SNIPPET],
+        capture_output=True, text=True, check=True
+    )
+    metrics = json.loads(result.stdout.strip().splitlines()[-1])
+    print(f"django.setup(): {metrics['django_setup_ms']:.0f} ms")
+    print(f"Chargement + validation du modèle ({metrics['backend']}): {metrics['model_warm_up_ms']:.0f} ms")
+    print(f"Modèle prêt: {'oui' if metrics['ready'] else 'non'}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Démarrage et mémoire des workers gunicorn")
+    parser.add_argument('--startup', action='store_true', help="Mesurer le démarrage à froid")
+    parser.add_argument('--pid', type=int, help="PID du master gunicorn")
+    parser.add_argument('--pidfile', help="Fichier pid du master gunicorn")
+    args = parser.parse_args()
+
+    if args.startup:
+        report_startup()
+    master_pid = args.pid
+    if args.pidfile:
+        with open(args.pidfile) as f:
+            master_pid = int(f.read().strip())
+    if master_pid:
+        report_memory(master_pid)
+    elif not args.startup:
+        parser.error("indiquer --startup, --pid ou --pidfile")
@@ -0,0 +1,278 @@
+"""
+Détection d'écarts par patient sur les lectures récentes.
+
+Les seuils fixes de alerts.utils.check_vital_signs et le modèle IA jugent
+chaque lecture isolément. Ici, chaque patient a sa référence (PatientBaseline) :
+moyenne et variance exponentielles (EWMA, ANALYTICS_EWMA_SPAN lectures) de la
+fréquence cardiaque, de la SpO2, de la température et des COV. Chaque lecture
+est comparée à la référence qui la précède (z-score) avant d'y être intégrée,
+et la vitesse de variation depuis la lecture précédente est calculée.
+
+- apply_baseline : appelé par l'ingestion, dans sa transaction ; intègre un
+  lot de lectures d'un patient (ligne verrouillée, deux requêtes par lot) et
+  renvoie les z-scores du lot pour les alertes.
+- rebuild_baselines : recalcule les références de tous les patients depuis
+  leurs ANALYTICS_WINDOW dernières lectures (une requête avec ROW_NUMBER, puis
+  un seul parcours NumPy sur le tableau patients x lectures x paramètres).
+
+Le calcul est le même dans les deux cas (ewma_scan) : parcours des lectures
+dans l'ordre, vectorisé sur les patients et les paramètres. Les premières
+lectures d'un patient sont moyennées uniformément (alpha = 1/n) jusqu'à ce
+que alpha atteigne 2 / (span + 1) ; aucun z-score n'est calculé avant
+ANALYTICS_MIN_READINGS lectures.
+"""
+
+import numpy as np
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F, Window
+from django.db.models.functions import Coalesce, RowNumber
+
+from .models import PatientBaseline, SensorData
+
+SIGNALS = ['heart_rate', 'spo2', 'temperature', 'cov_ppb']
+
+# Écart-type minimal de chaque paramètre (résolution des capteurs) : un signal
+# parfaitement stable ne transforme pas la moindre variation en écart énorme
+MIN_STD = np.array([1.0, 0.5, 0.1, 5.0])
+
+
+def alpha():
+    return 2 / (getattr(settings, 'ANALYTICS_EWMA_SPAN', 60) + 1)
+
+
+def min_readings():
+    return getattr(settings, 'ANALYTICS_MIN_READINGS', 20)
+
+
+def z_warning():
+    return getattr(settings, 'ANALYTICS_Z_WARNING', 3.0)
+
+
+def ewma_scan(values, valid, mean, var, count):
+    """
+    Parcourt les lectures dans l'ordre, pour tous les patients à la fois.
+
+    Args:
+        values : (patients, lectures, paramètres), lectures de chaque patient alignées à gauche
+        valid  : (patients, lectures) bool, False pour le remplissage
+        mean, var : (patients, paramètres) référence de départ
+        count  : (patients,) lectures déjà intégrées
+
+    Returns:
+        (mean, var, count, z) ; z (patients, lectures, paramètres) vaut NaN
+        pour les lectures non notées (remplissage, référence trop jeune)
+    """
+    mean = np.array(mean, dtype=np.float64)
+    var = np.array(var, dtype=np.float64)
+    count = np.array(count, dtype=np.float64)
+    z = np.full(values.shape, np.nan)
+    for step in range(values.shape[1]):
+        active = valid[:, step]
+        x = np.where(active[:, None], values[:, step], mean)
+        scored = active & (count >= min_readings())
+        std = np.maximum(np.sqrt(var), MIN_STD)
+        z[scored, step] = ((x - mean) / std)[scored]
+
+        count += active
+        weight = np.where(active, np.maximum(alpha(), 1 / np.maximum(count, 1)), 0)[:, None]
+        delta = x - mean
+        mean = mean + weight * delta
+        var = (1 - weight) * (var + weight * delta ** 2)
+    return mean, var, count.astype(np.int64), z
+
+
+def rate_per_minute(previous, previous_at, current, current_at):
+    """Variation par minute de chaque paramètre, None sans lecture précédente ou sans écart de temps"""
+    if previous is None or previous_at is None:
+        return None
+    minutes = (current_at - previous_at).total_seconds() / 60
+    if minutes <= 0:
+        return None
+    return (np.asarray(current) - np.asarray(previous)) / minutes
+
+
+def _optional(values):
+    if values is None:
+        return dict.fromkeys(SIGNALS)
+    return {signal: None if np.isnan(value) else round(float(value), 3) for signal, value in zip(SIGNALS, values)}
+
+
+def describe_latest(moment, values, z, rate):
+    """Écarts de la dernière lecture, tels que stockés dans PatientBaseline.deviations"""
+    scored = z[~np.isnan(z)]
+    return {
+        'at': moment.isoformat(),
+        'values': _optional(values),
+        'z': _optional(z),
+        'rate_per_min': _optional(rate),
+        'max_abs_z': round(float(np.abs(scored).max()), 3) if len(scored) else None,
+    }
+
+
+def flagged_deviations(z_scores):
+    """
+    Pire z-score de chaque paramètre d'un lot, pour les paramètres au-delà de
+    ANALYTICS_Z_WARNING (déclencheur de alerts.utils.build_anomaly_alert)
+    """
+    flagged = {}
+    if z_scores is None or not len(z_scores):
+        return flagged
+    magnitudes = np.nan_to_num(np.abs(z_scores), nan=0.0)
+    worst_rows = magnitudes.argmax(axis=0)
+    for column, signal in enumerate(SIGNALS):
+        z = z_scores[worst_rows[column], column]
+        if abs(np.nan_to_num(z)) >= z_warning():
+            flagged[signal] = round(float(z), 2)
+    return flagged
+
+
+def _moment(row):
+    return row.measured_at or row.created_at
+
+
+def _baseline_arrays(baseline):
+    return (
+        np.array([[getattr(baseline, f'{signal}_mean') for signal in SIGNALS]]),
+        np.array([[getattr(baseline, f'{signal}_var') for signal in SIGNALS]]),
+    )
+
+
+def _store(baseline, mean, var, count, last_at, last_values, deviations):
+    baseline.count = int(count)
+    baseline.last_at = last_at
+    for signal, signal_mean, signal_var, last in zip(SIGNALS, mean.tolist(), var.tolist(), last_values.tolist()):
+        setattr(baseline, f'{signal}_mean', signal_mean)
+        setattr(baseline, f'{signal}_var', signal_var)
+        setattr(baseline, f'{signal}_last', last)
+    baseline.deviations = deviations
+
+
+def apply_baseline(user_id, sensor_rows):
+    """
+    Intègre un lot de SensorData d'un patient à sa référence, dans l'ordre
+    des mesures. À appeler dans la transaction qui écrit les lectures.
+
+    Returns:
+        z-scores du lot (lectures, paramètres), NaN pour les lectures non notées
+    """
+    if not sensor_rows:
+        return None
+    sensor_rows = sorted(sensor_rows, key=_moment)
+    values = np.array([[getattr(row, signal) for signal in SIGNALS] for row in sensor_rows], dtype=np.float64)
+
+    # savepoint=False : pas de SAVEPOINT en plus dans la transaction de l'appelant
+    with transaction.atomic(savepoint=False):
+        baseline, _ = PatientBaseline.objects.select_for_update().get_or_create(user_id=user_id)
+        mean, var = _baseline_arrays(baseline)
+        mean, var, count, z = ewma_scan(values[None], np.ones((1, len(values)), dtype=bool),
+                                        mean, var, [baseline.count])
+
+        last_at = _moment(sensor_rows[-1])
+        if len(sensor_rows) > 1:
+            previous, previous_at = values[-2], _moment(sensor_rows[-2])
+        else:
+            previous = None if baseline.heart_rate_last is None else [getattr(baseline, f'{signal}_last') for signal in SIGNALS]
+            previous_at = baseline.last_at
+        rate = rate_per_minute(previous, previous_at, values[-1], last_at)
+
+        _store(baseline, mean[0], var[0], count[0], last_at, values[-1],
+               describe_latest(last_at, values[-1], z[0, -1], rate))
+        baseline.save()
+    return z[0]
+
+
+def recent_readings(user_ids=None, window=None):
+    """
+    Les window dernières lectures de chaque patient, dans l'ordre des mesures :
+    (user_ids, moments par patient, values (patients, lectures, paramètres), valid)
+    """
+    window = window or getattr(settings, 'ANALYTICS_WINDOW', 500)
+    queryset = SensorData.objects.all()
+    if user_ids is not None:
+        queryset = queryset.filter(device__user_id__in=user_ids)
+    rows = list(
+        queryset.annotate(
+            patient=F('device__user_id'),
+            moment=Coalesce('measured_at', 'created_at'),
+            rank=Window(RowNumber(), partition_by=F('device__user_id'),
+                        order_by=[Coalesce('measured_at', 'created_at').desc(), F('pk').desc()]),
+        )
+        .filter(rank__lte=window)
+        .order_by('patient', 'moment', 'pk')
+        .values_list('patient', 'moment', *SIGNALS)
+    )
+    if not rows:
+        return [], [], np.empty((0, 0, len(SIGNALS))), np.empty((0, 0), dtype=bool)
+
+    patients = np.array([row[0] for row in rows])
+    patient_ids, starts, lengths = np.unique(patients, return_index=True, return_counts=True)
+    # Position de chaque lecture dans la série de son patient
+    positions = np.arange(len(rows)) - np.repeat(starts, lengths)
+    rows_index = np.repeat(np.arange(len(patient_ids)), lengths)
+
+    values = np.full((len(patient_ids), lengths.max(), len(SIGNALS)), np.nan)
+    values[rows_index, positions] = np.array([row[2:] for row in rows], dtype=np.float64)
+    valid = np.zeros(values.shape[:2], dtype=bool)
+    valid[rows_index, positions] = True
+    moments = [[row[1] for row in rows[start:start + length]] for start, length in zip(starts, lengths)]
+    return patient_ids.tolist(), moments, values, valid
+
+
+def rebuild_baselines(user_ids=None, window=None):
+    """
+    Recalcule les références depuis les lectures récentes de chaque patient,
+    en un seul parcours vectorisé. Idempotent.
+
+    Returns:
+        nombre de références écrites
+    """
+    patient_ids, moments, values, valid = recent_readings(user_ids, window)
+    n_patients = len(patient_ids)
+    mean, var, count, z = ewma_scan(values, valid, np.zeros((n_patients, len(SIGNALS))),
+                                    np.zeros((n_patients, len(SIGNALS))), np.zeros(n_patients))
+
+    baselines = []
+    for index, user_id in enumerate(patient_ids):
+        last = len(moments[index]) - 1
+        rate = None
+        if last > 0:
+            rate = rate_per_minute(values[index, last - 1], moments[index][last - 1],
+                                   values[index, last], moments[index][last])
+        baseline = PatientBaseline(user_id=user_id)
+        _store(baseline, mean[index], var[index], count[index], moments[index][last], values[index, last],
+               describe_latest(moments[index][last], values[index, last], z[index, last], rate))
+        baselines.append(baseline)
+
+    with transaction.atomic():
+        existing = PatientBaseline.objects.all()
+        if user_ids is not None:
+            existing = existing.filter(user_id__in=user_ids)
+        existing.delete()
+        PatientBaseline.objects.bulk_create(baselines, batch_size=1000)
+    return len(baselines)
+
+
+def baseline_report(baseline):
+    """Référence et écarts de la dernière lecture d'un patient (endpoint anomalies)"""
+    mean, var = _baseline_arrays(baseline)
+    std = np.maximum(np.sqrt(var[0]), MIN_STD)
+    deviations = baseline.deviations or {}
+    return {
+        'readings': baseline.count,
+        'ready': baseline.count >= min_readings(),
+        'last_at': baseline.last_at.isoformat() if baseline.last_at else None,
+        'baseline': {
+            signal: {'mean': round(float(signal_mean), 3), 'std': round(float(signal_std), 3)}
+            for signal, signal_mean, signal_std in zip(SIGNALS, mean[0], std)
+        },
+        'latest': deviations,
+        'flagged': sorted(
+            signal for signal, z in deviations.get('z', {}).items()
+            if z is not None and abs(z) >= z_warning()
+        ),
+        'thresholds': {
+            'warning': z_warning(),
+            'danger': getattr(settings, 'ANALYTICS_Z_DANGER', 5.0),
+        },
+    }
@@ -0,0 +1,155 @@
+"""
+Cache d'authentification des devices.
+
+Chaque POST du hardware commence par résoudre sa device_key. Les clés se
+répètent des milliers de fois par heure : on garde device_key -> (id du
+device, id, username, fuseau et médecin de l'utilisateur, is_active).
+
+- Avec DEVICE_KEY_CACHE_BACKEND (cache Django partagé, ex: Redis), les
+  entrées ne vivent que dans ce cache : une révocation (device supprimé,
+  désactivé, clé régénérée) vaut immédiatement pour tous les workers.
+- Sans, les entrées sont gardées en process (LRU + TTL) : l'invalidation
+  n'atteint que le process qui a fait la modification, les autres workers
+  peuvent accepter une clé révoquée pendant DEVICE_KEY_CACHE_TTL secondes.
+  À réserver à un seul worker ou au développement.
+
+Les clés inconnues sont aussi mises en cache (cache négatif, TTL plus court)
+pour qu'un device mal configuré qui boucle ne frappe pas la base.
+
+Les entrées sont invalidées par les signaux de devices/signals.py à chaque
+modification ou suppression d'un Device, et à chaque modification de son
+utilisateur (vues, admin, shell).
+"""
+
+import threading
+import time
+from collections import OrderedDict, namedtuple
+
+from django.conf import settings
+from django.core.cache import caches
+
+from .models import Device
+
+CachedDevice = namedtuple(
+    'CachedDevice', ['id', 'user_id', 'username', 'is_active', 'user_timezone', 'user_medecin_id'],
+    defaults=['UTC', None]
+)
+
+# Valeur stockée pour une clé inconnue (cache négatif)
+_UNKNOWN = 'unknown'
+
+
+class DeviceKeyCache:
+    """
+    Cache LRU/TTL en process, ou cache Django partagé entre workers si
+    shared_alias est donné (le cache local n'est alors pas utilisé)
+    """
+
+    def __init__(self, max_size=10000, ttl=60, negative_ttl=30, shared_alias=None):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.shared_alias = shared_alias
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.negative_hits = 0
+
+    @property
+    def shared(self):
+        return caches[self.shared_alias] if self.shared_alias else None
+
+    @staticmethod
+    def _shared_key(device_key):
+        return f"device_key:{device_key}"
+
+    def get(self, device_key):
+        """
+        Retourne le CachedDevice de la clé, ou None si aucun device ne l'utilise.
+        Le filtre is_active reste à la charge de l'appelant.
+        """
+        shared = self.shared
+        if shared is not None:
+            # Pas de cache local devant le cache partagé : une invalidation
+            # faite par n'importe quel worker prend effet immédiatement
+            value = shared.get(self._shared_key(device_key))
+            if value is not None:
+                value = _UNKNOWN if value == _UNKNOWN else CachedDevice(*value)
+        else:
+            value = self._get_local(device_key)
+
+        if value is None:
+            with self._lock:
+                self.misses += 1
+            value = self._load(device_key)
+            if shared is not None:
+                ttl = self.negative_ttl if value == _UNKNOWN else self.ttl
+                shared.set(self._shared_key(device_key), value if value == _UNKNOWN else tuple(value), ttl)
+            else:
+                self._set_local(device_key, value)
+        else:
+            with self._lock:
+                self.hits += 1
+                if value == _UNKNOWN:
+                    self.negative_hits += 1
+
+        return None if value == _UNKNOWN else value
+
+    def _load(self, device_key):
+        row = Device.objects.filter(device_key=device_key).values_list(
+            'id', 'user_id', 'user__username', 'is_active', 'user__timezone', 'user__medecin_id'
+        ).first()
+        return CachedDevice(*row) if row else _UNKNOWN
+
+    def _get_local(self, device_key):
+        with self._lock:
+            entry = self._entries.get(device_key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if expires_at < time.monotonic():
+                del self._entries[device_key]
+                return None
+            self._entries.move_to_end(device_key)
+            return value
+
+    def _set_local(self, device_key, value):
+        ttl = self.negative_ttl if value == _UNKNOWN else self.ttl
+        with self._lock:
+            self._entries[device_key] = (time.monotonic() + ttl, value)
+            self._entries.move_to_end(device_key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, *device_keys):
+        """Supprime les clés du cache local et du cache partagé"""
+        device_keys = [key for key in device_keys if key]
+        with self._lock:
+            for key in device_keys:
+                self._entries.pop(key, None)
+        if self.shared is not None and device_keys:
+            self.shared.delete_many([self._shared_key(key) for key in device_keys])
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            return {
+                'size': len(self._entries),
+                'max_size': self.max_size,
+                'hits': self.hits,
+                'misses': self.misses,
+                'negative_hits': self.negative_hits,
+                'shared_backend': self.shared_alias,
+            }
+
+
+device_key_cache = DeviceKeyCache(
+    max_size=getattr(settings, 'DEVICE_KEY_CACHE_SIZE', 10000),
+    ttl=getattr(settings, 'DEVICE_KEY_CACHE_TTL', 60),
+    negative_ttl=getattr(settings, 'DEVICE_KEY_CACHE_NEGATIVE_TTL', 30),
+    shared_alias=getattr(settings, 'DEVICE_KEY_CACHE_BACKEND', None),
+)
@@ -0,0 +1,227 @@
+"""
+Pipeline d'ingestion des lectures envoyées par le hardware.
+
+Partagé par l'endpoint unitaire, l'endpoint batch et le worker asynchrone
+(process_sensor_queue) : validation des lectures, passage par le modèle IA et
+écriture des SensorData / HealthData / alertes.
+"""
+
+import math
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, Min, Q
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from .models import Device, SensorData, PendingReading
+from .analytics import apply_baseline, flagged_deviations
+from .rollups import apply_rollups
+from .ai_service.medical_classifier import FEATURES, predict_health_status_batch
+from health.models import HealthData
+from health.running_stats import apply_running_stats
+from health.summaries import apply_daily_summaries
+from alerts.utils import build_ai_alert, build_anomaly_alert
+from users.cohort import invalidate_cohort
+
+# Nombre maximum de lectures acceptées dans une requête batch
+MAX_BATCH_SIZE = 500
+
+
+class ReadingError(ValueError):
+    """Lecture invalide : le message est renvoyé tel quel au device"""
+
+
+def parse_sensor_values(data):
+    """
+    Extrait et convertit les 5 valeurs du capteur d'une lecture.
+
+    Returns:
+        liste de floats dans l'ordre de FEATURES
+    """
+    values = []
+    for field in FEATURES:
+        value = data.get(field)
+        if value is None:
+            raise ReadingError(f"Champ requis manquant: {field}")
+        try:
+            value = float(value)
+        except (ValueError, TypeError):
+            raise ReadingError(f"Valeur invalide pour {field}")
+        # float() accepte "nan" et "inf", qui fausseraient le modèle et les agrégats
+        if not math.isfinite(value):
+            raise ReadingError(f"Valeur invalide pour {field}")
+        values.append(value)
+    return values
+
+
+def parse_timestamp(value):
+    """
+    Convertit l'horodatage optionnel d'une lecture.
+    Accepte un timestamp Unix (secondes) ou une date ISO 8601.
+    """
+    if value is None or value == '':
+        return None
+
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        try:
+            return datetime.fromtimestamp(value, tz=dt_timezone.utc)
+        except (OverflowError, OSError, ValueError):
+            raise ReadingError("Horodatage invalide")
+
+    if isinstance(value, str):
+        parsed = parse_datetime(value)
+        if parsed is not None:
+            if timezone.is_naive(parsed):
+                parsed = timezone.make_aware(parsed, dt_timezone.utc)
+            return parsed
+
+    raise ReadingError("Horodatage invalide")
+
+
+def parse_batch(readings):
+    """
+    Valide un lot de lectures complet avant toute écriture. Les erreurs
+    numérotent les lectures à partir de 1 ("Lecture 1: ..." pour la première).
+
+    Returns:
+        (matrice des valeurs (n, 5), liste des horodatages)
+    """
+    if not isinstance(readings, list) or not readings:
+        raise ReadingError("readings doit être une liste non vide")
+    if len(readings) > MAX_BATCH_SIZE:
+        raise ReadingError(f"Trop de lectures dans le lot (maximum {MAX_BATCH_SIZE})")
+
+    rows = []
+    timestamps = []
+    for index, reading in enumerate(readings, 1):
+        if not isinstance(reading, dict):
+            raise ReadingError(f"Lecture {index}: objet attendu")
+        try:
+            rows.append(parse_sensor_values(reading))
+            timestamps.append(parse_timestamp(reading.get('timestamp')))
+        except ReadingError as e:
+            raise ReadingError(f"Lecture {index}: {e}")
+    return rows, timestamps
+
+
+def health_status_from_ai(ai_status):
+    """Statut HealthData correspondant à la classe prédite par l'IA"""
+    return 'normal' if ai_status == 0 else 'attention' if ai_status <= 2 else 'critical'
+
+
+def is_async_mode():
+    """Mode asynchrone : les lectures sont mises en file et traitées par le worker"""
+    return getattr(settings, 'SENSOR_INGESTION_MODE', 'sync') == 'async'
+
+
+def enqueue_readings(device, rows, timestamps=None):
+    """
+    Ajoute des lectures déjà validées à la file d'attente durable. Une lecture
+    sans horodatage du device est datée de la réception : le worker ne doit
+    pas la dater de son traitement, qui peut survenir bien plus tard.
+    """
+    received_at = timezone.now()
+    if timestamps is None:
+        timestamps = [None] * len(rows)
+    PendingReading.objects.bulk_create([
+        PendingReading(device_id=device.id, measured_at=measured_at or received_at,
+                       **dict(zip(FEATURES, values)))
+        for values, measured_at in zip(rows, timestamps)
+    ])
+    return len(rows)
+
+
+def queue_stats(max_attempts=None):
+    """Profondeur de la file d'attente et retard (âge de la plus ancienne lecture)"""
+    pending = PendingReading.objects.all()
+    if max_attempts is not None:
+        pending = pending.filter(attempts__lt=max_attempts)
+    stats = pending.aggregate(depth=Count('id'), oldest=Min('received_at'))
+    stats['lag_seconds'] = (
+        round((timezone.now() - stats['oldest']).total_seconds(), 3) if stats['oldest'] else 0.0
+    )
+    stats['failing'] = pending.filter(attempts__gt=0).count()
+    return stats
+
+
+def ingest_readings(device, rows, timestamps=None, ai_results=None):
+    """
+    Traite un lot de lectures d'un même device (CachedDevice du cache
+    d'authentification).
+
+    Le modèle IA est appelé une seule fois sur la matrice complète (sauf si
+    ai_results est déjà fourni) AVANT toute écriture : chaque table n'est
+    ensuite écrite qu'une fois, dans une transaction (un INSERT SensorData
+    avec le résultat IA, la fusion dans les agrégats du device et de
+    l'utilisateur, un INSERT HealthData, son résumé journalier et les
+    statistiques cumulées, la référence du patient (devices.analytics), les
+    alertes éventuelles et le battement de cœur du device).
+
+    Returns:
+        (liste des SensorData créés, liste des résultats IA)
+    """
+    if timestamps is None:
+        timestamps = [None] * len(rows)
+
+    if ai_results is None:
+        ai_results = predict_health_status_batch(rows)
+
+    sensor_rows = []
+    health_rows = []
+    for values, measured_at, ai_result in zip(rows, timestamps, ai_results):
+        sensor_values = dict(zip(FEATURES, values))
+        sensor_rows.append(SensorData(
+            device_id=device.id,
+            measured_at=measured_at,
+            ai_status=ai_result['status'],
+            ai_status_name=ai_result['status_name'],
+            ai_confidence=ai_result['confidence'],
+            ai_probabilities=ai_result['probabilities'],
+            ai_model_version=ai_result.get('model_version'),
+            processed=True,
+            **sensor_values
+        ))
+        health_rows.append(HealthData(
+            user_id=device.user_id,
+            heart_rate=sensor_values['heart_rate'],
+            oxygen_level=sensor_values['spo2'],
+            temperature=sensor_values['temperature'],
+            respiratory_rate=int(sensor_values['eco2_ppm'] / 30),  # Estimation
+            air_quality=int(sensor_values['cov_ppb'] / 10),  # Conversion en AQI approximatif
+            status=health_status_from_ai(ai_result['status'])
+        ))
+
+    with transaction.atomic():
+        sensor_rows = SensorData.objects.bulk_create(sensor_rows)
+        apply_rollups(device.id, device.user_id, sensor_rows)
+        health_rows = HealthData.objects.bulk_create(health_rows)
+        apply_daily_summaries(device.user_id, health_rows, device.user_timezone)
+        apply_running_stats(device.user_id, health_rows)
+        z_scores = apply_baseline(device.user_id, sensor_rows)
+        alerts = [build_ai_alert(device.user_id, ai_results)]
+        if settings.ANALYTICS_ALERTS_ENABLED:
+            alerts.append(build_anomaly_alert(device.user_id, flagged_deviations(z_scores)))
+        for alert in alerts:
+            if alert is not None:
+                alert.save()
+        touch_device(device.id)
+        # Vue patientèle du médecin, une fois les lectures visibles
+        transaction.on_commit(lambda: invalidate_cohort(device.user_medecin_id))
+
+    return sensor_rows, ai_results
+
+
+def touch_device(device_id):
+    """
+    Met à jour last_data_at avec un UPDATE conditionnel : la ligne Device
+    n'est réécrite qu'une fois par DEVICE_HEARTBEAT_INTERVAL secondes,
+    quel que soit le débit de lectures.
+    """
+    now = timezone.now()
+    interval = timedelta(seconds=getattr(settings, 'DEVICE_HEARTBEAT_INTERVAL', 60))
+    return Device.objects.filter(
+        Q(last_data_at__isnull=True) | Q(last_data_at__lt=now - interval),
+        pk=device_id,
+    ).update(last_data_at=now)
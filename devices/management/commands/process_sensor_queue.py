@@ -0,0 +1,151 @@
+"""
+Worker de l'ingestion asynchrone (SENSOR_INGESTION_MODE=async).
+Exécuter avec: python manage.py process_sensor_queue
+
+Les lectures sont réservées par lots avec SELECT ... FOR UPDATE SKIP LOCKED,
+traitées (une inférence IA par lot) puis supprimées de la file dans la même
+transaction : après un crash, la transaction est annulée et les lectures
+redeviennent disponibles pour le prochain passage. Plusieurs workers peuvent
+tourner en parallèle.
+
+Si l'inférence échoue (modèle indisponible, pool en panne), le lot reste en
+file avec attempts incrémenté : aucune lecture n'est enregistrée avec un
+résultat d'erreur IA. Le worker attend alors de plus en plus longtemps entre
+deux passages (jusqu'à MAX_BACKOFF secondes).
+"""
+
+import signal
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import F
+
+from ai_models.inference import to_dicts
+from devices.auth_cache import CachedDevice
+from devices.ai_service.medical_classifier import FEATURES, ai_service
+from devices.ingestion import ingest_readings, queue_stats
+from devices.models import Device, PendingReading
+
+# Attente maximale (s) entre deux passages quand aucun lot n'aboutit
+MAX_BACKOFF = 60
+
+
+class Command(BaseCommand):
+    help = "Traite la file d'attente des lectures capteurs (ingestion asynchrone)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500, help="Lectures réservées par lot")
+        parser.add_argument('--poll-interval', type=float, default=1.0, help="Attente (s) quand la file est vide")
+        parser.add_argument('--max-attempts', type=int, default=5, help="Échecs avant de laisser une lecture de côté")
+        parser.add_argument('--once', action='store_true', help="Vider la file puis s'arrêter")
+        parser.add_argument('--stats', action='store_true', help="Afficher l'état de la file et quitter")
+
+    def handle(self, *args, **options):
+        if options['stats']:
+            self.print_stats(queue_stats(options['max_attempts']))
+            return
+
+        self._stopping = False
+        signal.signal(signal.SIGTERM, self.stop)
+        signal.signal(signal.SIGINT, self.stop)
+
+        self.stdout.write("Worker d'ingestion démarré")
+        self.print_stats(queue_stats(options['max_attempts']))
+
+        backoff = options['poll_interval']
+        while not self._stopping:
+            started = time.monotonic()
+            processed, failed = self.process_batch(options['batch_size'], options['max_attempts'])
+
+            if processed or failed:
+                elapsed = time.monotonic() - started
+                stats = queue_stats(options['max_attempts'])
+                self.stdout.write(
+                    f"{processed} lectures traitées, {failed} en échec en {elapsed * 1000:.0f} ms "
+                    f"({processed / elapsed:.0f}/s) | file: {stats['depth']} | retard: {stats['lag_seconds']:.1f} s"
+                )
+                if processed:
+                    backoff = options['poll_interval']
+                elif not options['once']:
+                    # Tout le lot a échoué (ex: modèle indisponible) : pas de boucle serrée sur la file
+                    time.sleep(backoff)
+                    backoff = min(backoff * 2, MAX_BACKOFF)
+            elif options['once']:
+                break
+            else:
+                time.sleep(options['poll_interval'])
+
+        self.stdout.write(self.style.SUCCESS("Worker d'ingestion arrêté"))
+
+    def stop(self, signum, frame):
+        # Termine le lot en cours avant de s'arrêter
+        self._stopping = True
+
+    def print_stats(self, stats):
+        self.stdout.write(
+            f"File d'attente: {stats['depth']} lectures | retard: {stats['lag_seconds']:.1f} s | "
+            f"en échec: {stats['failing']}"
+        )
+
+    def process_batch(self, batch_size, max_attempts):
+        """Réserve, traite et retire un lot de la file. Retourne (traitées, en échec)"""
+        with transaction.atomic():
+            pending = list(
+                PendingReading.objects.select_for_update(skip_locked=True)
+                .filter(attempts__lt=max_attempts)
+                .order_by('id')[:batch_size]
+            )
+            if not pending:
+                return 0, 0
+
+            devices = {
+                row[0]: CachedDevice(*row)
+                for row in Device.objects.filter(id__in={p.device_id for p in pending}).values_list(
+                    'id', 'user_id', 'user__username', 'is_active', 'user__timezone', 'user__medecin_id'
+                )
+            }
+
+            # Une seule inférence pour tout le lot, tous devices confondus
+            rows = [[getattr(p, field) for field in FEATURES] for p in pending]
+            try:
+                predictions, version = ai_service.predict_many(rows, with_version=True)
+            except Exception as e:
+                # Les lectures restent en file plutôt que d'être enregistrées en erreur IA
+                PendingReading.objects.filter(id__in=[p.id for p in pending]).update(
+                    attempts=F('attempts') + 1,
+                    last_error=f"Inférence IA: {e}"[:1000]
+                )
+                self.stderr.write(f"Inférence IA impossible, lot laissé en file: {e}")
+                return 0, len(pending)
+            ai_results = to_dicts(predictions, version)
+
+            groups = {}
+            for index, p in enumerate(pending):
+                groups.setdefault(p.device_id, []).append(index)
+
+            done_ids = []
+            failed = 0
+            for device_id, indices in groups.items():
+                ids = [pending[i].id for i in indices]
+                try:
+                    with transaction.atomic():
+                        ingest_readings(
+                            devices[device_id],
+                            [rows[i] for i in indices],
+                            # Lectures mises en file sans horodatage : date de réception
+                            [pending[i].measured_at or pending[i].received_at for i in indices],
+                            [ai_results[i] for i in indices],
+                        )
+                except Exception as e:
+                    failed += len(ids)
+                    PendingReading.objects.filter(id__in=ids).update(
+                        attempts=F('attempts') + 1,
+                        last_error=str(e)[:1000]
+                    )
+                    self.stderr.write(f"Échec pour le device {device_id}: {e}")
+                else:
+                    done_ids.extend(ids)
+
+            PendingReading.objects.filter(id__in=done_ids).delete()
+            return len(done_ids), failed
@@ -0,0 +1,31 @@
+"""
+Recalcul des références personnelles des patients (PatientBaseline).
+Exécuter avec: python manage.py rebuild_patient_baselines [--user ID ...] [--window 500]
+
+Les références sont mises à jour à l'ingestion ; cette commande les
+recalcule depuis les dernières lectures de chaque patient, tous patients
+en un seul parcours vectorisé (devices.analytics). À lancer à la mise en
+place, après un changement de ANALYTICS_EWMA_SPAN ou d'import de lectures
+hors ingestion. Idempotente.
+"""
+
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from devices.analytics import rebuild_baselines
+
+
+class Command(BaseCommand):
+    help = "Recalcule les références EWMA des patients depuis leurs lectures récentes"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', type=int, action='append', dest='users', help="Limiter à cet utilisateur (répétable)")
+        parser.add_argument('--window', type=int, default=settings.ANALYTICS_WINDOW,
+                            help="Lectures récentes par patient (défaut: ANALYTICS_WINDOW)")
+
+    def handle(self, *args, **options):
+        started = time.monotonic()
+        written = rebuild_baselines(user_ids=options['users'], window=options['window'])
+        self.stdout.write(self.style.SUCCESS(f"{written} références recalculées en {time.monotonic() - started:.1f} s"))
@@ -0,0 +1,31 @@
+"""
+Recalcul des agrégats minute / heure / jour des SensorData (DeviceRollup, UserRollup).
+Exécuter avec: python manage.py rebuild_sensor_rollups [--user ID ...]
+
+Les agrégats sont maintenus à l'ingestion ; cette commande les reconstruit
+depuis l'historique (première mise en place, après rescore_sensor_data
+--no-rollups, après une suppression directe de SensorData, ou en cas de
+doute). Elle est idempotente.
+"""
+
+import time
+
+from django.core.management.base import BaseCommand
+
+from devices.rollups import RESOLUTIONS, rebuild_rollups
+
+
+class Command(BaseCommand):
+    help = "Reconstruit les agrégats multi-résolution des SensorData"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', type=int, action='append', dest='users', help="Limiter à cet utilisateur (répétable)")
+        parser.add_argument('--resolution', choices=list(RESOLUTIONS), action='append', dest='resolutions',
+                            help="Limiter à cette résolution (répétable)")
+
+    def handle(self, *args, **options):
+        started = time.monotonic()
+        created = rebuild_rollups(user_ids=options['users'], resolutions=options['resolutions'])
+        for resolution, (device_buckets, user_buckets) in created.items():
+            self.stdout.write(f"  {resolution}: {device_buckets} intervalles device, {user_buckets} intervalles utilisateur")
+        self.stdout.write(self.style.SUCCESS(f"Agrégats reconstruits en {time.monotonic() - started:.1f} s"))
@@ -0,0 +1,221 @@
+"""
+Recalcul des résultats IA des SensorData historiques (backfill).
+Exécuter avec: python manage.py rescore_sensor_data [--workers 4]
+
+Par défaut, seules les lectures non traitées (processed=False) ou analysées
+par une autre version du modèle sont recalculées (--all pour tout reprendre).
+La table est parcourue par plages de clés primaires : chaque paquet de
+--chunk-size lectures passe par une seule inférence vectorielle, est réécrit
+avec bulk_update et la progression est enregistrée (RescoreCheckpoint) dans
+la même transaction. Relancer la commande reprend là où elle s'était arrêtée ;
+la mémoire utilisée ne dépend que de --chunk-size.
+
+Avec --workers N, les plages sont réparties entre N process.
+
+Les agrégats par intervalle (devices.rollups) comptent les statuts IA : une
+fois le job terminé, ils sont reconstruits pour les patients dont un statut a
+changé (tous les patients si le job reprenait une exécution interrompue, dont
+les changements ne sont pas connus). --no-rollups laisse cette reconstruction
+à rebuild_sensor_rollups. Les HealthData ne sont pas liées à leur SensorData :
+leur status reste celui calculé à l'ingestion ; leurs résumés journaliers et
+statistiques cumulées ne dépendent pas du modèle.
+"""
+
+import multiprocessing
+import time
+
+import numpy as np
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections, transaction
+from django.db.models import Max, Min, Q
+
+from ai_models.inference import FEATURES, to_dicts
+from devices.ai_service.medical_classifier import ai_service
+from devices.models import RescoreCheckpoint, SensorData
+from devices.rollups import rebuild_rollups
+
+# Plages créées par worker : un worker libéré reprend une plage restante
+RANGES_PER_WORKER = 4
+
+# Champs propres à chaque lecture (bulk_update) ; version et processed sont communs au paquet
+UPDATED_FIELDS = ['ai_status', 'ai_status_name', 'ai_confidence', 'ai_probabilities']
+
+
+def rescore_range(checkpoint_id, chunk_size, rescore_all):
+    """
+    Traite une plage jusqu'au bout (exécuté dans le process courant ou un
+    process du pool). Retourne (id de la plage, lectures recalculées,
+    secondes, patients dont un statut IA a changé).
+    """
+    started = time.monotonic()
+    checkpoint = RescoreCheckpoint.objects.get(pk=checkpoint_id)
+    queryset = SensorData.objects.all()
+    if not rescore_all:
+        queryset = queryset.filter(
+            Q(processed=False) | Q(ai_model_version__isnull=True) | ~Q(ai_model_version=checkpoint.model_version)
+        )
+
+    scored = 0
+    changed_users = set()
+    while True:
+        rows = list(
+            queryset.filter(pk__gt=checkpoint.last_pk, pk__lte=checkpoint.end_pk)
+            .order_by('pk')
+            .values_list('pk', 'ai_status', 'device__user_id', *FEATURES)[:chunk_size]
+        )
+        if not rows:
+            break
+
+        pks = [row[0] for row in rows]
+        predictions, version = ai_service.predict_many(np.array([row[3:] for row in rows], dtype=float), with_version=True)
+        if version != checkpoint.model_version:
+            raise CommandError(
+                f"Le modèle servi ({version}) n'est plus celui du job ({checkpoint.model_version}) : "
+                f"relancer avec --restart"
+            )
+
+        updates = [
+            SensorData(
+                pk=pk,
+                ai_status=result['status'],
+                ai_status_name=result['status_name'],
+                ai_confidence=result['confidence'],
+                ai_probabilities=result['probabilities'],
+            )
+            for pk, result in zip(pks, to_dicts(predictions, version))
+        ]
+        changed_users.update(
+            user_id for (_, previous, user_id, *_), update in zip(rows, updates) if update.ai_status != previous
+        )
+        with transaction.atomic():
+            SensorData.objects.bulk_update(updates, UPDATED_FIELDS, batch_size=1000)
+            # Les lectures de l'intervalle non sélectionnées sont déjà à jour : un simple UPDATE par plage suffit
+            SensorData.objects.filter(pk__gte=pks[0], pk__lte=pks[-1]).update(
+                ai_model_version=version, processed=True
+            )
+            checkpoint.last_pk = pks[-1]
+            checkpoint.rows_scored += len(pks)
+            checkpoint.save(update_fields=['last_pk', 'rows_scored', 'updated_at'])
+        scored += len(pks)
+
+    checkpoint.last_pk = checkpoint.end_pk
+    checkpoint.completed = True
+    checkpoint.save(update_fields=['last_pk', 'completed', 'updated_at'])
+    return checkpoint_id, scored, time.monotonic() - started, changed_users
+
+
+def _rescore_range_task(args):
+    return rescore_range(*args)
+
+
+class Command(BaseCommand):
+    help = "Recalcule les résultats IA des SensorData (reprise possible après interruption)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=5000, help="Lectures par inférence et par bulk_update")
+        parser.add_argument('--workers', type=int, default=1, help="Process en parallèle")
+        parser.add_argument('--job', help="Nom du job (défaut: rescore-<version du modèle>)")
+        parser.add_argument('--all', action='store_true', help="Recalculer aussi les lectures déjà à jour")
+        parser.add_argument('--restart', action='store_true', help="Oublier la progression enregistrée du job")
+        parser.add_argument('--status', action='store_true', help="Afficher la progression du job et quitter")
+        parser.add_argument('--no-rollups', action='store_true',
+                            help="Ne pas reconstruire les agrégats (relancer rebuild_sensor_rollups ensuite)")
+
+    def handle(self, *args, **options):
+        if not ai_service.warm_up():
+            raise CommandError("Modèle IA non disponible")
+        version = ai_service.model_version
+        job = options['job'] or f"rescore-{version}"
+        checkpoints = RescoreCheckpoint.objects.filter(job=job)
+
+        if options['status']:
+            self.print_status(job, checkpoints)
+            return
+        if options['restart']:
+            checkpoints.delete()
+
+        if not checkpoints.exists():
+            self.create_ranges(job, version, options['workers'])
+        elif checkpoints.exclude(model_version=version).exists():
+            raise CommandError(f"Le job {job} a été commencé avec une autre version du modèle : utiliser --restart")
+
+        pending = list(checkpoints.filter(completed=False).values_list('id', flat=True))
+        if not pending:
+            self.stdout.write(self.style.SUCCESS(f"Job {job} déjà terminé"))
+            return
+
+        # Changements d'une exécution interrompue : inconnus, tous les agrégats seront reconstruits
+        resumed = checkpoints.filter(rows_scored__gt=0).exists()
+        self.stdout.write(f"Job {job}: {len(pending)} plages à traiter, modèle {version}, {options['workers']} worker(s)")
+        tasks = [(checkpoint_id, options['chunk_size'], options['all']) for checkpoint_id in pending]
+        started = time.monotonic()
+        total = 0
+        changed_users = set()
+
+        if options['workers'] > 1:
+            # Les process forkés ouvrent leurs propres connexions et héritent du modèle déjà chargé
+            connections.close_all()
+            with multiprocessing.get_context('fork').Pool(options['workers']) as pool:
+                for checkpoint_id, scored, seconds, users in pool.imap_unordered(_rescore_range_task, tasks):
+                    total += scored
+                    changed_users |= users
+                    self.report_range(checkpoint_id, scored, seconds)
+        else:
+            for task in tasks:
+                checkpoint_id, scored, seconds, users = rescore_range(*task)
+                total += scored
+                changed_users |= users
+                self.report_range(checkpoint_id, scored, seconds)
+
+        elapsed = time.monotonic() - started
+        self.stdout.write(self.style.SUCCESS(
+            f"{total} lectures recalculées en {elapsed:.1f} s ({total / elapsed if elapsed else 0:.0f}/s)"
+        ))
+        self.refresh_rollups(None if resumed else changed_users, options['no_rollups'])
+
+    def refresh_rollups(self, user_ids, skip):
+        """Reconstruit les agrégats des patients user_ids (tous si None)"""
+        if user_ids is not None and not user_ids:
+            return
+        if skip:
+            self.stdout.write(self.style.WARNING(
+                "Les statuts IA ont changé : relancer rebuild_sensor_rollups pour les agrégats"
+            ))
+            return
+        started = time.monotonic()
+        rebuild_rollups(user_ids=None if user_ids is None else sorted(user_ids))
+        scope = "tous les patients" if user_ids is None else f"{len(user_ids)} patients"
+        self.stdout.write(f"Agrégats reconstruits pour {scope} en {time.monotonic() - started:.1f} s")
+
+    def create_ranges(self, job, version, workers):
+        """Découpe ]min - 1, max] des clés en plages de même étendue"""
+        bounds = SensorData.objects.aggregate(low=Min('pk'), high=Max('pk'))
+        if bounds['low'] is None:
+            return
+        low, high = bounds['low'] - 1, bounds['high']
+        edges = np.unique(np.linspace(low, high, max(workers, 1) * RANGES_PER_WORKER + 1).round().astype(np.int64))
+        RescoreCheckpoint.objects.bulk_create([
+            RescoreCheckpoint(job=job, model_version=version, start_pk=start, end_pk=end, last_pk=start)
+            for start, end in zip(edges[:-1].tolist(), edges[1:].tolist())
+        ])
+
+    def report_range(self, checkpoint_id, scored, seconds):
+        self.stdout.write(
+            f"Plage {checkpoint_id}: {scored} lectures en {seconds:.1f} s "
+            f"({scored / seconds if seconds else 0:.0f}/s)"
+        )
+
+    def print_status(self, job, checkpoints):
+        ranges = list(checkpoints)
+        if not ranges:
+            self.stdout.write(f"Aucune progression enregistrée pour {job}")
+            return
+        done = sum(checkpoint.completed for checkpoint in ranges)
+        scored = sum(checkpoint.rows_scored for checkpoint in ranges)
+        self.stdout.write(f"Job {job} (modèle {ranges[0].model_version}): {done}/{len(ranges)} plages terminées, "
+                          f"{scored} lectures recalculées")
+        for checkpoint in ranges:
+            span = checkpoint.end_pk - checkpoint.start_pk
+            progress = (checkpoint.last_pk - checkpoint.start_pk) / span * 100 if span else 100
+            self.stdout.write(f"  ]{checkpoint.start_pk}, {checkpoint.end_pk}] {progress:5.1f}% "
+                              f"({checkpoint.rows_scored} lectures)")
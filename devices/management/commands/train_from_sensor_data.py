@@ -0,0 +1,244 @@
+"""
+Entraînement du modèle médical sur les lectures réelles (SensorData).
+Exécuter avec: python manage.py train_from_sensor_data [--days 90] [--per-class 200000]
+
+Les lectures analysées (processed=True, ai_status dans CLASS_NAMES : les
+erreurs IA, ai_status=-1, sont exclues) sont lues en flux par un curseur
+serveur (iterator(chunk_size=...)) et écrites directement dans des tableaux
+.npy memory-mappés (format de ai_models/data_cache.py) : la mémoire de
+l'export ne dépend que de --chunk-size, pas du volume de la table.
+L'étiquette est ai_status, le résultat du modèle servi au moment de l'analyse ;
+l'entraînement est refusé si l'une des quatre classes manque.
+
+L'échantillonnage par classe est exact et reproductible (--seed) : les
+effectifs par classe sont comptés d'abord, puis les rangs à garder sont tirés
+avant le parcours. --per-class plafonne chaque classe, --sample-rate garde une
+fraction de chaque classe. L'export est ensuite utilisé pour l'entraînement ;
+--publish le publie dans le registre sans l'activer (évaluable avec
+AI_SHADOW_MODEL), --activate le sert immédiatement.
+"""
+
+import os
+import time
+from datetime import datetime, timedelta
+from itertools import islice
+
+import numpy as np
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.db.models import Count, Max
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+
+from ai_models.data_cache import allocate_cache, open_cache, write_manifest
+from ai_models.inference import CLASS_NAMES, FEATURES
+from ai_models.medical_model import MedicalClassifier
+from devices.ai_service.medical_classifier import AI_MODEL_DIR
+from devices.models import SensorData
+
+DEFAULT_EXPORT_DIR = os.path.join(AI_MODEL_DIR, 'sensor_data.cache')
+
+
+def parse_moment(value):
+    """Date (AAAA-MM-JJ) ou date-heure ISO, dans le fuseau du projet"""
+    moment = parse_datetime(value)
+    if moment is None:
+        day = parse_date(value)
+        if day is None:
+            raise CommandError(f"Date invalide: {value}")
+        moment = datetime(day.year, day.month, day.day)
+    if timezone.is_naive(moment):
+        moment = timezone.make_aware(moment)
+    return moment
+
+
+def class_targets(counts, per_class=None, sample_rate=None):
+    """Lignes gardées par classe, à partir des effectifs de la fenêtre"""
+    targets = {}
+    for status, total in counts.items():
+        target = total
+        if sample_rate is not None:
+            target = int(round(total * sample_rate))
+        if per_class is not None:
+            target = min(target, per_class)
+        targets[status] = target
+    return targets
+
+
+class Command(BaseCommand):
+    help = "Entraîne le modèle médical sur les SensorData analysées (export en flux vers des .npy memory-mappés)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--since', help="Début de la fenêtre (date de réception, AAAA-MM-JJ ou ISO)")
+        parser.add_argument('--until', help="Fin de la fenêtre (exclue)")
+        parser.add_argument('--days', type=int, help="Fenêtre des N derniers jours (remplace --since)")
+        parser.add_argument('--per-class', type=int, help="Lectures maximum par classe")
+        parser.add_argument('--sample-rate', type=float, help="Fraction gardée dans chaque classe (0-1)")
+        parser.add_argument('--min-confidence', type=float, help="Confiance IA minimale (%%) des lectures gardées")
+        parser.add_argument('--model-version', help="Seulement les lectures analysées par cette version")
+        parser.add_argument('--seed', type=int, default=42)
+        parser.add_argument('--chunk-size', type=int, default=20000, help="Lignes lues par aller-retour du curseur")
+        parser.add_argument('--output', default=DEFAULT_EXPORT_DIR, help="Dossier de l'export")
+        parser.add_argument('--export-only', action='store_true', help="Exporter sans entraîner")
+        parser.add_argument('--skip-export', action='store_true', help="Entraîner sur l'export existant")
+        parser.add_argument('--publish', action='store_true', help="Publier le modèle dans le registre (inactif)")
+        parser.add_argument('--activate', action='store_true', help="Publier et servir le modèle")
+
+    def handle(self, *args, **options):
+        if options['sample_rate'] is not None and not 0 < options['sample_rate'] <= 1:
+            raise CommandError("--sample-rate doit être dans ]0, 1]")
+
+        if options['skip_export']:
+            try:
+                X, y, manifest = open_cache(options['output'])
+            except FileNotFoundError as exc:
+                raise CommandError(str(exc))
+            self.stdout.write(f"Export existant: {manifest['rows']} lectures ({options['output']})")
+        else:
+            X, y, manifest = self.export(options)
+
+        if options['export_only']:
+            return
+        # L'API d'inférence suppose les quatre classes de CLASS_NAMES, dans l'ordre
+        missing = sorted(set(CLASS_NAMES) - set(np.unique(y).tolist()))
+        if missing:
+            raise CommandError(
+                "Classes absentes de l'export: " + ", ".join(CLASS_NAMES[status] for status in missing)
+                + " (il faut les quatre classes pour entraîner le modèle)"
+            )
+        self.train(X, y, manifest, options)
+
+    def queryset(self, options):
+        # ai_status=-1 : erreur IA à l'analyse, pas une classe
+        queryset = SensorData.objects.filter(processed=True, ai_status__in=list(CLASS_NAMES))
+        since = options['since'] and parse_moment(options['since'])
+        if options['days']:
+            since = timezone.now() - timedelta(days=options['days'])
+        if since:
+            queryset = queryset.filter(created_at__gte=since)
+        if options['until']:
+            queryset = queryset.filter(created_at__lt=parse_moment(options['until']))
+        if options['min_confidence'] is not None:
+            queryset = queryset.filter(ai_confidence__gte=options['min_confidence'])
+        if options['model_version']:
+            queryset = queryset.filter(ai_model_version=options['model_version'])
+        return queryset.order_by()
+
+    def export(self, options):
+        started = time.monotonic()
+        queryset = self.queryset(options)
+        # Les lectures arrivées pendant l'export sont ignorées : les effectifs comptés restent valables
+        max_pk = queryset.aggregate(max_pk=Max('pk'))['max_pk']
+        if max_pk is None:
+            raise CommandError("Aucune lecture analysée dans la fenêtre demandée")
+        queryset = queryset.filter(pk__lte=max_pk)
+
+        counts = {
+            row['ai_status']: row['n']
+            for row in queryset.values('ai_status').annotate(n=Count('pk')).order_by('ai_status')
+        }
+        targets = class_targets(counts, options['per_class'], options['sample_rate'])
+        rng = np.random.default_rng(options['seed'])
+        # Rangs (dans l'ordre des clés) des lectures gardées, par classe ; None = toutes
+        selected = {
+            status: None if targets[status] >= total else np.sort(rng.choice(total, targets[status], replace=False))
+            for status, total in counts.items()
+        }
+        offsets = dict(zip(targets, np.cumsum([0] + list(targets.values()))[:-1].tolist()))
+        seen = dict.fromkeys(counts, 0)
+        filled = dict.fromkeys(counts, 0)
+
+        for status in counts:
+            self.stdout.write(f"  {CLASS_NAMES.get(status, status)}: {counts[status]} lectures, {targets[status]} gardées")
+
+        X, y = allocate_cache(options['output'], sum(targets.values()))
+        rows = queryset.order_by('pk').values_list(*FEATURES, 'ai_status').iterator(chunk_size=options['chunk_size'])
+        scanned = 0
+        while True:
+            chunk = list(islice(rows, options['chunk_size']))
+            if not chunk:
+                break
+            scanned += len(chunk)
+            block = np.array(chunk, dtype=np.float64)
+            statuses = block[:, -1].astype(np.int64)
+            for status in np.unique(statuses).tolist():
+                if status not in counts:
+                    continue  # Statut modifié depuis le comptage
+                indices = np.flatnonzero(statuses == status)
+                start = seen[status]
+                seen[status] += len(indices)
+                if selected[status] is not None:
+                    ranks = selected[status]
+                    kept = ranks[np.searchsorted(ranks, start):np.searchsorted(ranks, seen[status])]
+                    indices = indices[kept - start]
+                indices = indices[:targets[status] - filled[status]]
+                position = offsets[status] + filled[status]
+                X[position:position + len(indices)] = block[indices, :-1]
+                y[position:position + len(indices)] = status
+                filled[status] += len(indices)
+
+        X.flush()
+        y.flush()
+        del X, y
+        if filled != targets:
+            self.compact_export(options['output'], targets, offsets, filled)
+
+        elapsed = time.monotonic() - started
+        total = sum(filled.values())
+        window = {key: options[key] for key in ('since', 'until', 'days', 'min_confidence', 'model_version')}
+        write_manifest(
+            options['output'], total,
+            {'database': connection.vendor, 'table': SensorData._meta.db_table, 'max_pk': max_pk, **window},
+            label='ai_status',
+            class_counts={str(status): filled[status] for status in filled},
+            sampling={'per_class': options['per_class'], 'sample_rate': options['sample_rate'], 'seed': options['seed']},
+            export_seconds=round(elapsed, 3),
+            exported_at=timezone.now().isoformat(),
+        )
+        self.stdout.write(self.style.SUCCESS(
+            f"Export: {scanned} lectures parcourues, {total} gardées en {elapsed:.1f} s "
+            f"({scanned / elapsed if elapsed else 0:.0f} lectures/s) -> {options['output']}"
+        ))
+        return open_cache(options['output'])
+
+    def compact_export(self, output, targets, offsets, filled):
+        """Des lectures ont disparu ou changé de classe pendant l'export : les trous sont retirés"""
+        X_old = np.load(os.path.join(output, 'features.npy'), mmap_mode='r')
+        y_old = np.load(os.path.join(output, 'target.npy'), mmap_mode='r')
+        staging = output.rstrip(os.sep) + '.compact'
+        X, y = allocate_cache(staging, sum(filled.values()))
+        position = 0
+        for status in targets:
+            count = filled[status]
+            X[position:position + count] = X_old[offsets[status]:offsets[status] + count]
+            y[position:position + count] = y_old[offsets[status]:offsets[status] + count]
+            position += count
+        X.flush()
+        y.flush()
+        del X, y, X_old, y_old
+        for name in ('features.npy', 'target.npy'):
+            os.replace(os.path.join(staging, name), os.path.join(output, name))
+        os.rmdir(staging)
+
+    def train(self, X, y, manifest, options):
+        classifier = MedicalClassifier()
+        started = time.monotonic()
+        accuracy = classifier.train(X, y)
+        elapsed = time.monotonic() - started
+        self.stdout.write(self.style.SUCCESS(
+            f"Entraînement: {len(X)} lectures en {elapsed:.1f} s ({len(X) / elapsed if elapsed else 0:.0f} lectures/s)"
+        ))
+
+        if options['publish'] or options['activate']:
+            training_info = {
+                'source': 'sensor_data',
+                'rows': manifest['rows'],
+                'class_counts': manifest.get('class_counts'),
+                'window': {key: manifest['source'].get(key) for key in ('since', 'until', 'days', 'max_pk')},
+                'label': manifest.get('label'),
+            }
+            classifier.publish(
+                metrics={'accuracy': round(float(accuracy), 4)},
+                activate=options['activate'],
+                training_info=training_info,
+            )
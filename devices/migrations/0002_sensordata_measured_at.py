@@ -0,0 +1,18 @@
+# Generated by Django 5.2.10 on 2026-10-17 04:33
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('devices', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='sensordata',
+            name='measured_at',
+            field=models.DateTimeField(blank=True, help_text='Horodatage de la mesure fourni par le device (mode batch)', null=True),
+        ),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 5.2.10 on 2026-10-17 04:39
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('devices', '0002_sensordata_measured_at'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PendingReading',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('cov_ppb', models.FloatField()),
+                ('eco2_ppm', models.FloatField()),
+                ('heart_rate', models.FloatField()),
+                ('spo2', models.FloatField()),
+                ('temperature', models.FloatField()),
+                ('measured_at', models.DateTimeField(blank=True, null=True)),
+                ('received_at', models.DateTimeField(auto_now_add=True)),
+                ('attempts', models.PositiveIntegerField(default=0, help_text='Nombre de traitements en échec')),
+                ('last_error', models.TextField(blank=True, default='')),
+                ('device', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='pending_readings', to='devices.device')),
+            ],
+            options={
+                'ordering': ['id'],
+            },
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.10 on 2026-10-17 04:45
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('devices', '0003_pendingreading'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='sensordata',
+            name='ai_model_version',
+            field=models.CharField(blank=True, help_text='Version du modèle ayant produit le résultat', max_length=64, null=True),
+        ),
+    ]
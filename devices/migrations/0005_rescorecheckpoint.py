@@ -0,0 +1,31 @@
+# Generated by Django 5.2.10 on 2026-10-17 04:54
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('devices', '0004_sensordata_ai_model_version'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RescoreCheckpoint',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('job', models.CharField(max_length=100)),
+                ('model_version', models.CharField(help_text='Version du modèle utilisée par le job', max_length=64)),
+                ('start_pk', models.BigIntegerField(help_text='Borne basse exclue')),
+                ('end_pk', models.BigIntegerField(help_text='Borne haute incluse')),
+                ('last_pk', models.BigIntegerField(help_text='Dernière clé traitée')),
+                ('rows_scored', models.BigIntegerField(default=0)),
+                ('completed', models.BooleanField(default=False)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'ordering': ['job', 'start_pk'],
+                'unique_together': {('job', 'start_pk')},
+            },
+        ),
+    ]
@@ -0,0 +1,92 @@
+# Generated by Django 5.2.10 on 2026-10-17 05:07
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('devices', '0005_rescorecheckpoint'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DeviceRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('resolution', models.CharField(choices=[('minute', 'Minute'), ('hour', 'Heure'), ('day', 'Jour')], max_length=10)),
+                ('bucket', models.DateTimeField(help_text="Début de l'intervalle (UTC)")),
+                ('count', models.PositiveIntegerField(default=0)),
+                ('cov_ppb_min', models.FloatField()),
+                ('cov_ppb_max', models.FloatField()),
+                ('cov_ppb_sum', models.FloatField()),
+                ('cov_ppb_sumsq', models.FloatField()),
+                ('eco2_ppm_min', models.FloatField()),
+                ('eco2_ppm_max', models.FloatField()),
+                ('eco2_ppm_sum', models.FloatField()),
+                ('eco2_ppm_sumsq', models.FloatField()),
+                ('heart_rate_min', models.FloatField()),
+                ('heart_rate_max', models.FloatField()),
+                ('heart_rate_sum', models.FloatField()),
+                ('heart_rate_sumsq', models.FloatField()),
+                ('spo2_min', models.FloatField()),
+                ('spo2_max', models.FloatField()),
+                ('spo2_sum', models.FloatField()),
+                ('spo2_sumsq', models.FloatField()),
+                ('temperature_min', models.FloatField()),
+                ('temperature_max', models.FloatField()),
+                ('temperature_sum', models.FloatField()),
+                ('temperature_sumsq', models.FloatField()),
+                ('status_0', models.PositiveIntegerField(default=0)),
+                ('status_1', models.PositiveIntegerField(default=0)),
+                ('status_2', models.PositiveIntegerField(default=0)),
+                ('status_3', models.PositiveIntegerField(default=0)),
+                ('device', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='rollups', to='devices.device')),
+            ],
+            options={
+                'ordering': ['device', 'resolution', 'bucket'],
+                'unique_together': {('device', 'resolution', 'bucket')},
+            },
+        ),
+        migrations.CreateModel(
+            name='UserRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('resolution', models.CharField(choices=[('minute', 'Minute'), ('hour', 'Heure'), ('day', 'Jour')], max_length=10)),
+                ('bucket', models.DateTimeField(help_text="Début de l'intervalle (UTC)")),
+                ('count', models.PositiveIntegerField(default=0)),
+                ('cov_ppb_min', models.FloatField()),
+                ('cov_ppb_max', models.FloatField()),
+                ('cov_ppb_sum', models.FloatField()),
+                ('cov_ppb_sumsq', models.FloatField()),
+                ('eco2_ppm_min', models.FloatField()),
+                ('eco2_ppm_max', models.FloatField()),
+                ('eco2_ppm_sum', models.FloatField()),
+                ('eco2_ppm_sumsq', models.FloatField()),
+                ('heart_rate_min', models.FloatField()),
+                ('heart_rate_max', models.FloatField()),
+                ('heart_rate_sum', models.FloatField()),
+                ('heart_rate_sumsq', models.FloatField()),
+                ('spo2_min', models.FloatField()),
+                ('spo2_max', models.FloatField()),
+                ('spo2_sum', models.FloatField()),
+                ('spo2_sumsq', models.FloatField()),
+                ('temperature_min', models.FloatField()),
+                ('temperature_max', models.FloatField()),
+                ('temperature_sum', models.FloatField()),
+                ('temperature_sumsq', models.FloatField()),
+                ('status_0', models.PositiveIntegerField(default=0)),
+                ('status_1', models.PositiveIntegerField(default=0)),
+                ('status_2', models.PositiveIntegerField(default=0)),
+                ('status_3', models.PositiveIntegerField(default=0)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='sensor_rollups', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'ordering': ['user', 'resolution', 'bucket'],
+                'unique_together': {('user', 'resolution', 'bucket')},
+            },
+        ),
+    ]
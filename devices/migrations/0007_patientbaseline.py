@@ -0,0 +1,38 @@
+# Generated by Django 5.2.10 on 2026-10-17 05:16
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('devices', '0006_sensor_rollups'),
+        ('users', '0005_user_timezone'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PatientBaseline',
+            fields=[
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='baseline', serialize=False, to=settings.AUTH_USER_MODEL)),
+                ('count', models.PositiveIntegerField(default=0, help_text='Lectures intégrées à la référence')),
+                ('last_at', models.DateTimeField(blank=True, help_text='Horodatage de la dernière lecture', null=True)),
+                ('heart_rate_mean', models.FloatField(default=0)),
+                ('heart_rate_var', models.FloatField(default=0)),
+                ('heart_rate_last', models.FloatField(blank=True, null=True)),
+                ('spo2_mean', models.FloatField(default=0)),
+                ('spo2_var', models.FloatField(default=0)),
+                ('spo2_last', models.FloatField(blank=True, null=True)),
+                ('temperature_mean', models.FloatField(default=0)),
+                ('temperature_var', models.FloatField(default=0)),
+                ('temperature_last', models.FloatField(blank=True, null=True)),
+                ('cov_ppb_mean', models.FloatField(default=0)),
+                ('cov_ppb_var', models.FloatField(default=0)),
+                ('cov_ppb_last', models.FloatField(blank=True, null=True)),
+                ('deviations', models.JSONField(blank=True, default=dict)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+    ]
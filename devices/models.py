@@ -40,9 +40,11 @@ class SensorData(models.Model):
     ai_status_name = models.CharField(max_length=50, null=True, blank=True)
     ai_confidence = models.FloatField(null=True, blank=True, help_text="Confiance de l'IA en %")
     ai_probabilities = models.JSONField(null=True, blank=True, help_text="Probabilités pour chaque classe")
+    ai_model_version = models.CharField(max_length=64, null=True, blank=True, help_text="Version du modèle ayant produit le résultat")
     
     # Métadonnées
     created_at = models.DateTimeField(auto_now_add=True)
+    measured_at = models.DateTimeField(null=True, blank=True, help_text="Horodatage de la mesure fourni par le device (mode batch)")
     processed = models.BooleanField(default=False)
 
     class Meta:
@@ -50,3 +52,155 @@ class SensorData(models.Model):
 
     def __str__(self):
         return f"Data {self.device.name} - {self.created_at.strftime('%Y-%m-%d %H:%M')}"
+
+
+class PendingReading(models.Model):
+    """
+    File d'attente durable des lectures reçues en mode asynchrone.
+    Vidée par la commande process_sensor_queue.
+    """
+    device = models.ForeignKey(Device, on_delete=models.CASCADE, related_name='pending_readings')
+    
+    cov_ppb = models.FloatField()
+    eco2_ppm = models.FloatField()
+    heart_rate = models.FloatField()
+    spo2 = models.FloatField()
+    temperature = models.FloatField()
+    measured_at = models.DateTimeField(null=True, blank=True)
+    
+    received_at = models.DateTimeField(auto_now_add=True)
+    attempts = models.PositiveIntegerField(default=0, help_text="Nombre de traitements en échec")
+    last_error = models.TextField(blank=True, default='')
+
+    class Meta:
+        ordering = ['id']
+
+    def __str__(self):
+        return f"Lecture en attente {self.device_id} - {self.received_at.strftime('%Y-%m-%d %H:%M:%S')}"
+
+
+class RescoreCheckpoint(models.Model):
+    """
+    Progression de la commande rescore_sensor_data : une ligne par plage de
+    clés primaires d'un job, pour reprendre après une interruption.
+    """
+    job = models.CharField(max_length=100)
+    model_version = models.CharField(max_length=64, help_text="Version du modèle utilisée par le job")
+    start_pk = models.BigIntegerField(help_text="Borne basse exclue")
+    end_pk = models.BigIntegerField(help_text="Borne haute incluse")
+    last_pk = models.BigIntegerField(help_text="Dernière clé traitée")
+    rows_scored = models.BigIntegerField(default=0)
+    completed = models.BooleanField(default=False)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        ordering = ['job', 'start_pk']
+        unique_together = ('job', 'start_pk')
+
+    def __str__(self):
+        return f"{self.job} ]{self.start_pk}, {self.end_pk}] -> {self.last_pk}"
+
+
+class SensorRollup(models.Model):
+    """
+    Agrégat des SensorData d'un intervalle (minute, heure ou jour, en UTC) :
+    nombre de lectures, min, max, somme et somme des carrés de chaque
+    paramètre, histogramme des statuts IA. Maintenu à l'ingestion
+    (devices.rollups), reconstruit par rebuild_sensor_rollups.
+    """
+    RESOLUTION_CHOICES = [
+        ('minute', 'Minute'),
+        ('hour', 'Heure'),
+        ('day', 'Jour'),
+    ]
+
+    resolution = models.CharField(max_length=10, choices=RESOLUTION_CHOICES)
+    bucket = models.DateTimeField(help_text="Début de l'intervalle (UTC)")
+    count = models.PositiveIntegerField(default=0)
+
+    cov_ppb_min = models.FloatField()
+    cov_ppb_max = models.FloatField()
+    cov_ppb_sum = models.FloatField()
+    cov_ppb_sumsq = models.FloatField()
+    eco2_ppm_min = models.FloatField()
+    eco2_ppm_max = models.FloatField()
+    eco2_ppm_sum = models.FloatField()
+    eco2_ppm_sumsq = models.FloatField()
+    heart_rate_min = models.FloatField()
+    heart_rate_max = models.FloatField()
+    heart_rate_sum = models.FloatField()
+    heart_rate_sumsq = models.FloatField()
+    spo2_min = models.FloatField()
+    spo2_max = models.FloatField()
+    spo2_sum = models.FloatField()
+    spo2_sumsq = models.FloatField()
+    temperature_min = models.FloatField()
+    temperature_max = models.FloatField()
+    temperature_sum = models.FloatField()
+    temperature_sumsq = models.FloatField()
+
+    # Histogramme des statuts IA (0=Sain, 1=Infection légère, 2=Infection modérée, 3=Hypoxie sévère)
+    status_0 = models.PositiveIntegerField(default=0)
+    status_1 = models.PositiveIntegerField(default=0)
+    status_2 = models.PositiveIntegerField(default=0)
+    status_3 = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        abstract = True
+
+
+class DeviceRollup(SensorRollup):
+    device = models.ForeignKey(Device, on_delete=models.CASCADE, related_name='rollups')
+
+    class Meta:
+        ordering = ['device', 'resolution', 'bucket']
+        unique_together = ('device', 'resolution', 'bucket')
+
+    def __str__(self):
+        return f"{self.device_id} {self.resolution} {self.bucket:%Y-%m-%d %H:%M}"
+
+
+class UserRollup(SensorRollup):
+    """Toutes les lectures des devices d'un utilisateur"""
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='sensor_rollups')
+
+    class Meta:
+        ordering = ['user', 'resolution', 'bucket']
+        unique_together = ('user', 'resolution', 'bucket')
+
+    def __str__(self):
+        return f"{self.user_id} {self.resolution} {self.bucket:%Y-%m-%d %H:%M}"
+
+
+class PatientBaseline(models.Model):
+    """
+    Référence personnelle d'un patient (devices.analytics) : moyenne et
+    variance exponentielles (EWMA) de la fréquence cardiaque, de la SpO2, de
+    la température et des COV, dernière valeur de chaque paramètre (vitesse de
+    variation) et écarts de la lecture la plus récente. Mise à jour à
+    l'ingestion, recalculée par rebuild_patient_baselines.
+    """
+    user = models.OneToOneField(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, primary_key=True,
+                                related_name='baseline')
+    count = models.PositiveIntegerField(default=0, help_text="Lectures intégrées à la référence")
+    last_at = models.DateTimeField(null=True, blank=True, help_text="Horodatage de la dernière lecture")
+
+    heart_rate_mean = models.FloatField(default=0)
+    heart_rate_var = models.FloatField(default=0)
+    heart_rate_last = models.FloatField(null=True, blank=True)
+    spo2_mean = models.FloatField(default=0)
+    spo2_var = models.FloatField(default=0)
+    spo2_last = models.FloatField(null=True, blank=True)
+    temperature_mean = models.FloatField(default=0)
+    temperature_var = models.FloatField(default=0)
+    temperature_last = models.FloatField(null=True, blank=True)
+    cov_ppb_mean = models.FloatField(default=0)
+    cov_ppb_var = models.FloatField(default=0)
+    cov_ppb_last = models.FloatField(null=True, blank=True)
+
+    # Écarts de la dernière lecture : {"at", "z": {paramètre: z}, "rate_per_min": {...}, "max_abs_z"}
+    deviations = models.JSONField(default=dict, blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"Référence {self.user_id} ({self.count} lectures)"
@@ -0,0 +1,295 @@
+"""
+Agrégats multi-résolution des SensorData (DeviceRollup, UserRollup).
+
+Chaque intervalle (minute, heure, jour, en UTC) garde le nombre de lectures,
+le min, le max, la somme et la somme des carrés de chaque paramètre et
+l'histogramme des statuts IA : moyenne et écart-type se déduisent des sommes
+et deux intervalles se fusionnent exactement. Les courbes lisent ces tables
+au lieu de parcourir SensorData.
+
+- apply_rollups : appelé par ingest_readings dans sa transaction ; le lot est
+  agrégé avec NumPy puis fusionné par merge_counters (un INSERT ... ON
+  CONFLICT DO UPDATE par table, sûr entre workers concurrents).
+- rebuild_rollups : recalcul complet depuis SensorData (commande
+  rebuild_sensor_rollups), idempotent. Les agrégats ne sont jamais
+  décrémentés (min et max ne se retirent pas) : la suppression d'un device
+  reconstruit ceux de son utilisateur (devices/signals.py), mais des
+  SensorData supprimées directement (admin, shell) imposent de relancer
+  rebuild_sensor_rollups --user ID.
+- series : points d'une courbe, à la résolution la plus grossière qui
+  remplit encore la largeur demandée.
+"""
+
+from datetime import datetime, timezone as dt_timezone
+
+import numpy as np
+from django.db import connection, transaction
+from django.db.models import Count, F, Max, Min, Q, Sum
+from django.db.models.functions import Coalesce, Trunc
+
+from .ai_service.medical_classifier import CLASS_NAMES, FEATURES
+from .models import DeviceRollup, SensorData, UserRollup
+
+# Largeur des intervalles en secondes, de la plus fine à la plus grossière
+RESOLUTIONS = {
+    'minute': 60,
+    'hour': 3600,
+    'day': 86400,
+}
+
+STATS = ('min', 'max', 'sum', 'sumsq')
+STAT_FIELDS = [f'{vital}_{stat}' for vital in FEATURES for stat in STATS]
+STATUS_FIELDS = [f'status_{status}' for status in sorted(CLASS_NAMES)]
+
+# Lignes insérées par requête pendant un rebuild
+REBUILD_BATCH_SIZE = 5000
+
+
+def _epoch(moment):
+    return moment.timestamp()
+
+
+def aggregate_readings(values, statuses, timestamps):
+    """
+    Agrège un lot de lectures pour chaque résolution.
+
+    Returns:
+        liste de (resolution, début de l'intervalle, dict des champs de SensorRollup)
+    """
+    values = np.asarray(values, dtype=np.float64).reshape(-1, len(FEATURES))
+    # Erreurs IA (ai_status=-1) et lectures non analysées : comptées dans count, hors histogramme
+    statuses = np.asarray(statuses, dtype=np.float64)
+    classified = np.isin(statuses, sorted(CLASS_NAMES))
+    status_columns = statuses[classified].astype(np.int64)
+    seconds = np.array([_epoch(moment) for moment in timestamps], dtype=np.float64)
+
+    rows = []
+    for resolution, width in RESOLUTIONS.items():
+        starts = (seconds // width).astype(np.int64) * width
+        buckets, inverse = np.unique(starts, return_inverse=True)
+        n_buckets = len(buckets)
+
+        counts = np.bincount(inverse, minlength=n_buckets)
+        sums = np.zeros((n_buckets, len(FEATURES)))
+        sumsq = np.zeros((n_buckets, len(FEATURES)))
+        mins = np.full((n_buckets, len(FEATURES)), np.inf)
+        maxs = np.full((n_buckets, len(FEATURES)), -np.inf)
+        histogram = np.zeros((n_buckets, len(STATUS_FIELDS)), dtype=np.int64)
+        np.add.at(sums, inverse, values)
+        np.add.at(sumsq, inverse, values * values)
+        np.minimum.at(mins, inverse, values)
+        np.maximum.at(maxs, inverse, values)
+        np.add.at(histogram, (inverse[classified], status_columns), 1)
+
+        stats = np.stack([mins, maxs, sums, sumsq], axis=2).reshape(n_buckets, -1)
+        for index, start in enumerate(buckets.tolist()):
+            fields = {'count': int(counts[index])}
+            fields.update(zip(STAT_FIELDS, stats[index].tolist()))
+            fields.update(zip(STATUS_FIELDS, histogram[index].tolist()))
+            rows.append((resolution, datetime.fromtimestamp(start, tz=dt_timezone.utc), fields))
+    return rows
+
+
+def merge_counters(model, conflict_fields, rows):
+    """
+    Fusionne des lignes d'agrégats dans leur table en une requête (INSERT ...
+    ON CONFLICT DO UPDATE) : les champs *_min et *_max se combinent, tous les
+    autres s'additionnent. Sûr entre transactions concurrentes.
+
+    rows : dicts {attname: valeur}, tous avec les mêmes clés
+    """
+    if not rows:
+        return
+    quote = connection.ops.quote_name
+    table = quote(model._meta.db_table)
+    least, greatest = ('LEAST', 'GREATEST') if connection.vendor == 'postgresql' else ('MIN', 'MAX')
+
+    columns = list(rows[0])
+    fields = [model._meta.get_field(column) for column in columns]
+    updates = []
+    for column in columns:
+        if column in conflict_fields:
+            continue
+        quoted = quote(column)
+        if column.endswith('_min'):
+            updates.append(f"{quoted} = {least}({table}.{quoted}, EXCLUDED.{quoted})")
+        elif column.endswith('_max'):
+            updates.append(f"{quoted} = {greatest}({table}.{quoted}, EXCLUDED.{quoted})")
+        else:
+            updates.append(f"{quoted} = {table}.{quoted} + EXCLUDED.{quoted}")
+
+    params = [
+        field.get_db_prep_value(row[column], connection)
+        for row in rows
+        for column, field in zip(columns, fields)
+    ]
+    placeholder = '(' + ', '.join(['%s'] * len(columns)) + ')'
+    sql = (
+        f"INSERT INTO {table} ({', '.join(quote(column) for column in columns)}) "
+        f"VALUES {', '.join([placeholder] * len(rows))} "
+        f"ON CONFLICT ({', '.join(quote(column) for column in conflict_fields)}) "
+        f"DO UPDATE SET {', '.join(updates)}"
+    )
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+
+
+def apply_rollups(device_id, user_id, sensor_rows):
+    """Ajoute des SensorData qui viennent d'être créés aux agrégats de leur device et de leur utilisateur"""
+    if not sensor_rows:
+        return
+    rows = aggregate_readings(
+        [[getattr(row, field) for field in FEATURES] for row in sensor_rows],
+        [row.ai_status for row in sensor_rows],
+        [row.measured_at or row.created_at for row in sensor_rows],
+    )
+    merge_counters(DeviceRollup, ['device_id', 'resolution', 'bucket'], [
+        {'device_id': device_id, 'resolution': resolution, 'bucket': bucket, **fields}
+        for resolution, bucket, fields in rows
+    ])
+    merge_counters(UserRollup, ['user_id', 'resolution', 'bucket'], [
+        {'user_id': user_id, 'resolution': resolution, 'bucket': bucket, **fields}
+        for resolution, bucket, fields in rows
+    ])
+
+
+def _rollup_aggregates():
+    aggregates = {'count': Count('pk')}
+    for vital in FEATURES:
+        aggregates[f'{vital}_min'] = Min(vital)
+        aggregates[f'{vital}_max'] = Max(vital)
+        aggregates[f'{vital}_sum'] = Sum(vital)
+        aggregates[f'{vital}_sumsq'] = Sum(F(vital) * F(vital))
+    for status, field in zip(sorted(CLASS_NAMES), STATUS_FIELDS):
+        aggregates[field] = Count('pk', filter=Q(ai_status=status))
+    return aggregates
+
+
+def rebuild_rollups(user_ids=None, resolutions=None):
+    """
+    Recalcule les agrégats depuis SensorData (tous les utilisateurs, ou
+    seulement user_ids) : suppression puis un GROUP BY par table et par
+    résolution, dans une transaction. Relancer donne le même résultat.
+
+    Returns:
+        {resolution: (intervalles device, intervalles utilisateur)}
+    """
+    resolutions = resolutions or list(RESOLUTIONS)
+    readings = SensorData.objects.annotate(moment=Coalesce('measured_at', 'created_at'))
+    device_rollups = DeviceRollup.objects.filter(resolution__in=resolutions)
+    user_rollups = UserRollup.objects.filter(resolution__in=resolutions)
+    if user_ids is not None:
+        readings = readings.filter(device__user_id__in=user_ids)
+        device_rollups = device_rollups.filter(device__user_id__in=user_ids)
+        user_rollups = user_rollups.filter(user_id__in=user_ids)
+
+    created = {}
+    with transaction.atomic():
+        device_rollups.delete()
+        user_rollups.delete()
+        for resolution in resolutions:
+            bucketed = readings.annotate(
+                rollup_bucket=Trunc('moment', resolution, tzinfo=dt_timezone.utc)
+            ).order_by()
+            created[resolution] = (
+                _insert_groups(DeviceRollup, 'device_id', 'device_id', resolution, bucketed),
+                _insert_groups(UserRollup, 'user_id', 'device__user_id', resolution, bucketed),
+            )
+    return created
+
+
+def _insert_groups(model, owner_attname, owner_lookup, resolution, readings):
+    groups = readings.values(owner_lookup, 'rollup_bucket').annotate(**_rollup_aggregates())
+    batch = []
+    total = 0
+    for group in groups.iterator(chunk_size=REBUILD_BATCH_SIZE):
+        owner_id = group.pop(owner_lookup)
+        bucket = group.pop('rollup_bucket')
+        batch.append(model(resolution=resolution, bucket=bucket, **{owner_attname: owner_id}, **group))
+        if len(batch) >= REBUILD_BATCH_SIZE:
+            model.objects.bulk_create(batch)
+            total += len(batch)
+            batch = []
+    model.objects.bulk_create(batch)
+    return total + len(batch)
+
+
+def choose_resolution(start, end, points):
+    """Résolution la plus grossière qui donne encore au moins points intervalles (sinon la plus fine)"""
+    span = (end - start).total_seconds()
+    for resolution, width in sorted(RESOLUTIONS.items(), key=lambda item: -item[1]):
+        if span / width >= points:
+            return resolution
+    return next(iter(RESOLUTIONS))
+
+
+def series(start, end, points=200, device_id=None, user_id=None):
+    """
+    Courbe des paramètres entre start et end pour un device ou un
+    utilisateur. Les intervalles de la résolution choisie sont regroupés par
+    paquets consécutifs pour ne pas dépasser ~2 x points valeurs ; les
+    intervalles sans lecture sont absents.
+
+    Returns:
+        dict : résolution source, largeur d'un point (s) et points
+        (début, nombre de lectures, moyenne/écart-type/min/max par paramètre,
+        histogramme des statuts IA)
+    """
+    if device_id is not None:
+        rollups = DeviceRollup.objects.filter(device_id=device_id)
+    else:
+        rollups = UserRollup.objects.filter(user_id=user_id)
+
+    resolution = choose_resolution(start, end, points)
+    width = RESOLUTIONS[resolution]
+    origin = int(_epoch(start) // width) * width
+    step = width * max(1, int((_epoch(end) - origin) / width // points))
+
+    fields = ['bucket', 'count'] + STAT_FIELDS + STATUS_FIELDS
+    rows = list(
+        rollups.filter(
+            resolution=resolution,
+            bucket__gte=datetime.fromtimestamp(origin, tz=dt_timezone.utc),
+            bucket__lt=end,
+        ).order_by('bucket').values_list(*fields)
+    )
+    result = {'resolution': resolution, 'step_seconds': step, 'points': []}
+    if not rows:
+        return result
+
+    buckets = np.array([_epoch(row[0]) for row in rows])
+    data = np.array([row[1:] for row in rows], dtype=np.float64)
+    groups, inverse = np.unique(((buckets - origin) // step).astype(np.int64), return_inverse=True)
+
+    counts = np.bincount(inverse, weights=data[:, 0], minlength=len(groups))
+    stats = data[:, 1:1 + len(STAT_FIELDS)].reshape(len(rows), len(FEATURES), len(STATS))
+    mins = np.full((len(groups), len(FEATURES)), np.inf)
+    maxs = np.full((len(groups), len(FEATURES)), -np.inf)
+    sums = np.zeros((len(groups), len(FEATURES)))
+    sumsq = np.zeros((len(groups), len(FEATURES)))
+    histogram = np.zeros((len(groups), len(STATUS_FIELDS)))
+    np.minimum.at(mins, inverse, stats[:, :, 0])
+    np.maximum.at(maxs, inverse, stats[:, :, 1])
+    np.add.at(sums, inverse, stats[:, :, 2])
+    np.add.at(sumsq, inverse, stats[:, :, 3])
+    np.add.at(histogram, inverse, data[:, 1 + len(STAT_FIELDS):])
+
+    means = sums / counts[:, None]
+    stds = np.sqrt(np.maximum(sumsq / counts[:, None] - means ** 2, 0))
+
+    for index, group in enumerate(groups.tolist()):
+        point = {
+            'start': datetime.fromtimestamp(origin + group * step, tz=dt_timezone.utc).isoformat(),
+            'count': int(counts[index]),
+            'ai_status': dict(zip((CLASS_NAMES[status] for status in sorted(CLASS_NAMES)),
+                                  histogram[index].astype(int).tolist())),
+        }
+        for column, vital in enumerate(FEATURES):
+            point[vital] = {
+                'mean': round(float(means[index, column]), 2),
+                'std': round(float(stds[index, column]), 2),
+                'min': float(mins[index, column]),
+                'max': float(maxs[index, column]),
+            }
+        result['points'].append(point)
+    return result
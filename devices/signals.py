@@ -0,0 +1,52 @@
+from django.conf import settings
+from django.db import transaction
+from django.db.models.signals import pre_save, post_save, post_delete
+from django.dispatch import receiver
+
+from .models import Device
+from .auth_cache import device_key_cache
+from .rollups import rebuild_rollups
+
+# Champs de l'utilisateur gardés avec les clés de ses devices (auth_cache.CachedDevice)
+CACHED_USER_FIELDS = {'username', 'timezone', 'medecin', 'medecin_id'}
+
+
+@receiver(pre_save, sender=Device)
+def remember_previous_device_key(sender, instance, **kwargs):
+    """Garde l'ancienne clé pour l'invalider si elle est régénérée"""
+    if instance._state.adding:
+        instance._previous_device_key = None
+    else:
+        instance._previous_device_key = Device.objects.filter(pk=instance.pk).values_list(
+            'device_key', flat=True
+        ).first()
+
+
+@receiver(post_save, sender=Device)
+def invalidate_device_key_on_save(sender, instance, **kwargs):
+    # La nouvelle clé est aussi invalidée : elle peut être en cache négatif
+    device_key_cache.invalidate(getattr(instance, '_previous_device_key', None), instance.device_key)
+
+
+@receiver(post_delete, sender=Device)
+def invalidate_device_key_on_delete(sender, instance, **kwargs):
+    device_key_cache.invalidate(instance.device_key)
+
+
+@receiver(post_delete, sender=Device)
+def rebuild_user_rollups_on_device_delete(sender, instance, **kwargs):
+    """
+    Les lectures du device partent en cascade, avec ses DeviceRollup ; les
+    UserRollup de son utilisateur (min / max non soustractibles) sont
+    reconstruits après le commit
+    """
+    user_id = instance.user_id
+    transaction.on_commit(lambda: rebuild_rollups(user_ids=[user_id]))
+
+
+@receiver(post_save, sender=settings.AUTH_USER_MODEL)
+def invalidate_device_keys_on_user_save(sender, instance, created, update_fields=None, **kwargs):
+    """Fuseau, médecin ou username modifié (vues, admin, shell) : les clés des devices sont rechargées"""
+    if created or (update_fields is not None and not CACHED_USER_FIELDS & set(update_fields)):
+        return
+    device_key_cache.invalidate(*Device.objects.filter(user=instance).values_list('device_key', flat=True))
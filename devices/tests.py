@@ -1,3 +1,807 @@
-from django.test import TestCase
+import contextlib
+import io
+import os
+import shutil
+import signal
+import tempfile
+import threading
+from concurrent.futures import Future, TimeoutError as FutureTimeoutError
+from datetime import datetime, timedelta, timezone as dt_timezone
+from unittest import mock
 
-# Create your tests here.
+import joblib
+import numpy as np
+from django.core.management import CommandError, call_command
+from django.db import connection
+from django.test import SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.utils import timezone
+
+from users.models import User
+from .auth_cache import DeviceKeyCache, device_key_cache
+from .analytics import SIGNALS, rebuild_baselines
+from .models import (
+    Device, DeviceRollup, PatientBaseline, PendingReading, RescoreCheckpoint, SensorData, UserRollup,
+)
+from .ai_service import medical_classifier
+from .ai_service.batching import MicroBatcher
+from .ai_service.medical_classifier import (
+    FEATURES, FLAT_MODEL_PATH, MODEL_PATH, SCALER_PATH, _error_result, ai_service,
+)
+from .ai_service.prediction_cache import PredictionCache
+from .ai_service.process_pool import InferencePool
+from .ingestion import MAX_BATCH_SIZE, ingest_readings
+from .management.commands.process_sensor_queue import Command as ProcessSensorQueue
+from .rollups import rebuild_rollups
+from ai_models.data_cache import open_cache
+from ai_models.flat_forest import PARITY_TOLERANCE, FlatForest
+from ai_models.inference import CLASS_NAMES
+from ai_models.registry import ModelRegistry
+from alerts.models import Alert
+from health.models import HealthData
+
+READING = {
+    "cov_ppb": 400,
+    "eco2_ppm": 420,
+    "heart_rate": 75,
+    "spo2": 98,
+    "temperature": 36.8,
+}
+
+
+class ReceiveSensorDataQueriesTest(TestCase):
+    """Nombre de requêtes SQL par lecture reçue sur l'endpoint hardware"""
+
+    def setUp(self):
+        device_key_cache.clear()
+        self.user = User.objects.create_user(username='patient', email='patient@example.com', password='x')
+        self.device = Device.objects.create(user=self.user, device_key='k' * 64)
+
+    def post_reading(self):
+        return self.client.post(
+            '/api/devices/data/',
+            {"device_key": self.device.device_key, **READING},
+            content_type='application/json'
+        )
+
+    def test_queries_per_reading(self):
+        self.post_reading()  # Remplit le cache d'authentification
+
+        # SAVEPOINT, INSERT SensorData, UPSERT DeviceRollup, UPSERT UserRollup, INSERT HealthData,
+        # UPSERT DailyHealthSummary, SELECT FOR UPDATE + UPDATE HealthRunningStats,
+        # SELECT FOR UPDATE + UPDATE PatientBaseline, UPDATE Device, RELEASE SAVEPOINT
+        with self.assertNumQueries(12):
+            response = self.post_reading()
+
+        self.assertEqual(response.status_code, 201)
+        sensor_data = SensorData.objects.get(id=response.json()['sensor_data_id'])
+        self.assertTrue(sensor_data.processed)
+        self.assertEqual(sensor_data.ai_status, response.json()['ai_result']['status'])
+        self.assertEqual(HealthData.objects.filter(user=self.user).count(), 2)
+
+    def test_last_data_at_is_debounced(self):
+        self.post_reading()
+        self.device.refresh_from_db()
+        first_heartbeat = self.device.last_data_at
+        self.assertIsNotNone(first_heartbeat)
+
+        self.post_reading()
+        self.device.refresh_from_db()
+        self.assertEqual(self.device.last_data_at, first_heartbeat)
+
+
+class SensorRollupTest(TestCase):
+    """Agrégats maintenus à l'ingestion identiques à une reconstruction complète"""
+
+    def setUp(self):
+        device_key_cache.clear()
+        self.user = User.objects.create_user(username='patient', email='patient@example.com', password='x')
+        self.device = Device.objects.create(user=self.user, device_key='r' * 64)
+
+    def rollup_values(self):
+        fields = [field.name for field in DeviceRollup._meta.fields if field.name not in ('id', 'device')]
+        return (
+            sorted(DeviceRollup.objects.values_list('device', *fields)),
+            sorted(UserRollup.objects.values_list('user', *fields)),
+        )
+
+    def test_incremental_matches_rebuild(self):
+        readings = [
+            {**READING, "heart_rate": 70 + i, "spo2": 99 - i % 8, "timestamp": 1760000000 + i * 1700}
+            for i in range(60)
+        ]
+        for start in (0, 25, 26):
+            response = self.client.post(
+                '/api/devices/data/batch/',
+                {"device_key": self.device.device_key, "readings": readings[start:start + 25] if start < 26 else readings[26:]},
+                content_type='application/json'
+            )
+            self.assertEqual(response.status_code, 201)
+
+        incremental = self.rollup_values()
+        day = UserRollup.objects.filter(resolution='day').order_by('bucket')
+        self.assertEqual(sum(rollup.count for rollup in day), SensorData.objects.count())
+
+        rebuild_rollups()
+        self.assertEqual(len(incremental[0]), DeviceRollup.objects.count())
+        for (incremental_rows, rebuilt_rows) in zip(incremental, self.rollup_values()):
+            for incremental_row, rebuilt_row in zip(incremental_rows, rebuilt_rows):
+                self.assertEqual(incremental_row[:4], rebuilt_row[:4])
+                for a, b in zip(incremental_row[4:], rebuilt_row[4:]):
+                    self.assertAlmostEqual(a, b, places=6)
+
+    def test_ai_errors_are_counted_outside_the_status_histogram(self):
+        readings = [{**READING, "timestamp": 1760000000 + i * 30} for i in range(3)]
+        self.client.post(
+            '/api/devices/data/batch/',
+            {"device_key": self.device.device_key, "readings": readings},
+            content_type='application/json'
+        )
+        ingest_readings(device_key_cache.get(self.device.device_key), [[READING[field] for field in READING]],
+                        timestamps=[datetime.fromtimestamp(1760000100, tz=dt_timezone.utc)],
+                        ai_results=[_error_result("modèle indisponible")])
+
+        incremental = self.rollup_values()
+        day = UserRollup.objects.get(resolution='day')
+        self.assertEqual(day.count, 4)
+        self.assertEqual(day.status_0 + day.status_1 + day.status_2 + day.status_3, 3)
+
+        rebuild_rollups()
+        self.assertEqual(len(incremental[1]), len(self.rollup_values()[1]))
+        for incremental_row, rebuilt_row in zip(incremental[1], self.rollup_values()[1]):
+            self.assertEqual(incremental_row[:4], rebuilt_row[:4])
+            self.assertEqual(incremental_row[-4:], rebuilt_row[-4:])
+
+    def test_device_deletion_rebuilds_user_rollups(self):
+        other = Device.objects.create(user=self.user, device_key='o' * 64)
+        for device, count in ((self.device, 3), (other, 2)):
+            self.client.post(
+                '/api/devices/data/batch/',
+                {"device_key": device.device_key,
+                 "readings": [{**READING, "timestamp": 1760000000 + i * 30} for i in range(count)]},
+                content_type='application/json'
+            )
+        self.assertEqual(UserRollup.objects.get(resolution='day').count, 5)
+
+        self.client.force_login(self.user)
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.delete(f'/api/devices/{other.id}/delete/')
+        self.assertEqual(response.status_code, 200)
+        day = UserRollup.objects.get(resolution='day')
+        self.assertEqual((day.count, day.status_0), (3, 3))
+        self.assertFalse(DeviceRollup.objects.filter(device_id=other.id).exists())
+
+        incremental = self.rollup_values()
+        rebuild_rollups()
+        self.assertEqual(incremental, self.rollup_values())
+
+    def test_series_picks_coarsest_filling_resolution(self):
+        readings = [{**READING, "timestamp": 1760000000 + i * 600} for i in range(144)]
+        self.client.post(
+            '/api/devices/data/batch/',
+            {"device_key": self.device.device_key, "readings": readings},
+            content_type='application/json'
+        )
+        self.client.force_login(self.user)
+        response = self.client.get('/api/devices/sensor-data/series/', {
+            'start': 1760000000, 'end': 1760000000 + 86400, 'points': 20,
+        })
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['resolution'], 'hour')
+        self.assertEqual(sum(point['count'] for point in response.json()['points']), 144)
+        self.assertLessEqual(len(response.json()['points']), 40)
+
+
+class PatientBaselineTest(TestCase):
+    """Référence EWMA par patient : mise à jour à l'ingestion, recalcul vectorisé, alertes"""
+
+    def setUp(self):
+        device_key_cache.clear()
+        self.user = User.objects.create_user(username='patient', email='patient@example.com', password='x')
+        self.device = Device.objects.create(user=self.user, device_key='b' * 64)
+
+    def post_batch(self, readings):
+        response = self.client.post(
+            '/api/devices/data/batch/',
+            {"device_key": self.device.device_key, "readings": readings},
+            content_type='application/json'
+        )
+        self.assertEqual(response.status_code, 201)
+
+    def baseline_values(self):
+        baseline = PatientBaseline.objects.get(user=self.user)
+        fields = [f'{signal}_{suffix}' for signal in SIGNALS for suffix in ('mean', 'var', 'last')]
+        return baseline.count, [getattr(baseline, field) for field in fields], baseline.deviations
+
+    def test_incremental_matches_rebuild_and_spike_raises_alert(self):
+        readings = [
+            {**READING, "heart_rate": 72 + i % 5, "temperature": 36.7 + (i % 3) / 10, "timestamp": 1760000000 + i * 60}
+            for i in range(40)
+        ]
+        self.post_batch(readings[:15])
+        self.post_batch(readings[15:])
+        self.assertFalse(Alert.objects.filter(user=self.user, title__startswith="Écart").exists())
+
+        self.post_batch([{**READING, "heart_rate": 125, "timestamp": 1760000000 + 40 * 60}])
+        alert = Alert.objects.get(user=self.user, title__startswith="Écart")
+        self.assertEqual(alert.level, 'danger')
+        self.assertIn("Fréquence cardiaque au-dessus", alert.message)
+
+        count, values, deviations = self.baseline_values()
+        self.assertEqual(count, 41)
+        self.assertGreater(deviations['z']['heart_rate'], 5)
+        self.assertAlmostEqual(deviations['rate_per_min']['heart_rate'], 125 - (72 + 39 % 5))
+
+        rebuild_baselines()
+        rebuilt_count, rebuilt_values, rebuilt_deviations = self.baseline_values()
+        self.assertEqual(rebuilt_count, count)
+        for a, b in zip(values, rebuilt_values):
+            self.assertAlmostEqual(a, b)
+        self.assertEqual(rebuilt_deviations, deviations)
+
+    def test_anomalies_endpoint_access(self):
+        self.post_batch([{**READING, "timestamp": 1760000000 + i * 60} for i in range(25)])
+        self.client.force_login(self.user)
+        response = self.client.get('/api/devices/analytics/anomalies/')
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.json()['ready'])
+        self.assertEqual(response.json()['flagged'], [])
+
+        doctor = User.objects.create_user(username='doc', email='doc@example.com', password='x', role='doctor')
+        self.client.force_login(doctor)
+        self.assertEqual(self.client.get('/api/devices/analytics/anomalies/', {'patient': self.user.id}).status_code, 403)
+        self.user.medecin = doctor
+        self.user.save()
+        response = self.client.get('/api/devices/analytics/anomalies/', {'patient': self.user.id})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['readings'], 25)
+
+
+class TrainFromSensorDataTest(TestCase):
+    """Export des SensorData analysées et entraînement (train_from_sensor_data)"""
+
+    def setUp(self):
+        user = User.objects.create_user(username='patient', email='patient@example.com', password='x')
+        self.device = Device.objects.create(user=user, device_key='t' * 64)
+        rng = np.random.default_rng(0)
+        rows = []
+        for status in range(4):
+            for _ in range(30):
+                rows.append(SensorData(
+                    device=self.device, processed=True, ai_status=status,
+                    cov_ppb=100 + 200 * status + rng.normal(0, 5), eco2_ppm=420 + 100 * status,
+                    heart_rate=70 + 10 * status, spo2=98 - 3 * status, temperature=36.8 + 0.5 * status,
+                ))
+        # Erreurs IA : traitées (processed=True) mais sans classe
+        rows += [SensorData(device=self.device, processed=True, ai_status=-1, **READING) for _ in range(5)]
+        SensorData.objects.bulk_create(rows)
+        self.output = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.output, ignore_errors=True)
+
+    def call(self, **options):
+        with contextlib.redirect_stdout(io.StringIO()):
+            call_command('train_from_sensor_data', output=self.output, stdout=io.StringIO(), **options)
+
+    def test_ai_errors_are_not_exported_and_model_trains(self):
+        self.call()
+        X, y, manifest = open_cache(self.output)
+        self.assertEqual(len(X), 120)
+        self.assertEqual(sorted(np.unique(y).tolist()), [0, 1, 2, 3])
+        self.assertEqual(manifest['class_counts'], {'0': 30, '1': 30, '2': 30, '3': 30})
+
+    def test_missing_class_is_refused(self):
+        SensorData.objects.filter(ai_status=3).delete()
+        with self.assertRaisesMessage(CommandError, "Hypoxie sévère"):
+            self.call()
+
+
+class MicroBatcherTest(SimpleTestCase):
+    """Le thread de micro-batching survit aux appelants annulés et aux erreurs d'inférence"""
+
+    def setUp(self):
+        self.started = threading.Event()
+        self.release = threading.Event()
+
+    def infer(self, X):
+        self.started.set()
+        self.release.wait(5)
+        if np.isnan(X).any():
+            raise ValueError("lecture invalide")
+        return X[:, 0].astype(np.int64), X, 'test'
+
+    def test_cancelled_caller_does_not_stop_the_worker(self):
+        batcher = MicroBatcher(self.infer, window_ms=50)
+        first = batcher.submit(np.ones((1, 5)))
+        self.assertTrue(self.started.wait(5))
+
+        # Pendant la première inférence : un appelant abandonne, un autre attend
+        cancelled = batcher.submit(np.full((1, 5), 2.0))
+        self.assertTrue(cancelled.cancel())
+        waiting = batcher.submit(np.full((1, 5), 3.0))
+        self.release.set()
+
+        self.assertEqual(first.result(5)[0].tolist(), [1])
+        self.assertEqual(waiting.result(5)[0].tolist(), [3])
+        self.assertEqual(batcher.stats()['cancelled'], 1)
+
+        failing = batcher.submit(np.full((1, 5), np.nan))
+        with self.assertRaises(ValueError):
+            failing.result(5)
+        self.assertEqual(batcher.submit(np.full((1, 5), 4.0)).result(5)[0].tolist(), [4])
+
+
+SHARED_CACHES = {
+    'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'default'},
+    'device-keys': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'device-keys'},
+}
+
+
+class DeviceKeyCacheTest(TestCase):
+    """Cache d'authentification des devices : hits et invalidation sur save / delete / régénération"""
+
+    def setUp(self):
+        device_key_cache.clear()
+        self.user = User.objects.create_user(username='patient', email='patient@example.com', password='x')
+        self.device = Device.objects.create(user=self.user, device_key='c' * 64)
+
+    def test_hits_do_not_query(self):
+        self.assertEqual(device_key_cache.get(self.device.device_key).id, self.device.id)
+        self.assertIsNone(device_key_cache.get('inconnue'))
+        with self.assertNumQueries(0):
+            self.assertEqual(device_key_cache.get(self.device.device_key).user_id, self.user.id)
+            self.assertIsNone(device_key_cache.get('inconnue'))
+
+    def test_save_delete_and_regenerate_invalidate(self):
+        device_key_cache.get(self.device.device_key)
+        self.device.is_active = False
+        self.device.save()
+        self.assertFalse(device_key_cache.get(self.device.device_key).is_active)
+
+        old_key = self.device.device_key
+        self.client.force_login(self.user)
+        new_key = self.client.post(f'/api/devices/{self.device.id}/regenerate-key/').json()['device_key']
+        self.assertIsNone(device_key_cache.get(old_key))
+        self.assertEqual(device_key_cache.get(new_key).id, self.device.id)
+
+        Device.objects.get(pk=self.device.pk).delete()
+        self.assertIsNone(device_key_cache.get(new_key))
+
+    def test_user_changes_invalidate_their_device_keys(self):
+        doctor = User.objects.create_user(username='doc', email='doc@example.com', password='x', role='doctor')
+        device_key_cache.get(self.device.device_key)
+
+        # Hors des vues (admin, shell) : fuseau et médecin à jour dès la lecture suivante
+        user = User.objects.get(pk=self.user.pk)
+        user.timezone = 'Africa/Abidjan'
+        user.medecin = doctor
+        user.save()
+        cached = device_key_cache.get(self.device.device_key)
+        self.assertEqual((cached.user_timezone, cached.user_medecin_id), ('Africa/Abidjan', doctor.id))
+
+        # Champs non gardés en cache (connexion) : pas d'invalidation
+        with self.assertNumQueries(1):
+            user.save(update_fields=['last_login'])
+        with self.assertNumQueries(0):
+            device_key_cache.get(self.device.device_key)
+
+    @override_settings(CACHES=SHARED_CACHES)
+    def test_shared_backend_invalidation_reaches_other_workers(self):
+        # Deux workers qui partagent le même cache (Redis en production)
+        worker, other_worker = DeviceKeyCache(shared_alias='device-keys'), DeviceKeyCache(shared_alias='device-keys')
+        self.assertTrue(worker.get(self.device.device_key).is_active)
+        with self.assertNumQueries(0):
+            self.assertTrue(other_worker.get(self.device.device_key).is_active)
+
+        Device.objects.filter(pk=self.device.pk).update(is_active=False)
+        other_worker.invalidate(self.device.device_key)
+        self.assertFalse(worker.get(self.device.device_key).is_active)
+
+
+@override_settings(SENSOR_INGESTION_MODE='async')
+class AsyncIngestionTest(TestCase):
+    """File d'attente de l'ingestion asynchrone : horodatage, réservation, nouvelle tentative, suppression"""
+
+    def setUp(self):
+        device_key_cache.clear()
+        self.user = User.objects.create_user(username='patient', email='patient@example.com', password='x')
+        self.device = Device.objects.create(user=self.user, device_key='q' * 64)
+        self.worker = ProcessSensorQueue(stdout=io.StringIO(), stderr=io.StringIO())
+
+    def post_reading(self):
+        response = self.client.post(
+            '/api/devices/data/',
+            {"device_key": self.device.device_key, **READING},
+            content_type='application/json'
+        )
+        self.assertEqual(response.status_code, 202)
+
+    def test_reading_without_timestamp_keeps_its_reception_time(self):
+        before = timezone.now()
+        self.post_reading()
+        after = timezone.now()
+        pending = PendingReading.objects.get()
+        self.assertTrue(before <= pending.measured_at <= after)
+
+        # Traitée bien plus tard : la lecture garde sa date de réception
+        with mock.patch('django.utils.timezone.now', return_value=after + timedelta(hours=2)):
+            self.assertEqual(self.worker.process_batch(batch_size=10, max_attempts=5), (1, 0))
+        self.assertEqual(SensorData.objects.get().measured_at, pending.measured_at)
+
+    def test_failed_batch_is_retried_then_set_aside(self):
+        self.post_reading()
+        self.post_reading()
+
+        with mock.patch('devices.management.commands.process_sensor_queue.ingest_readings',
+                        side_effect=RuntimeError("base indisponible")):
+            self.assertEqual(self.worker.process_batch(batch_size=10, max_attempts=2), (0, 2))
+        self.assertEqual(list(PendingReading.objects.values_list('attempts', flat=True)), [1, 1])
+        self.assertEqual(PendingReading.objects.first().last_error, "base indisponible")
+        self.assertFalse(SensorData.objects.exists())
+
+        # Lectures encore sous max_attempts : réservées de nouveau, traitées puis retirées de la file
+        self.assertEqual(self.worker.process_batch(batch_size=10, max_attempts=2), (2, 0))
+        self.assertFalse(PendingReading.objects.exists())
+        self.assertEqual(SensorData.objects.filter(device=self.device).count(), 2)
+
+        # Au-delà de max_attempts, une lecture n'est plus réservée
+        self.post_reading()
+        PendingReading.objects.update(attempts=2)
+        self.assertEqual(self.worker.process_batch(batch_size=10, max_attempts=2), (0, 0))
+        self.assertEqual(PendingReading.objects.count(), 1)
+
+    def test_inference_failure_leaves_the_batch_queued(self):
+        self.post_reading()
+        with mock.patch.object(ai_service, 'predict_many', side_effect=RuntimeError("Modèle IA non disponible")):
+            self.assertEqual(self.worker.process_batch(batch_size=10, max_attempts=5), (0, 1))
+        pending = PendingReading.objects.get()
+        self.assertEqual(pending.attempts, 1)
+        self.assertIn("Modèle IA non disponible", pending.last_error)
+        self.assertFalse(SensorData.objects.exists())
+
+        # Modèle revenu : la lecture est analysée normalement
+        self.assertEqual(self.worker.process_batch(batch_size=10, max_attempts=5), (1, 0))
+        self.assertEqual(SensorData.objects.get().ai_status, 0)
+
+    def test_once_drains_the_queue(self):
+        for _ in range(3):
+            self.post_reading()
+        # La commande installe ses gestionnaires SIGTERM / SIGINT : on remet ceux du test
+        for signum in (signal.SIGTERM, signal.SIGINT):
+            self.addCleanup(signal.signal, signum, signal.getsignal(signum))
+
+        call_command('process_sensor_queue', '--once', '--batch-size', '2', stdout=io.StringIO())
+        self.assertFalse(PendingReading.objects.exists())
+        self.assertEqual(SensorData.objects.filter(device=self.device, processed=True).count(), 3)
+
+
+class ReceiveSensorDataBatchTest(TestCase):
+    """Endpoint batch : un lot valide est écrit en une fois, un lot invalide est refusé en entier"""
+
+    def setUp(self):
+        device_key_cache.clear()
+        self.user = User.objects.create_user(username='patient', email='patient@example.com', password='x')
+        self.device = Device.objects.create(user=self.user, device_key='m' * 64)
+
+    def post_batch(self, readings):
+        return self.client.post(
+            '/api/devices/data/batch/',
+            {"device_key": self.device.device_key, "readings": readings},
+            content_type='application/json'
+        )
+
+    def test_batch_is_ingested_with_its_timestamps(self):
+        response = self.post_batch([
+            {**READING, "timestamp": 1760000000},
+            {**READING, "heart_rate": 80, "timestamp": "2025-10-09T09:00:00Z"},
+            READING,
+        ])
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.json()['count'], 3)
+        measured = list(SensorData.objects.order_by('id').values_list('measured_at', flat=True))
+        self.assertEqual(measured[0], datetime.fromtimestamp(1760000000, tz=dt_timezone.utc))
+        self.assertEqual(measured[1], datetime(2025, 10, 9, 9, tzinfo=dt_timezone.utc))
+        self.assertEqual(HealthData.objects.filter(user=self.user).count(), 3)
+
+    def test_malformed_reading_rejects_the_whole_batch(self):
+        cases = [
+            ({"heart_rate": "nan"}, "Lecture 2: Valeur invalide pour heart_rate"),
+            ({"temperature": "inf"}, "Lecture 2: Valeur invalide pour temperature"),
+            ({"spo2": "-Infinity"}, "Lecture 2: Valeur invalide pour spo2"),
+            ({"spo2": "abc"}, "Lecture 2: Valeur invalide pour spo2"),
+            ({"spo2": None}, "Lecture 2: Champ requis manquant: spo2"),
+            ({"timestamp": "hier"}, "Lecture 2: Horodatage invalide"),
+        ]
+        # Position dans readings comptée à partir de 1
+        for override, error in cases:
+            with self.subTest(override=override):
+                response = self.post_batch([READING, {**READING, **override}, READING])
+                self.assertEqual(response.status_code, 400)
+                self.assertEqual(response.json()['error'], error)
+
+        self.assertEqual(self.post_batch([READING, "lecture"]).json()['error'], "Lecture 2: objet attendu")
+        self.assertEqual(self.post_batch([{**READING, "spo2": "nan"}]).json()['error'],
+                         "Lecture 1: Valeur invalide pour spo2")
+        self.assertEqual(self.post_batch([]).status_code, 400)
+        self.assertEqual(self.post_batch([READING] * (MAX_BATCH_SIZE + 1)).status_code, 400)
+        self.assertFalse(SensorData.objects.exists())
+
+    def test_single_endpoint_rejects_non_finite_values(self):
+        response = self.client.post(
+            '/api/devices/data/',
+            {"device_key": self.device.device_key, **READING, "heart_rate": "NaN"},
+            content_type='application/json'
+        )
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(SensorData.objects.exists())
+
+
+# Lecture classée en hypoxie sévère (3) par le modèle
+HYPOXIA_VALUES = [300, 1500, 130, 85, 39]
+STALE_RESULT = {'status': 0, 'status_name': 'Sain', 'confidence': 1.0, 'probabilities': {}}
+
+
+class RescoreFixtureMixin:
+    """Lectures notées par un ancien modèle (sans version) : trois saines, trois hypoxies notées saines"""
+
+    def create_stale_readings(self):
+        device_key_cache.clear()
+        self.user = User.objects.create_user(username='patient', email='patient@example.com', password='x')
+        device = Device.objects.create(user=self.user, device_key='s' * 64)
+        rows = [[READING[field] for field in READING]] * 3 + [HYPOXIA_VALUES] * 3
+        ingest_readings(device_key_cache.get(device.device_key), rows,
+                        timestamps=[datetime.fromtimestamp(1760000000 + i * 60, tz=dt_timezone.utc) for i in range(6)],
+                        ai_results=[STALE_RESULT] * 6)
+
+    def assert_rescored(self):
+        self.assertFalse(SensorData.objects.exclude(ai_model_version=ai_service.model_version).exists())
+        self.assertEqual(sorted(SensorData.objects.values_list('ai_status', flat=True)), [0, 0, 0, 3, 3, 3])
+        day = UserRollup.objects.get(resolution='day')
+        self.assertEqual((day.status_0, day.status_3), (3, 3))
+
+
+class RescoreSensorDataTest(RescoreFixtureMixin, TestCase):
+    """Recalcul des statuts IA : reprise après interruption et agrégats reconstruits"""
+
+    def setUp(self):
+        self.assertTrue(ai_service.warm_up())
+        self.create_stale_readings()
+
+    def test_rescore_updates_statuses_and_rollups(self):
+        out = io.StringIO()
+        call_command('rescore_sensor_data', '--chunk-size', '2', stdout=out)
+        self.assert_rescored()
+        self.assertIn("Agrégats reconstruits pour 1 patients", out.getvalue())
+
+        out = io.StringIO()
+        call_command('rescore_sensor_data', stdout=out)
+        self.assertIn("déjà terminé", out.getvalue())
+
+    def test_interrupted_job_resumes_from_its_checkpoints(self):
+        predict_many = ai_service.predict_many
+        calls = []
+
+        def crash_on_second_chunk(X, with_version=False):
+            calls.append(len(X))
+            if len(calls) == 2:
+                raise RuntimeError("worker arrêté")
+            return predict_many(X, with_version=with_version)
+
+        with mock.patch.object(ai_service, 'predict_many', side_effect=crash_on_second_chunk):
+            with self.assertRaises(RuntimeError):
+                call_command('rescore_sensor_data', '--chunk-size', '1', stdout=io.StringIO())
+        self.assertEqual(sum(RescoreCheckpoint.objects.values_list('rows_scored', flat=True)), 1)
+
+        out = io.StringIO()
+        call_command('rescore_sensor_data', '--chunk-size', '1', stdout=out)
+        # Chaque lecture n'est recalculée qu'une fois, progression comprise
+        self.assertEqual(sum(RescoreCheckpoint.objects.values_list('rows_scored', flat=True)), 6)
+        self.assertIn("5 lectures recalculées", out.getvalue())
+        self.assertIn("Agrégats reconstruits pour tous les patients", out.getvalue())
+        self.assert_rescored()
+
+    def test_no_rollups_leaves_the_rebuild_to_the_operator(self):
+        out = io.StringIO()
+        call_command('rescore_sensor_data', '--no-rollups', stdout=out)
+        self.assertIn("relancer rebuild_sensor_rollups", out.getvalue())
+        self.assertEqual(UserRollup.objects.get(resolution='day').status_3, 0)
+
+
+class RescoreSensorDataWorkersTest(RescoreFixtureMixin, TransactionTestCase):
+    """Recalcul réparti entre plusieurs process (--workers)"""
+
+    def setUp(self):
+        if connection.vendor == 'sqlite' and connection.is_in_memory_db():
+            self.skipTest("les process forkés ne partagent pas une base SQLite en mémoire")
+        self.assertTrue(ai_service.warm_up())
+        self.create_stale_readings()
+
+    def test_workers_share_the_ranges(self):
+        out = io.StringIO()
+        call_command('rescore_sensor_data', '--workers', '2', '--chunk-size', '2', stdout=out)
+        self.assertGreater(RescoreCheckpoint.objects.count(), 2)
+        self.assertFalse(RescoreCheckpoint.objects.filter(completed=False).exists())
+        self.assertIn("6 lectures recalculées", out.getvalue())
+        self.assert_rescored()
+
+
+class MedicalModelTest(SimpleTestCase):
+    """Évaluateur plat, évaluation progressive, registre des versions et cache des prédictions"""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        ai_service.warm_up()
+        cls.model = joblib.load(MODEL_PATH)
+        cls.scaler = joblib.load(SCALER_PATH)
+        cls.flat = FlatForest.from_sklearn(cls.model, cls.scaler)
+        training_data = medical_classifier.AI_MODEL_DIR + '/medical_training_data.csv'
+        cls.X = np.loadtxt(training_data, delimiter=',', skiprows=1, usecols=range(len(FEATURES)), max_rows=2000)
+
+    def test_flat_forest_matches_sklearn(self):
+        self.assertLessEqual(self.flat.max_difference(self.model, self.scaler, self.X), PARITY_TOLERANCE)
+        # Artefact servi par défaut (mmap), identique à la forêt sklearn
+        self.assertLessEqual(FlatForest.load(FLAT_MODEL_PATH).max_difference(self.model, self.scaler, self.X),
+                             PARITY_TOLERANCE)
+        np.testing.assert_array_equal(
+            self.flat.classes[self.flat.predict_proba(self.X).argmax(axis=1)],
+            self.model.predict(self.scaler.transform(self.X)),
+        )
+
+    def test_early_exit_agrees_with_full_forest(self):
+        full = self.flat.predict_proba(self.X).argmax(axis=1)
+        for chunk_size in (1, 10, 25):
+            with self.subTest(chunk_size=chunk_size):
+                probabilities, trees_used = self.flat.predict_proba_early(self.X, chunk_size=chunk_size)
+                np.testing.assert_array_equal(probabilities.argmax(axis=1), full)
+                np.testing.assert_allclose(probabilities.sum(axis=1), 1.0)
+                self.assertTrue((trees_used <= self.flat.n_trees).all())
+                self.assertLess(trees_used.mean(), self.flat.n_trees)
+
+    def test_registry_publish_activate_and_hot_reload(self):
+        root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, root)
+        registry = ModelRegistry(root)
+
+        self.assertEqual(registry.publish(self.flat, FEATURES, CLASS_NAMES), 'v0001')
+        self.assertEqual(registry.publish(self.flat, FEATURES, CLASS_NAMES, activate=False), 'v0002')
+        self.assertEqual(registry.versions(), ['v0001', 'v0002'])
+        self.assertEqual(registry.current_version(), 'v0001')
+        with self.assertRaises(ValueError):
+            registry.activate('v0009')
+
+        loaded, manifest = registry.load('v0002')
+        self.assertEqual(manifest['features'], FEATURES)
+        np.testing.assert_array_equal(loaded.predict_proba(self.X[:50]), self.flat.predict_proba(self.X[:50]))
+
+        # Rechargement à chaud du service sur la version activée ; état du singleton restauré ensuite
+        for attribute in ('_active', '_is_loaded', 'is_validated', 'backend_name', 'reloads', 'last_reload_error'):
+            self.addCleanup(setattr, ai_service, attribute, getattr(ai_service, attribute))
+        registry.activate('v0002')
+        with mock.patch.object(medical_classifier, 'MODEL_REGISTRY_DIR', root):
+            self.assertTrue(ai_service.reload_model())
+            self.assertEqual(ai_service.model_version, 'v0002')
+            self.assertFalse(ai_service.reload_model())
+
+            # Artefact altéré : checksum refusé, le modèle servi ne change pas
+            registry.publish(self.flat, FEATURES, CLASS_NAMES)
+            with open(os.path.join(root, 'v0003', 'model.bin'), 'r+b') as f:
+                f.seek(-8, os.SEEK_END)
+                f.write(b'\xff' * 8)
+            with contextlib.redirect_stdout(io.StringIO()):
+                self.assertFalse(ai_service.reload_model())
+            self.assertEqual(ai_service.model_version, 'v0002')
+            self.assertIn('v0003', ai_service.last_reload_error)
+
+    def test_prediction_cache_keys_on_sensor_resolution(self):
+        cache = PredictionCache(FEATURES)
+        keys, X_quantized = cache.quantize(np.array([
+            [400.2, 420.4, 75.3, 97.96, 36.84],
+            [399.8, 419.6, 74.7, 98.04, 36.76],
+            [400.0, 420.0, 75.0, 97.8, 36.8],
+        ]))
+        self.assertEqual(keys[0], keys[1])
+        self.assertEqual(keys[0], (400, 420, 75, 980, 368))
+        self.assertNotEqual(keys[0], keys[2])
+        np.testing.assert_allclose(X_quantized[0], [400, 420, 75, 98, 36.8])
+
+        # Deuxième passage servi par le cache, avec le résultat de la lecture qui a rempli chaque clé
+        X = np.array([[400.2, 420.4, 75.3, 97.96, 36.84], [1000.3, 650.2, 125.4, 82.04, 39.16]])
+        statuses, probabilities, version = ai_service._predict_proba_cached(cache, X)
+        self.assertEqual(cache.stats()['misses'], 2)
+        cached = ai_service._predict_proba_cached(cache, X[::-1] - [0, 0, 0.2, 0, 0])
+        self.assertEqual(cache.stats()['hits'], 2)
+        np.testing.assert_array_equal(cached[0], statuses[::-1])
+        np.testing.assert_allclose(cached[1], probabilities[::-1])
+
+        # Lectures absentes du cache : prédiction identique à celle sans cache (valeurs brutes)
+        cache = PredictionCache(FEATURES)
+        with_cache = ai_service._predict_proba_cached(cache, self.X)
+        without_cache = ai_service.predict_proba(self.X)
+        self.assertEqual(cache.stats()['misses'], len(self.X))
+        np.testing.assert_array_equal(with_cache[0], without_cache[0])
+        np.testing.assert_array_equal(with_cache[1], without_cache[1])
+
+        # Autre version du modèle : entrées invalidées
+        self.assertEqual(cache.get_many(cache.quantize(X)[0], 'autre-version'), [None, None])
+        self.assertEqual(cache.stats()['invalidations'], 1)
+
+
+class AIHealthTest(SimpleTestCase):
+    """Health check du modèle dans un worker sans préchargement (runserver, AI_PRELOAD_MODEL=False)"""
+
+    def setUp(self):
+        # Service remis dans l'état d'un worker qui n'a encore rien chargé, restauré ensuite
+        for attribute in ('_active', '_is_loaded', 'is_validated', 'backend_name', 'load_seconds', 'loaded_pid'):
+            self.addCleanup(setattr, ai_service, attribute, getattr(ai_service, attribute))
+        ai_service._active = None
+        ai_service._is_loaded = False
+        ai_service.is_validated = False
+
+    def test_lazily_loaded_model_is_ready(self):
+        # Chargement à la première prédiction, comme predict_many
+        with contextlib.redirect_stdout(io.StringIO()):
+            self.assertTrue(ai_service.load_model())
+        self.assertTrue(ai_service.is_validated)
+        response = self.client.get('/api/devices/ai/health/')
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.json()['model_ready'])
+
+    def test_health_check_loads_the_model(self):
+        with contextlib.redirect_stdout(io.StringIO()):
+            response = self.client.get('/api/devices/ai/health/')
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(response.json()['preloaded'])
+        self.assertTrue(ai_service.stats()['loaded'])
+
+
+class StalledExecutor:
+    """Exécuteur dont les tâches ont démarré mais ne se terminent que sur demande"""
+
+    def __init__(self):
+        self.futures = []
+
+    def submit(self, fn, *args):
+        future = Future()
+        future.set_running_or_notify_cancel()
+        self.futures.append(future)
+        return future
+
+    def shutdown(self, **kwargs):
+        pass
+
+
+class InferencePoolTest(SimpleTestCase):
+    """Pool de process : résultats identiques au modèle en process, segments jamais partagés entre appels"""
+
+    source = ('flat', FLAT_MODEL_PATH)
+
+    def make_pool(self, timeout):
+        pool = InferencePool(self.source, processes=1, timeout=timeout, slot_rows=8)
+        self.addCleanup(pool.shutdown)
+        return pool
+
+    def test_pool_matches_in_process_backend(self):
+        pool = self.make_pool(timeout=60)
+        X = np.array([[400, 420, 75, 98, 36.8], HYPOXIA_VALUES, [1000, 650, 125, 82, 39.2]], dtype=float)
+        np.testing.assert_array_equal(pool.predict_proba(self.source, X, 4),
+                                      FlatForest.load(FLAT_MODEL_PATH).predict_proba(X))
+        self.assertEqual(pool.stats()['shared_slots'], 1)
+
+    def test_timed_out_slot_is_reused_only_after_its_task_ends(self):
+        pool = self.make_pool(timeout=0.01)
+        pool._executor.shutdown()
+        pool._executor = executor = StalledExecutor()
+        X = np.array([[400, 420, 75, 98, 36.8]])
+
+        with self.assertRaises(FutureTimeoutError):
+            pool.predict_proba(self.source, X, 4)
+        # La tâche tourne encore : son segment n'est pas rendu à l'appel suivant
+        self.assertEqual(pool.stats()['abandoned_slots'], 1)
+        self.assertTrue(pool._slots.empty())
+        with self.assertRaises(FutureTimeoutError):
+            pool.predict_proba(self.source, X, 4)
+        self.assertEqual(pool.stats()['shared_slots'], 2)
+
+        for future in executor.futures:
+            future.set_result(None)
+        self.assertEqual(pool.stats()['abandoned_slots'], 0)
+        self.assertEqual(pool._slots.qsize(), 2)
@@ -5,6 +5,8 @@ urlpatterns = [
     # Endpoints pour le hardware (authentification via device_key)
     path('data/', views.receive_sensor_data, name='receive_sensor_data'),
     path('hardware/data/', views.receive_sensor_data, name='hardware_receive_sensor_data'),  # Alias pour l'ESP32
+    path('data/batch/', views.receive_sensor_data_batch, name='receive_sensor_data_batch'),
+    path('hardware/data/batch/', views.receive_sensor_data_batch, name='hardware_receive_sensor_data_batch'),
     
     # Endpoints pour l'utilisateur (authentification via token)
     path('my-devices/', views.my_devices, name='my_devices'),
@@ -14,5 +16,10 @@ urlpatterns = [
     path('<uuid:device_id>/delete/', views.delete_device, name='delete_device'),
     path('<uuid:device_id>/regenerate-key/', views.regenerate_device_key, name='regenerate_device_key'),
     path('sensor-data/', views.my_sensor_data, name='my_sensor_data'),
+    path('sensor-data/series/', views.sensor_series, name='sensor_series'),
+    path('analytics/anomalies/', views.anomalies, name='anomalies'),
     path('latest-ai/', views.latest_ai_result, name='latest_ai_result'),
+    path('ai/stats/', views.ai_stats, name='ai_stats'),
+    path('ai/health/', views.ai_health, name='ai_health'),
+    path('ai/shadow/', views.ai_shadow_report, name='ai_shadow_report'),
 ]
@@ -1,14 +1,22 @@
 from rest_framework.decorators import api_view, permission_classes
-from rest_framework.permissions import IsAuthenticated, AllowAny
+from rest_framework.permissions import IsAuthenticated, IsAdminUser, AllowAny
 from rest_framework.response import Response
 from rest_framework import status
-from django.utils import timezone
 from django.shortcuts import get_object_or_404
+from django.utils import timezone
+from datetime import timedelta
 import secrets
+import uuid
 
-from .models import Device, SensorData
-from .ai_service.medical_classifier import predict_health_status
-from health.models import HealthData
+from .models import Device, PatientBaseline, SensorData
+from .analytics import baseline_report
+from .auth_cache import device_key_cache
+from .ai_service.medical_classifier import ai_service
+from .ingestion import (
+    ReadingError, parse_batch, parse_sensor_values, parse_timestamp, ingest_readings,
+    enqueue_readings, is_async_mode,
+)
+from .rollups import series
 
 
 @api_view(['POST'])
@@ -36,78 +44,108 @@ def receive_sensor_data(request):
             status=status.HTTP_400_BAD_REQUEST
         )
     
-    # Vérifier que le device existe et est actif
-    try:
-        device = Device.objects.get(device_key=device_key, is_active=True)
-    except Device.DoesNotExist:
+    # Vérifier que le device existe et est actif (via le cache d'authentification)
+    device = device_key_cache.get(device_key)
+    if device is None or not device.is_active:
         return Response(
             {"error": "Device non trouvé ou inactif"},
             status=status.HTTP_404_NOT_FOUND
         )
     
     # Extraire les données du capteur
-    required_fields = ['cov_ppb', 'eco2_ppm', 'heart_rate', 'spo2', 'temperature']
-    sensor_values = {}
-    
-    for field in required_fields:
-        value = request.data.get(field)
-        if value is None:
-            return Response(
-                {"error": f"Champ requis manquant: {field}"},
-                status=status.HTTP_400_BAD_REQUEST
-            )
-        try:
-            sensor_values[field] = float(value)
-        except (ValueError, TypeError):
-            return Response(
-                {"error": f"Valeur invalide pour {field}"},
-                status=status.HTTP_400_BAD_REQUEST
-            )
-    
-    # Créer l'enregistrement des données du capteur
-    sensor_data = SensorData.objects.create(
-        device=device,
-        **sensor_values
-    )
+    try:
+        values = parse_sensor_values(request.data)
+    except ReadingError as e:
+        return Response(
+            {"error": str(e)},
+            status=status.HTTP_400_BAD_REQUEST
+        )
     
-    # Traiter avec le modèle IA
-    ai_result = predict_health_status(
-        sensor_values['cov_ppb'],
-        sensor_values['eco2_ppm'],
-        sensor_values['heart_rate'],
-        sensor_values['spo2'],
-        sensor_values['temperature']
-    )
+    # Mode asynchrone : mise en file, le worker fera l'analyse IA
+    if is_async_mode():
+        enqueue_readings(device, [values])
+        return Response({
+            "success": True,
+            "message": "Données reçues, traitement en attente",
+            "queued": 1
+        }, status=status.HTTP_202_ACCEPTED)
     
-    # Mettre à jour les données du capteur avec le résultat IA
-    sensor_data.ai_status = ai_result['status']
-    sensor_data.ai_status_name = ai_result['status_name']
-    sensor_data.ai_confidence = ai_result['confidence']
-    sensor_data.ai_probabilities = ai_result['probabilities']
-    sensor_data.processed = True
-    sensor_data.save()
+    # Analyse IA puis une seule écriture par table (voir ingestion.ingest_readings)
+    sensor_rows, ai_results = ingest_readings(device, [values])
     
-    # Mettre à jour la date de dernière donnée du device
-    device.last_data_at = timezone.now()
-    device.save()
+    return Response({
+        "success": True,
+        "message": "Données reçues et traitées",
+        "sensor_data_id": sensor_rows[0].id,
+        "ai_result": ai_results[0],
+        "user": device.username
+    }, status=status.HTTP_201_CREATED)
+
+
+@api_view(['POST'])
+@permission_classes([AllowAny])  # Le hardware s'authentifie via device_key
+def receive_sensor_data_batch(request):
+    """
+    Endpoint batch : plusieurs lectures d'un même device en une requête.
+    Le lot est validé en entier avant tout traitement, le modèle IA est
+    appelé une seule fois et les insertions sont faites en bulk.
     
-    # Créer également une entrée HealthData pour l'utilisateur
-    HealthData.objects.create(
-        user=device.user,
-        heart_rate=sensor_values['heart_rate'],
-        oxygen_level=sensor_values['spo2'],
-        temperature=sensor_values['temperature'],
-        respiratory_rate=int(sensor_values['eco2_ppm'] / 30),  # Estimation
-        air_quality=int(sensor_values['cov_ppb'] / 10),  # Conversion en AQI approximatif
-        status='normal' if ai_result['status'] == 0 else 'attention' if ai_result['status'] <= 2 else 'critical'
-    )
+    Body attendu:
+    {
+        "device_key": "xxx",
+        "readings": [
+            {"cov_ppb": 400, "eco2_ppm": 420, "heart_rate": 75, "spo2": 98, "temperature": 36.8,
+             "timestamp": 1760000000},
+            ...
+        ]
+    }
+    Le champ "timestamp" est optionnel (timestamp Unix ou date ISO 8601).
+    
+    Une lecture invalide fait refuser tout le lot (400). Le message indique
+    sa position dans readings, numérotée à partir de 1 :
+    {"error": "Lecture 2: Valeur invalide pour spo2"} pour la deuxième lecture.
+    """
+    device_key = request.data.get('device_key')
+    
+    if not device_key:
+        return Response(
+            {"error": "device_key requis"},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    
+    # Vérifier que le device existe et est actif (via le cache d'authentification)
+    device = device_key_cache.get(device_key)
+    if device is None or not device.is_active:
+        return Response(
+            {"error": "Device non trouvé ou inactif"},
+            status=status.HTTP_404_NOT_FOUND
+        )
+    
+    try:
+        rows, timestamps = parse_batch(request.data.get('readings'))
+    except ReadingError as e:
+        return Response(
+            {"error": str(e)},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    
+    if is_async_mode():
+        queued = enqueue_readings(device, rows, timestamps)
+        return Response({
+            "success": True,
+            "message": f"{queued} lectures reçues, traitement en attente",
+            "queued": queued
+        }, status=status.HTTP_202_ACCEPTED)
+    
+    sensor_rows, ai_results = ingest_readings(device, rows, timestamps)
     
     return Response({
         "success": True,
-        "message": "Données reçues et traitées",
-        "sensor_data_id": sensor_data.id,
-        "ai_result": ai_result,
-        "user": device.user.username
+        "message": f"{len(sensor_rows)} lectures reçues et traitées",
+        "count": len(sensor_rows),
+        "sensor_data_ids": [sd.id for sd in sensor_rows],
+        "ai_results": ai_results,
+        "user": device.username
     }, status=status.HTTP_201_CREATED)
 
 
@@ -177,6 +215,60 @@ def my_sensor_data(request):
     return Response(data)
 
 
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def sensor_series(request):
+    """
+    Courbes des capteurs de l'utilisateur connecté, lues dans les agrégats
+    (devices.rollups) sans parcourir SensorData.
+    
+    Paramètres (tous optionnels):
+        device  : id d'un device de l'utilisateur (défaut: tous ses devices)
+        start   : début (timestamp Unix ou ISO 8601, défaut: end - 24 h)
+        end     : fin (défaut: maintenant)
+        points  : largeur du graphique en points (défaut 200, maximum 2000)
+    """
+    def query_time(name):
+        value = request.query_params.get(name)
+        try:
+            value = float(value)
+        except (TypeError, ValueError):
+            pass
+        return parse_timestamp(value)
+    
+    try:
+        end = query_time('end') or timezone.now()
+        start = query_time('start') or end - timedelta(hours=24)
+        points = int(request.query_params.get('points', 200))
+    except (ReadingError, ValueError):
+        return Response(
+            {"error": "Paramètres start, end ou points invalides"},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    if start >= end or not 1 <= points <= 2000:
+        return Response(
+            {"error": "Il faut start < end et 1 <= points <= 2000"},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    
+    device_id = request.query_params.get('device')
+    if device_id:
+        try:
+            device_id = uuid.UUID(device_id)
+        except ValueError:
+            return Response({"error": "device invalide"}, status=status.HTTP_400_BAD_REQUEST)
+        device = get_object_or_404(Device, id=device_id, user=request.user)
+        data = series(start, end, points, device_id=device.id)
+    else:
+        data = series(start, end, points, user_id=request.user.id)
+    
+    return Response({
+        "start": start.isoformat(),
+        "end": end.isoformat(),
+        **data
+    })
+
+
 @api_view(['PUT', 'PATCH'])
 @permission_classes([IsAuthenticated])
 def update_device(request, device_id):
@@ -307,3 +399,71 @@ def latest_ai_result(request):
         },
         "analyzed_at": latest.created_at.isoformat()
     })
+
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def anomalies(request):
+    """
+    Écarts des dernières lectures par rapport à la référence personnelle du
+    patient (devices.analytics) : moyenne / écart-type exponentiels, z-scores
+    et vitesse de variation de la dernière lecture.
+    
+    Paramètre optionnel:
+        patient : id d'un patient suivi par le médecin connecté (défaut: l'utilisateur connecté)
+    """
+    user_id = request.user.id
+    patient = request.query_params.get('patient')
+    if patient:
+        try:
+            patient = int(patient)
+        except ValueError:
+            return Response({"error": "patient invalide"}, status=status.HTTP_400_BAD_REQUEST)
+        if patient != request.user.id and not request.user.patients.filter(id=patient).exists():
+            return Response({"error": "Patient non suivi"}, status=status.HTTP_403_FORBIDDEN)
+        user_id = patient
+    
+    baseline = PatientBaseline.objects.filter(user_id=user_id).first()
+    if baseline is None:
+        return Response({
+            "message": "Aucune lecture analysée pour ce patient"
+        }, status=status.HTTP_404_NOT_FOUND)
+    
+    return Response({"user_id": user_id, **baseline_report(baseline)})
+
+
+@api_view(['GET'])
+@permission_classes([IsAdminUser])
+def ai_stats(request):
+    """Statistiques du service IA du worker courant (backend, micro-batching)"""
+    return Response(ai_service.stats())
+
+
+@api_view(['GET'])
+@permission_classes([IsAdminUser])
+def ai_shadow_report(request):
+    """
+    Rapport du modèle candidat (AI_SHADOW_MODEL) pour le worker courant :
+    taux de désaccord, matrice de confusion et latence du candidat
+    """
+    return Response(ai_service.shadow_report())
+
+
+@api_view(['GET'])
+@permission_classes([AllowAny])
+def ai_health(request):
+    """
+    Health check du modèle IA pour le load balancer.
+    200 si le modèle est chargé et validé dans ce worker, 503 sinon.
+    Un worker sans modèle préchargé le charge au premier appel.
+    """
+    if not ai_service.is_validated:
+        ai_service.warm_up()
+    stats = ai_service.stats()
+    ready = stats['loaded'] and stats['validated']
+    return Response({
+        "status": "ok" if ready else "unavailable",
+        "model_ready": ready,
+        "backend": stats['backend'],
+        "preloaded": ready and stats['loaded_pid'] != stats['pid'],
+    }, status=status.HTTP_200_OK if ready else status.HTTP_503_SERVICE_UNAVAILABLE)
@@ -156,3 +156,89 @@ STATICFILES_STORAGE = 'whitenoise.storage.CompressedManifestStaticFilesStorage'
 # -----------------------------
 MEDIA_URL = '/media/'
 MEDIA_ROOT = BASE_DIR / 'media'
+
+# -----------------------------
+# Modèle IA médical
+# -----------------------------
+# Micro-batching : regroupe les prédictions concurrentes d'un worker (gunicorn en threads)
+AI_MICROBATCH_ENABLED = os.environ.get('AI_MICROBATCH_ENABLED', 'False') == 'True'
+AI_MICROBATCH_WINDOW_MS = float(os.environ.get('AI_MICROBATCH_WINDOW_MS', '2'))
+AI_MICROBATCH_MAX_ROWS = int(os.environ.get('AI_MICROBATCH_MAX_ROWS', '64'))
+AI_MICROBATCH_TIMEOUT = float(os.environ.get('AI_MICROBATCH_TIMEOUT', '1.0'))
+# Artefact plat servi hors registre, relatif à ai_models/ (ex: medical_model_compact.bin), vide = medical_model_flat.bin
+AI_FLAT_MODEL_PATH = os.environ.get('AI_FLAT_MODEL_PATH') or None
+# Intervalle (secondes) de surveillance du registre de modèles (ai_models/registry), 0 = pas de rechargement à chaud
+AI_MODEL_RELOAD_INTERVAL = float(os.environ.get('AI_MODEL_RELOAD_INTERVAL', '30'))
+# Cache LRU des prédictions, clé = lecture quantifiée à la résolution des capteurs. Le modèle voit
+# toujours les valeurs brutes ; une lecture trouvée reçoit la prédiction de la première lecture de même clé
+AI_PREDICTION_CACHE_ENABLED = os.environ.get('AI_PREDICTION_CACHE_ENABLED', 'False') == 'True'
+AI_PREDICTION_CACHE_SIZE = int(os.environ.get('AI_PREDICTION_CACHE_SIZE', '10000'))
+# Shadow mode : modèle candidat (version du registre ou fichier .bin de ai_models/) évalué sur une
+# fraction des lectures par un thread de fond, sans ralentir les requêtes. Vide = désactivé
+AI_SHADOW_MODEL = os.environ.get('AI_SHADOW_MODEL') or None
+AI_SHADOW_SAMPLE_RATE = float(os.environ.get('AI_SHADOW_SAMPLE_RATE', '0.05'))
+AI_SHADOW_QUEUE_SIZE = int(os.environ.get('AI_SHADOW_QUEUE_SIZE', '256'))  # au-delà, les échantillons sont abandonnés
+# Pool de process d'inférence (le parcours de la forêt ne bloque plus les threads du worker), 0 = désactivé
+AI_PROCESS_POOL_SIZE = int(os.environ.get('AI_PROCESS_POOL_SIZE', '0'))
+AI_PROCESS_POOL_TIMEOUT = float(os.environ.get('AI_PROCESS_POOL_TIMEOUT', '2.0'))  # secondes
+AI_PROCESS_POOL_MIN_ROWS = int(os.environ.get('AI_PROCESS_POOL_MIN_ROWS', '1'))  # lots plus petits : en process
+# En cas d'erreur ou de délai dépassé dans le pool : inférence dans le process du worker
+AI_PROCESS_POOL_FALLBACK = os.environ.get('AI_PROCESS_POOL_FALLBACK', 'True') == 'True'
+# Évaluation progressive de la forêt : arrêt dès que la classe en tête ne peut plus être dépassée
+AI_EARLY_EXIT_ENABLED = os.environ.get('AI_EARLY_EXIT_ENABLED', 'False') == 'True'
+AI_EARLY_EXIT_CHUNK = int(os.environ.get('AI_EARLY_EXIT_CHUNK', '20'))  # arbres par paquet
+AI_EARLY_EXIT_MIN_ROWS = int(os.environ.get('AI_EARLY_EXIT_MIN_ROWS', '32'))  # lots plus petits : forêt complète
+# Seuil de confiance optionnel (ex: 0.9) : arrêt plus tôt, sans garantie d'accord avec la forêt complète
+AI_EARLY_EXIT_CONFIDENCE = float(os.environ['AI_EARLY_EXIT_CONFIDENCE']) if os.environ.get('AI_EARLY_EXIT_CONFIDENCE') else None
+
+# -----------------------------
+# Statistiques cumulées des HealthData (health.running_stats)
+# -----------------------------
+# Demi-vies (secondes) des moyennes à décroissance exponentielle, par nom de fenêtre.
+# Une fenêtre ajoutée n'est remplie pour l'historique qu'après reconcile_health_stats
+HEALTH_STATS_HALF_LIVES = {
+    '24h': 24 * 3600,
+    '7d': 7 * 24 * 3600,
+}
+
+# -----------------------------
+# Détection d'écarts par patient (devices.analytics)
+# -----------------------------
+ANALYTICS_EWMA_SPAN = int(os.environ.get('ANALYTICS_EWMA_SPAN', '60'))  # lectures, alpha = 2 / (span + 1)
+ANALYTICS_MIN_READINGS = int(os.environ.get('ANALYTICS_MIN_READINGS', '20'))  # pas de z-score avant
+ANALYTICS_WINDOW = int(os.environ.get('ANALYTICS_WINDOW', '500'))  # lectures récentes par patient pour le recalcul
+ANALYTICS_Z_WARNING = float(os.environ.get('ANALYTICS_Z_WARNING', '3.0'))
+ANALYTICS_Z_DANGER = float(os.environ.get('ANALYTICS_Z_DANGER', '5.0'))
+# Alerte quand une lecture s'écarte de la référence du patient au-delà de ANALYTICS_Z_WARNING
+ANALYTICS_ALERTS_ENABLED = os.environ.get('ANALYTICS_ALERTS_ENABLED', 'True') == 'True'
+
+# -----------------------------
+# Cache d'authentification des devices (device_key)
+# -----------------------------
+DEVICE_KEY_CACHE_SIZE = int(os.environ.get('DEVICE_KEY_CACHE_SIZE', '10000'))
+DEVICE_KEY_CACHE_TTL = int(os.environ.get('DEVICE_KEY_CACHE_TTL', '60'))  # secondes
+DEVICE_KEY_CACHE_NEGATIVE_TTL = int(os.environ.get('DEVICE_KEY_CACHE_NEGATIVE_TTL', '30'))  # clés inconnues
+# Alias d'un cache de CACHES partagé entre workers (ex: Redis), None = cache en process uniquement.
+# Avec plusieurs workers, le configurer : sinon une clé révoquée reste acceptée par les autres
+# workers jusqu'à DEVICE_KEY_CACHE_TTL secondes
+DEVICE_KEY_CACHE_BACKEND = os.environ.get('DEVICE_KEY_CACHE_BACKEND') or None
+
+# -----------------------------
+# Ingestion des données capteurs
+# -----------------------------
+# 'sync'  : analyse IA et écritures pendant la requête (201)
+# 'async' : mise en file d'attente puis 202, traitement par `manage.py process_sensor_queue`
+SENSOR_INGESTION_MODE = os.environ.get('SENSOR_INGESTION_MODE', 'sync')
+# last_data_at n'est réécrit qu'une fois par intervalle (secondes) pour limiter les UPDATE
+DEVICE_HEARTBEAT_INTERVAL = int(os.environ.get('DEVICE_HEARTBEAT_INTERVAL', '60'))
+# Un device est « en ligne » s'il a envoyé une lecture depuis moins de DEVICE_ONLINE_WINDOW secondes
+DEVICE_ONLINE_WINDOW = int(os.environ.get('DEVICE_ONLINE_WINDOW', '300'))
+
+# -----------------------------
+# Vue patientèle des médecins (users.cohort)
+# -----------------------------
+# Durée (secondes) du cache par médecin, invalidé à l'ingestion des lectures de ses patients
+COHORT_CACHE_TTL = int(os.environ.get('COHORT_CACHE_TTL', '30'))
+# Alias d'un cache de CACHES partagé entre workers (ex: Redis), pour que l'invalidation les
+# touche tous. None = pas de cache : une requête par appel (jamais un cache en process)
+COHORT_CACHE_BACKEND = os.environ.get('COHORT_CACHE_BACKEND') or None
@@ -0,0 +1,35 @@
+"""
+Configuration gunicorn.
+
+Le modèle IA est chargé et validé une seule fois dans le master, avant le
+fork : les workers démarrent avec le modèle prêt (pas de chargement au
+premier appel). La forêt aplatie est mappée en lecture seule depuis
+ai_models/medical_model_flat.bin : ses pages viennent du cache disque et sont
+partagées par tous les workers, quel que soit leur nombre. gc.freeze() évite
+en plus que le ramasse-miettes des workers ne touche les objets hérités du master.
+
+Mesurer le démarrage et la mémoire par worker:
+    python -m devices.ai_service.worker_memory --pidfile /tmp/gunicorn.pid
+"""
+
+import gc
+import os
+
+preload_app = os.environ.get('AI_PRELOAD_MODEL', 'True') == 'True'
+pidfile = os.environ.get('GUNICORN_PIDFILE')
+
+
+def when_ready(server):
+    # Avec preload_app, Django est déjà configuré dans le master à ce stade
+    if not preload_app:
+        return
+    from devices.ai_service.medical_classifier import ai_service
+
+    if ai_service.warm_up():
+        server.log.info(
+            "Modèle IA préchargé dans le master (backend %s, %.0f ms)",
+            ai_service.backend_name, ai_service.load_seconds * 1000
+        )
+    else:
+        server.log.warning("Préchargement du modèle IA impossible : chargement à la demande dans les workers")
+    gc.freeze()
@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import HealthData
+from .models import DailyHealthSummary, HealthData, HealthRunningStats
 
 
 @admin.register(HealthData)
@@ -9,3 +9,17 @@ class HealthDataAdmin(admin.ModelAdmin):
     search_fields = ('user__username', 'user__email')
     readonly_fields = ('created_at',)
     ordering = ('-created_at',)
+
+
+@admin.register(DailyHealthSummary)
+class DailyHealthSummaryAdmin(admin.ModelAdmin):
+    list_display = ('user', 'day', 'count')
+    search_fields = ('user__username', 'user__email')
+    ordering = ('-day',)
+
+
+@admin.register(HealthRunningStats)
+class HealthRunningStatsAdmin(admin.ModelAdmin):
+    list_display = ('user', 'count', 'updated_at')
+    search_fields = ('user__username', 'user__email')
+    readonly_fields = ('ewm', 'updated_at')
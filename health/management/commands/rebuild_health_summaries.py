@@ -0,0 +1,26 @@
+"""
+Recalcul des résumés journaliers des HealthData (DailyHealthSummary).
+Exécuter avec: python manage.py rebuild_health_summaries [--user ID ...]
+
+Les résumés sont tenus à jour par l'ingestion et l'API health ; cette
+commande les reconstruit depuis l'historique (première mise en place,
+HealthData modifiées hors de l'API, par exemple dans l'admin). Idempotente.
+"""
+
+import time
+
+from django.core.management.base import BaseCommand
+
+from health.summaries import rebuild_daily_summaries
+
+
+class Command(BaseCommand):
+    help = "Reconstruit les résumés journaliers des HealthData (jours dans le fuseau de chaque utilisateur)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', type=int, action='append', dest='users', help="Limiter à cet utilisateur (répétable)")
+
+    def handle(self, *args, **options):
+        started = time.monotonic()
+        written = rebuild_daily_summaries(user_ids=options['users'])
+        self.stdout.write(self.style.SUCCESS(f"{written} résumés journaliers reconstruits en {time.monotonic() - started:.1f} s"))
@@ -0,0 +1,76 @@
+"""
+Réconciliation des statistiques cumulées des HealthData (HealthRunningStats).
+Exécuter avec: python manage.py reconcile_health_stats [--user ID ...] [--check]
+
+Les statistiques sont tenues à jour par l'ingestion et l'API health ; cette
+commande les recalcule depuis l'historique (première mise en place, HealthData
+modifiées hors de l'API, fenêtre ajoutée à HEALTH_STATS_HALF_LIVES). --check
+compare seulement et liste les utilisateurs dont les statistiques divergent.
+"""
+
+import math
+import time
+
+from django.core.management.base import BaseCommand
+
+from health.models import HealthRunningStats
+from health.running_stats import compute_running_stats, rebuild_running_stats
+from health.summaries import VITALS
+
+# Écart relatif toléré (arrondis des fusions successives)
+TOLERANCE = 1e-6
+
+
+def drift(stored, expected):
+    """Champs de stored qui s'écartent de expected"""
+    if stored is None:
+        return ['absentes']
+    if stored.count != expected.count:
+        return [f'count {stored.count} != {expected.count}']
+    fields = []
+    for vital in VITALS:
+        for suffix in ('mean', 'm2'):
+            field = f'{vital}_{suffix}'
+            actual, target = getattr(stored, field), getattr(expected, field)
+            if not math.isclose(actual, target, rel_tol=TOLERANCE, abs_tol=TOLERANCE):
+                fields.append(f'{field} {actual:.6g} != {target:.6g}')
+    if set(stored.ewm.get('windows', {})) != set(expected.ewm.get('windows', {})):
+        fields.append('fenêtres exponentielles')
+    return fields
+
+
+class Command(BaseCommand):
+    help = "Recalcule les statistiques cumulées des HealthData depuis l'historique"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', type=int, action='append', dest='users', help="Limiter à cet utilisateur (répétable)")
+        parser.add_argument('--check', action='store_true', help="Comparer sans écrire")
+
+    def handle(self, *args, **options):
+        started = time.monotonic()
+        if not options['check']:
+            written = rebuild_running_stats(user_ids=options['users'])
+            self.stdout.write(self.style.SUCCESS(
+                f"Statistiques de {written} utilisateurs reconstruites en {time.monotonic() - started:.1f} s"
+            ))
+            return
+
+        stored = HealthRunningStats.objects.all()
+        if options['users'] is not None:
+            stored = stored.filter(user_id__in=options['users'])
+        stored = {stats.user_id: stats for stats in stored}
+        checked = diverging = 0
+        for expected in compute_running_stats(options['users']):
+            checked += 1
+            fields = drift(stored.pop(expected.user_id, None), expected)
+            if fields:
+                diverging += 1
+                self.stdout.write(self.style.WARNING(f"  utilisateur {expected.user_id}: {', '.join(fields)}"))
+        # Statistiques sans aucune HealthData correspondante
+        for user_id, stats in stored.items():
+            if stats.count:
+                diverging += 1
+                self.stdout.write(self.style.WARNING(f"  utilisateur {user_id}: {stats.count} mesures sans historique"))
+
+        message = f"{checked} utilisateurs vérifiés, {diverging} divergents ({time.monotonic() - started:.1f} s)"
+        self.stdout.write(self.style.SUCCESS(message) if not diverging else self.style.WARNING(message))
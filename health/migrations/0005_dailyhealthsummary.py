@@ -0,0 +1,34 @@
+# Generated by Django 5.2.10 on 2026-10-17 05:10
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('health', '0004_alter_healthdata_options_healthdata_air_quality_and_more'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailyHealthSummary',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField(help_text="Jour local de l'utilisateur")),
+                ('count', models.IntegerField(default=0)),
+                ('heart_rate_sum', models.FloatField(default=0)),
+                ('oxygen_level_sum', models.FloatField(default=0)),
+                ('temperature_sum', models.FloatField(default=0)),
+                ('respiratory_rate_sum', models.FloatField(default=0)),
+                ('air_quality_sum', models.FloatField(default=0)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_health_summaries', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'ordering': ['user', 'day'],
+                'unique_together': {('user', 'day')},
+            },
+        ),
+    ]
@@ -0,0 +1,35 @@
+# Generated by Django 5.2.10 on 2026-10-17 05:12
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('health', '0005_dailyhealthsummary'),
+        ('users', '0005_user_timezone'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='HealthRunningStats',
+            fields=[
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='health_stats', serialize=False, to=settings.AUTH_USER_MODEL)),
+                ('count', models.BigIntegerField(default=0)),
+                ('heart_rate_mean', models.FloatField(default=0)),
+                ('heart_rate_m2', models.FloatField(default=0)),
+                ('oxygen_level_mean', models.FloatField(default=0)),
+                ('oxygen_level_m2', models.FloatField(default=0)),
+                ('temperature_mean', models.FloatField(default=0)),
+                ('temperature_m2', models.FloatField(default=0)),
+                ('respiratory_rate_mean', models.FloatField(default=0)),
+                ('respiratory_rate_m2', models.FloatField(default=0)),
+                ('air_quality_mean', models.FloatField(default=0)),
+                ('air_quality_m2', models.FloatField(default=0)),
+                ('ewm', models.JSONField(blank=True, default=dict)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+    ]
@@ -32,3 +32,63 @@ class HealthData(models.Model):
             'danger': 'Danger'
         }
         return status_map.get(self.status, 'Normal')
+
+
+class DailyHealthSummary(models.Model):
+    """
+    Sommes journalières des HealthData d'un utilisateur, jour calculé dans
+    son fuseau (User.timezone). Mise à jour à chaque écriture de HealthData
+    (health.summaries), reconstruite par rebuild_health_summaries.
+    """
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='daily_health_summaries')
+    day = models.DateField(help_text="Jour local de l'utilisateur")
+    count = models.IntegerField(default=0)
+    heart_rate_sum = models.FloatField(default=0)
+    oxygen_level_sum = models.FloatField(default=0)
+    temperature_sum = models.FloatField(default=0)
+    respiratory_rate_sum = models.FloatField(default=0)
+    air_quality_sum = models.FloatField(default=0)
+
+    class Meta:
+        ordering = ['user', 'day']
+        unique_together = ('user', 'day')
+
+    def __str__(self):
+        return f"Résumé {self.user_id} {self.day} ({self.count} mesures)"
+
+    def average(self, field):
+        return getattr(self, f'{field}_sum') / self.count if self.count else None
+
+
+class HealthRunningStats(models.Model):
+    """
+    Statistiques cumulées des HealthData d'un utilisateur, tenues à jour à
+    chaque écriture (health.running_stats) : nombre de mesures, moyenne et
+    M2 de Welford (variance = M2 / count) de chaque paramètre, et moyennes /
+    variances à décroissance exponentielle (ewm) pour les fenêtres de
+    HEALTH_STATS_HALF_LIVES.
+    """
+    user = models.OneToOneField(User, on_delete=models.CASCADE, primary_key=True, related_name='health_stats')
+    count = models.BigIntegerField(default=0)
+    heart_rate_mean = models.FloatField(default=0)
+    heart_rate_m2 = models.FloatField(default=0)
+    oxygen_level_mean = models.FloatField(default=0)
+    oxygen_level_m2 = models.FloatField(default=0)
+    temperature_mean = models.FloatField(default=0)
+    temperature_m2 = models.FloatField(default=0)
+    respiratory_rate_mean = models.FloatField(default=0)
+    respiratory_rate_m2 = models.FloatField(default=0)
+    air_quality_mean = models.FloatField(default=0)
+    air_quality_m2 = models.FloatField(default=0)
+    # {"at": timestamp, "windows": {"24h": {"weight": W, "heart_rate": [moyenne, S], ...}}}
+    ewm = models.JSONField(default=dict, blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"Statistiques {self.user_id} ({self.count} mesures)"
+
+    def average(self, field):
+        return getattr(self, f'{field}_mean') if self.count else None
+
+    def variance(self, field):
+        return getattr(self, f'{field}_m2') / self.count if self.count else None
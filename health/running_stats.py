@@ -0,0 +1,212 @@
+"""
+Statistiques cumulées des HealthData par utilisateur (HealthRunningStats).
+
+L'endpoint prediction lit une ligne au lieu d'agréger tout l'historique :
+nombre de mesures, moyenne et M2 de Welford (variance = M2 / count) de chaque
+paramètre, et moyennes / variances à décroissance exponentielle pour les
+demi-vies de HEALTH_STATS_HALF_LIVES (poids d'une mesure divisé par 2 à
+chaque demi-vie écoulée depuis la plus récente).
+
+- apply_running_stats : appelé à chaque écriture de HealthData, dans la même
+  transaction : par l'ingestion des devices (bulk_create) et par les signaux
+  de health/signals.py pour tout save() / delete() (API, admin). La ligne est verrouillée (SELECT ... FOR UPDATE) puis fusionnée
+  avec le lot (formule de Chan) : deux requêtes par lot. Un retrait est la
+  fusion inverse, exacte elle aussi pour les fenêtres exponentielles.
+- rebuild_running_stats : recalcul depuis l'historique (commande
+  reconcile_health_stats), idempotent.
+"""
+
+from itertools import groupby
+
+import numpy as np
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from .models import HealthData, HealthRunningStats
+from .summaries import VITALS
+
+# Lignes lues par aller-retour du curseur pendant un rebuild
+REBUILD_CHUNK_SIZE = 20000
+
+# En dessous de ce poids (relatif), une fenêtre vidée par des retraits est remise à zéro
+EMPTY_WEIGHT = 1e-9
+
+
+def half_lives():
+    """Demi-vies (secondes) des fenêtres exponentielles, par nom"""
+    return getattr(settings, 'HEALTH_STATS_HALF_LIVES', {})
+
+
+def _moments(values, weights):
+    """Poids total, moyenne et somme pondérée des carrés des écarts d'un lot (n, len(VITALS))"""
+    total = float(weights.sum())
+    mean = weights @ values / total
+    return total, mean, weights @ (values - mean) ** 2
+
+
+def _merge(weight_a, mean_a, m2_a, weight_b, mean_b, m2_b, sign=1):
+    """
+    Fusion (sign=1) de deux ensembles résumés par (poids, moyenne, M2), ou
+    retrait (sign=-1) de l'ensemble b de l'ensemble a
+    """
+    if sign > 0:
+        weight = weight_a + weight_b
+        delta = mean_b - mean_a
+        return weight, mean_a + delta * weight_b / weight, m2_a + m2_b + delta ** 2 * weight_a * weight_b / weight
+
+    weight = weight_a - weight_b
+    if weight <= EMPTY_WEIGHT * max(weight_a, 1):
+        return 0, np.zeros_like(mean_a), np.zeros_like(m2_a)
+    mean = (weight_a * mean_a - weight_b * mean_b) / weight
+    delta = mean_b - mean
+    return weight, mean, np.maximum(m2_a - m2_b - delta ** 2 * weight * weight_b / weight_a, 0)
+
+
+def _decay(elapsed, half_life):
+    return np.exp2(-np.maximum(elapsed, 0) / half_life)
+
+
+def _rows_arrays(health_rows):
+    values = np.array([[getattr(row, vital) for vital in VITALS] for row in health_rows], dtype=np.float64)
+    moments = np.array([row.created_at.timestamp() for row in health_rows], dtype=np.float64)
+    return values, moments
+
+
+def _window_state(window):
+    return (
+        window['weight'],
+        np.array([window['mean'][vital] for vital in VITALS]),
+        np.array([window['m2'][vital] for vital in VITALS]),
+    )
+
+
+def _window_dict(weight, mean, m2):
+    return {
+        'weight': float(weight),
+        'mean': dict(zip(VITALS, np.asarray(mean, dtype=float).tolist())),
+        'm2': dict(zip(VITALS, np.asarray(m2, dtype=float).tolist())),
+    }
+
+
+def _apply_ewm(ewm, values, moments, sign):
+    """Fenêtres exponentielles après ajout ou retrait du lot"""
+    at = ewm.get('at')
+    windows = ewm.get('windows', {})
+    if sign > 0:
+        reference = float(moments.max()) if at is None else max(at, float(moments.max()))
+    elif at is None:
+        return ewm
+    else:
+        reference = at
+
+    updated = {}
+    for name, half_life in half_lives().items():
+        weights = _decay(reference - moments, half_life)
+        batch = _moments(values, weights)
+        if name in windows:
+            weight, mean, m2 = _window_state(windows[name])
+            prior = _decay(reference - at, half_life)
+            state = _merge(weight * prior, mean, m2 * prior, *batch, sign=sign)
+        elif sign > 0:
+            state = batch
+        else:
+            continue
+        updated[name] = _window_dict(*state)
+    return {'at': reference, 'windows': updated}
+
+
+def apply_running_stats(user_id, health_rows, sign=1):
+    """
+    Ajoute (sign=1) ou retire (sign=-1) des HealthData des statistiques de
+    l'utilisateur. À appeler dans la transaction qui écrit les HealthData.
+    """
+    if not health_rows:
+        return
+    values, moments = _rows_arrays(health_rows)
+    # savepoint=False : pas de SAVEPOINT en plus dans la transaction de l'appelant
+    with transaction.atomic(savepoint=False):
+        stats, _ = HealthRunningStats.objects.select_for_update().get_or_create(user_id=user_id)
+        count, mean, m2 = _merge(
+            stats.count,
+            np.array([getattr(stats, f'{vital}_mean') for vital in VITALS]),
+            np.array([getattr(stats, f'{vital}_m2') for vital in VITALS]),
+            *_moments(values, np.ones(len(values))),
+            sign=sign,
+        )
+        stats.count = int(round(count))
+        for vital, vital_mean, vital_m2 in zip(VITALS, mean.tolist(), m2.tolist()):
+            setattr(stats, f'{vital}_mean', vital_mean)
+            setattr(stats, f'{vital}_m2', vital_m2)
+        stats.ewm = _apply_ewm(stats.ewm, values, moments, sign) if stats.count else {}
+        stats.save()
+
+
+def compute_running_stats(user_ids=None):
+    """
+    Statistiques recalculées depuis HealthData, une instance (non enregistrée)
+    par utilisateur ayant des mesures. L'historique est lu en flux, trié par
+    utilisateur : la mémoire dépend du plus gros historique, pas de la table.
+    """
+    queryset = HealthData.objects.all()
+    if user_ids is not None:
+        queryset = queryset.filter(user_id__in=user_ids)
+    rows = (
+        queryset.order_by('user_id', 'created_at')
+        .values_list('user_id', 'created_at', *VITALS)
+        .iterator(chunk_size=REBUILD_CHUNK_SIZE)
+    )
+    for user_id, user_rows in groupby(rows, key=lambda row: row[0]):
+        user_rows = list(user_rows)
+        values = np.array([row[2:] for row in user_rows], dtype=np.float64)
+        moments = np.array([row[1].timestamp() for row in user_rows], dtype=np.float64)
+        count, mean, m2 = _moments(values, np.ones(len(values)))
+        stats = HealthRunningStats(user_id=user_id, count=len(values),
+                                   ewm=_apply_ewm({}, values, moments, sign=1))
+        for vital, vital_mean, vital_m2 in zip(VITALS, mean.tolist(), m2.tolist()):
+            setattr(stats, f'{vital}_mean', vital_mean)
+            setattr(stats, f'{vital}_m2', vital_m2)
+        yield stats
+
+
+def rebuild_running_stats(user_ids=None):
+    """
+    Remplace les statistiques par leur recalcul depuis l'historique, dans une
+    transaction.
+
+    Returns:
+        nombre d'utilisateurs écrits
+    """
+    with transaction.atomic():
+        existing = HealthRunningStats.objects.all()
+        if user_ids is not None:
+            existing = existing.filter(user_id__in=user_ids)
+        existing.delete()
+        rebuilt = list(compute_running_stats(user_ids))
+        HealthRunningStats.objects.bulk_create(rebuilt, batch_size=1000)
+    return len(rebuilt)
+
+
+def ewm_summary(stats, now=None):
+    """
+    Moyenne et écart-type de chaque paramètre par fenêtre exponentielle, et
+    poids effectif (nombre équivalent de mesures) à l'instant now
+    """
+    ewm = stats.ewm or {}
+    now = (now or timezone.now()).timestamp()
+    summary = {}
+    for name, window in ewm.get('windows', {}).items():
+        half_life = half_lives().get(name)
+        if half_life is None or not window['weight']:
+            continue
+        summary[name] = {
+            'weight': round(window['weight'] * float(_decay(now - ewm['at'], half_life)), 2),
+            **{
+                vital: {
+                    'mean': window['mean'][vital],
+                    'std': (window['m2'][vital] / window['weight']) ** 0.5,
+                }
+                for vital in VITALS
+            },
+        }
+    return summary
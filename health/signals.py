@@ -0,0 +1,63 @@
+"""
+Agrégats des HealthData tenus à jour à chaque save() / delete() d'une
+mesure, quel que soit le chemin (API, admin, shell, QuerySet.delete()).
+
+L'ingestion des devices écrit en bulk_create, sans signaux : elle met à
+jour les agrégats elle-même (devices.ingestion). QuerySet.update() n'envoie
+pas de signaux non plus : après une modification de ce type, relancer
+rebuild_health_summaries et reconcile_health_stats.
+"""
+
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models.signals import pre_save, post_save, post_delete
+from django.dispatch import receiver
+
+from .models import HealthData
+from .running_stats import apply_running_stats
+from .summaries import apply_daily_summaries
+
+
+def _user_timezone(user_id):
+    return get_user_model().objects.filter(pk=user_id).values_list('timezone', flat=True).first()
+
+
+def _deleted_with_user(origin):
+    """Suppression en cascade d'un utilisateur : ses agrégats partent avec lui"""
+    user_model = get_user_model()
+    return isinstance(origin, user_model) or getattr(origin, 'model', None) is user_model
+
+
+def _apply(user_id, rows, sign):
+    """Résumés journaliers et statistiques cumulées"""
+    apply_daily_summaries(user_id, rows, _user_timezone(user_id), sign=sign)
+    apply_running_stats(user_id, rows, sign=sign)
+
+
+@receiver(pre_save, sender=HealthData)
+def remember_previous_health_data(sender, instance, **kwargs):
+    """Garde la mesure telle qu'en base pour la retirer des agrégats"""
+    if instance._state.adding:
+        instance._previous_health_data = None
+        return
+    previous = HealthData.objects.filter(pk=instance.pk)
+    if transaction.get_connection().in_atomic_block:
+        previous = previous.select_for_update()
+    instance._previous_health_data = previous.first()
+
+
+@receiver(post_save, sender=HealthData)
+def apply_health_data_on_save(sender, instance, **kwargs):
+    with transaction.atomic():
+        previous = getattr(instance, '_previous_health_data', None)
+        if previous is not None:
+            _apply(previous.user_id, [previous], sign=-1)
+        _apply(instance.user_id, [instance], sign=1)
+        instance._previous_health_data = None
+
+
+@receiver(post_delete, sender=HealthData)
+def remove_health_data_on_delete(sender, instance, origin=None, **kwargs):
+    if _deleted_with_user(origin):
+        return
+    _apply(instance.user_id, [instance], sign=-1)
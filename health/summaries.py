@@ -0,0 +1,95 @@
+"""
+Résumé journalier des HealthData par utilisateur (DailyHealthSummary).
+
+Le tableau de bord lit les 7 dernières lignes de cette table au lieu
+d'agréger l'historique : sa latence ne dépend pas du nombre de mesures.
+Les jours suivent le fuseau de l'utilisateur (User.timezone).
+
+- apply_daily_summaries : appelé à chaque écriture de HealthData, dans la
+  même transaction : par l'ingestion des devices (bulk_create) et par les
+  signaux de health/signals.py pour tout save() / delete() (API, admin).
+- rebuild_daily_summaries : recalcul depuis l'historique (commande
+  rebuild_health_summaries, changement de fuseau), idempotent.
+"""
+
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models import Count, Sum
+from django.db.models.functions import TruncDate
+
+from devices.rollups import merge_counters
+from .models import DailyHealthSummary, HealthData
+
+VITALS = ['heart_rate', 'oxygen_level', 'temperature', 'respiratory_rate', 'air_quality']
+
+# Lignes insérées par requête pendant un rebuild
+REBUILD_BATCH_SIZE = 5000
+
+
+def user_zone(name):
+    """ZoneInfo du fuseau de l'utilisateur ; UTC si le nom est inconnu"""
+    try:
+        return ZoneInfo(name or 'UTC')
+    except (ZoneInfoNotFoundError, ValueError):
+        return ZoneInfo('UTC')
+
+
+def apply_daily_summaries(user_id, health_rows, timezone_name, sign=1):
+    """
+    Ajoute (sign=1) ou retire (sign=-1) des HealthData des résumés de leurs
+    jours. Une requête, quel que soit le nombre de lignes.
+    """
+    zone = user_zone(timezone_name)
+    days = {}
+    for row in health_rows:
+        day = row.created_at.astimezone(zone).date()
+        summary = days.setdefault(day, {'user_id': user_id, 'day': day, 'count': 0,
+                                        **{f'{vital}_sum': 0.0 for vital in VITALS}})
+        summary['count'] += sign
+        for vital in VITALS:
+            summary[f'{vital}_sum'] += sign * getattr(row, vital)
+    merge_counters(DailyHealthSummary, ['user_id', 'day'], list(days.values()))
+
+
+def rebuild_daily_summaries(user_ids=None):
+    """
+    Recalcule les résumés depuis HealthData : un GROUP BY par fuseau
+    d'utilisateurs, dans une transaction.
+
+    Returns:
+        nombre de jours écrits
+    """
+    users = get_user_model().objects.all()
+    if user_ids is not None:
+        users = users.filter(id__in=user_ids)
+    zones = {}
+    for user_id, timezone_name in users.values_list('id', 'timezone'):
+        zones.setdefault(user_zone(timezone_name).key, []).append(user_id)
+
+    written = 0
+    with transaction.atomic():
+        summaries = DailyHealthSummary.objects.all()
+        if user_ids is not None:
+            summaries = summaries.filter(user_id__in=user_ids)
+        summaries.delete()
+
+        for zone_name, zone_user_ids in zones.items():
+            groups = (
+                HealthData.objects.filter(user_id__in=zone_user_ids)
+                .annotate(day=TruncDate('created_at', tzinfo=ZoneInfo(zone_name)))
+                .order_by()
+                .values('user_id', 'day')
+                .annotate(count=Count('pk'), **{f'{vital}_sum': Sum(vital) for vital in VITALS})
+            )
+            batch = []
+            for group in groups.iterator(chunk_size=REBUILD_BATCH_SIZE):
+                batch.append(DailyHealthSummary(**group))
+                if len(batch) >= REBUILD_BATCH_SIZE:
+                    DailyHealthSummary.objects.bulk_create(batch)
+                    written += len(batch)
+                    batch = []
+            DailyHealthSummary.objects.bulk_create(batch)
+            written += len(batch)
+    return written
@@ -1,3 +1,155 @@
+from datetime import datetime, timedelta, timezone as dt_timezone
+from unittest import mock
+
 from django.test import TestCase
 
-# Create your tests here.
+from users.models import User
+from .models import DailyHealthSummary, HealthData, HealthRunningStats
+from .running_stats import rebuild_running_stats
+from .summaries import rebuild_daily_summaries
+
+MEASUREMENT = {
+    "heart_rate": 80,
+    "oxygen_level": 97,
+    "temperature": 36.9,
+    "respiratory_rate": 16,
+    "air_quality": 30,
+}
+
+
+class DailyHealthSummaryTest(TestCase):
+    """Résumés journaliers tenus à jour par l'API, jours dans le fuseau de l'utilisateur"""
+
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username='patient', email='patient@example.com', password='x', timezone='America/New_York'
+        )
+        self.client.force_login(self.user)
+
+    def create_at(self, moment, **values):
+        with mock.patch('django.utils.timezone.now', return_value=moment):
+            response = self.client.post('/api/health/', {**MEASUREMENT, **values}, content_type='application/json')
+        self.assertEqual(response.status_code, 201)
+        return response.json()['id']
+
+    def summaries(self):
+        return list(DailyHealthSummary.objects.order_by('day').values_list('day', 'count', 'heart_rate_sum'))
+
+    def test_days_follow_user_timezone_and_match_rebuild(self):
+        # 03:00 UTC le 11 = 23:00 le 10 à New York
+        self.create_at(datetime(2026, 10, 11, 3, 0, tzinfo=dt_timezone.utc), heart_rate=70)
+        self.create_at(datetime(2026, 10, 11, 15, 0, tzinfo=dt_timezone.utc), heart_rate=90)
+        measurement_id = self.create_at(datetime(2026, 10, 11, 16, 0, tzinfo=dt_timezone.utc), heart_rate=100)
+        self.client.patch(f'/api/health/{measurement_id}/', {"heart_rate": 110}, content_type='application/json')
+
+        incremental = self.summaries()
+        self.assertEqual([(day.isoformat(), count) for day, count, _ in incremental],
+                         [('2026-10-10', 1), ('2026-10-11', 2)])
+        self.assertEqual(incremental[1][2], 200)
+
+        rebuild_daily_summaries()
+        self.assertEqual(self.summaries(), incremental)
+
+        self.client.delete(f'/api/health/{measurement_id}/')
+        self.assertEqual(self.summaries()[1][1:], (1, 90))
+
+    def test_writes_outside_the_api_keep_summaries_in_sync(self):
+        moment = datetime(2026, 10, 11, 15, 0, tzinfo=dt_timezone.utc)
+        with mock.patch('django.utils.timezone.now', return_value=moment):
+            measurement = HealthData.objects.create(user=self.user, **MEASUREMENT)
+            HealthData.objects.create(user=self.user, **{**MEASUREMENT, "heart_rate": 60})
+        measurement.heart_rate = 100
+        measurement.save()
+        self.assertEqual(self.summaries()[0][1:], (2, 160))
+
+        HealthData.objects.filter(pk=measurement.pk).delete()
+        self.assertEqual(self.summaries()[0][1:], (1, 60))
+        incremental = self.summaries()
+        rebuild_daily_summaries()
+        self.assertEqual(self.summaries(), incremental)
+
+        # Suppression de l'utilisateur : ses mesures partent en cascade sans recréer de résumé
+        self.user.delete()
+        self.assertFalse(DailyHealthSummary.objects.exists())
+
+    def test_dashboard_queries_do_not_grow_with_history(self):
+        HealthData.objects.bulk_create([HealthData(user=self.user, **MEASUREMENT) for _ in range(50)])
+        rebuild_daily_summaries()
+
+        # Session, utilisateur, 4 dernières mesures, résumés journaliers
+        with self.assertNumQueries(4):
+            response = self.client.get('/api/health/dashboard/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['trends'][-1], min(100, int(97 + (100 - abs(80 - 72)) / 2)))
+
+
+class HealthRunningStatsTest(TestCase):
+    """Statistiques cumulées tenues à jour par l'API, identiques au recalcul depuis l'historique"""
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='patient', email='patient@example.com', password='x')
+        self.client.force_login(self.user)
+
+    def create_at(self, moment, **values):
+        with mock.patch('django.utils.timezone.now', return_value=moment):
+            response = self.client.post('/api/health/', {**MEASUREMENT, **values}, content_type='application/json')
+        self.assertEqual(response.status_code, 201)
+        return response.json()['id']
+
+    def snapshot(self):
+        stats = HealthRunningStats.objects.get(user=self.user)
+        windows = stats.ewm['windows']
+        return stats.count, stats.average('heart_rate'), stats.variance('heart_rate'), {
+            name: (window['weight'], window['mean']['heart_rate'], window['m2']['heart_rate'])
+            for name, window in windows.items()
+        }
+
+    def assertSnapshotEqual(self, first, second):
+        self.assertEqual(first[0], second[0])
+        self.assertAlmostEqual(first[1], second[1])
+        self.assertAlmostEqual(first[2], second[2])
+        self.assertEqual(first[3].keys(), second[3].keys())
+        for name in first[3]:
+            for a, b in zip(first[3][name], second[3][name]):
+                self.assertAlmostEqual(a, b)
+
+    def test_incremental_matches_rebuild(self):
+        start = datetime(2026, 10, 11, 8, 0, tzinfo=dt_timezone.utc)
+        for hours, heart_rate in [(0, 70), (3, 90), (20, 100), (30, 60)]:
+            measurement_id = self.create_at(start + timedelta(hours=hours), heart_rate=heart_rate)
+        self.client.patch(f'/api/health/{measurement_id}/', {"heart_rate": 120}, content_type='application/json')
+        first_id = HealthData.objects.filter(user=self.user).order_by('created_at').first().id
+        self.client.delete(f'/api/health/{first_id}/')
+
+        incremental = self.snapshot()
+        self.assertEqual(incremental[0], 3)
+        self.assertAlmostEqual(incremental[1], (90 + 100 + 120) / 3)
+        rebuild_running_stats()
+        self.assertSnapshotEqual(incremental, self.snapshot())
+
+    def test_writes_outside_the_api_keep_stats_in_sync(self):
+        start = datetime(2026, 10, 11, 8, 0, tzinfo=dt_timezone.utc)
+        measurements = []
+        for hours, heart_rate in [(0, 70), (3, 90), (20, 100)]:
+            with mock.patch('django.utils.timezone.now', return_value=start + timedelta(hours=hours)):
+                measurements.append(HealthData.objects.create(user=self.user, **{**MEASUREMENT, "heart_rate": heart_rate}))
+        measurements[2].heart_rate = 120
+        measurements[2].save()
+        HealthData.objects.filter(pk=measurements[0].pk).delete()
+
+        incremental = self.snapshot()
+        self.assertEqual(incremental[0], 2)
+        self.assertAlmostEqual(incremental[1], (90 + 120) / 2)
+        rebuild_running_stats()
+        self.assertSnapshotEqual(incremental, self.snapshot())
+
+    def test_prediction_reads_one_row(self):
+        HealthData.objects.bulk_create([HealthData(user=self.user, **MEASUREMENT) for _ in range(50)])
+        rebuild_running_stats()
+
+        # Session, utilisateur, statistiques cumulées
+        with self.assertNumQueries(3):
+            response = self.client.get('/api/health/prediction/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['data_count'], 50)
+        self.assertAlmostEqual(response.json()['recent_averages']['24h']['heart_rate']['mean'], 80)
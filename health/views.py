@@ -2,11 +2,13 @@ from rest_framework.viewsets import ModelViewSet
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.decorators import action
 from rest_framework.response import Response
-from django.db.models import Avg
+from django.db import transaction
 from datetime import timedelta
 from django.utils import timezone
-from .models import HealthData
+from .models import DailyHealthSummary, HealthData, HealthRunningStats
+from .running_stats import ewm_summary
 from .serializers import HealthDataSerializer
+from .summaries import user_zone
 
 class HealthDataViewSet(ModelViewSet):
     queryset = HealthData.objects.all()
@@ -16,53 +18,61 @@ class HealthDataViewSet(ModelViewSet):
     def get_queryset(self):
         return HealthData.objects.filter(user=self.request.user)
 
+    # Résumés journaliers et statistiques cumulées mis à jour par les signaux
+    # de health/signals.py, dans la transaction de l'écriture
     def perform_create(self, serializer):
-        serializer.save(user=self.request.user)
+        with transaction.atomic():
+            serializer.save(user=self.request.user)
+
+    def perform_update(self, serializer):
+        with transaction.atomic():
+            serializer.save()
+
+    def perform_destroy(self, instance):
+        with transaction.atomic():
+            instance.delete()
 
     @action(detail=False, methods=['get'])
     def dashboard(self, request):
-        """Endpoint pour récupérer les données du tableau de bord"""
+        """
+        Endpoint pour récupérer les données du tableau de bord.
+        Deux requêtes quel que soit l'historique : les 4 dernières mesures et
+        les 7 derniers résumés journaliers (health.summaries).
+        """
         user = request.user
         
-        # Dernière mesure
-        latest = HealthData.objects.filter(user=user).first()
+        # 4 dernières mesures : historique et valeurs actuelles (la plus récente)
+        recent_measurements = list(HealthData.objects.filter(user=user)[:4])
+        latest = recent_measurements[0] if recent_measurements else None
         
-        # Historique des 7 derniers jours
-        seven_days_ago = timezone.now() - timedelta(days=7)
-        weekly_data = HealthData.objects.filter(
-            user=user, 
-            created_at__gte=seven_days_ago
-        ).order_by('created_at')
+        # Moyennes par jour (fuseau de l'utilisateur) lues dans les résumés journaliers
+        zone = user_zone(user.timezone)
+        today = timezone.now().astimezone(zone).date()
+        days = [today - timedelta(days=6 - i) for i in range(7)]
+        summaries = {
+            summary.day: summary
+            for summary in DailyHealthSummary.objects.filter(user=user, day__gte=days[0], day__lte=today)
+        }
         
         # Calculer les moyennes par jour pour le graphique
         trends = []
-        for i in range(7):
-            day = timezone.now() - timedelta(days=6-i)
-            day_start = day.replace(hour=0, minute=0, second=0, microsecond=0)
-            day_end = day.replace(hour=23, minute=59, second=59, microsecond=999999)
-            
-            day_avg = HealthData.objects.filter(
-                user=user,
-                created_at__range=[day_start, day_end]
-            ).aggregate(
-                avg_heart=Avg('heart_rate'),
-                avg_spo2=Avg('oxygen_level')
-            )
+        for i, day in enumerate(days):
+            summary = summaries.get(day)
+            avg_heart = summary.average('heart_rate') if summary else None
+            avg_spo2 = summary.average('oxygen_level') if summary else None
             
             # Score de santé basé sur les moyennes (0-100)
-            if day_avg['avg_heart'] and day_avg['avg_spo2']:
-                score = min(100, int((day_avg['avg_spo2'] or 95) + (100 - abs((day_avg['avg_heart'] or 72) - 72)) / 2))
+            if avg_heart and avg_spo2:
+                score = min(100, int(avg_spo2 + (100 - abs(avg_heart - 72)) / 2))
             else:
                 score = 75 + i * 2  # Valeur par défaut progressive
             
             trends.append(score)
         
-        # 4 dernières mesures pour l'historique
-        recent_measurements = HealthData.objects.filter(user=user)[:4]
         history = []
         for m in recent_measurements:
             history.append({
-                'date': m.created_at.strftime('%d %b %H:%M'),
+                'date': m.created_at.astimezone(zone).strftime('%d %b %H:%M'),
                 'status': m.get_status_display_fr(),
                 'color': '#10b981' if m.status == 'normal' else '#f59e0b' if m.status == 'attention' else '#ef4444'
             })
@@ -151,23 +161,25 @@ class HealthDataViewSet(ModelViewSet):
 
     @action(detail=False, methods=['get'])
     def prediction(self, request):
-        """Endpoint pour les prédictions IA basées sur les données de santé de l'utilisateur"""
+        """
+        Endpoint pour les prédictions IA basées sur les données de santé de l'utilisateur.
+        Une requête quel que soit l'historique : les moyennes sont lues dans
+        les statistiques cumulées (health.running_stats).
+        """
         user = request.user
         
-        # Récupérer les données de santé de l'utilisateur
-        latest = HealthData.objects.filter(user=user).first()
-        all_data = HealthData.objects.filter(user=user)
-        data_count = all_data.count()
+        stats = HealthRunningStats.objects.filter(user=user).first()
+        data_count = stats.count if stats else 0
         
         # Calculer les moyennes si des données existent
         if data_count > 0:
-            averages = all_data.aggregate(
-                avg_heart=Avg('heart_rate'),
-                avg_spo2=Avg('oxygen_level'),
-                avg_temp=Avg('temperature'),
-                avg_respiratory=Avg('respiratory_rate'),
-                avg_air=Avg('air_quality')
-            )
+            averages = {
+                'avg_heart': stats.average('heart_rate'),
+                'avg_spo2': stats.average('oxygen_level'),
+                'avg_temp': stats.average('temperature'),
+                'avg_respiratory': stats.average('respiratory_rate'),
+                'avg_air': stats.average('air_quality'),
+            }
             
             # Calculer le score de santé (0-10)
             spo2_score = min(10, (averages['avg_spo2'] or 0) / 10) if averages['avg_spo2'] else 0
@@ -284,5 +296,7 @@ class HealthDataViewSet(ModelViewSet):
             'risk_color': risk_color,
             'risk_factors': risk_factors_list,
             'recommendations': recommendations,
-            'data_count': data_count
+            'data_count': data_count,
+            # Moyennes récentes (fenêtres exponentielles de HEALTH_STATS_HALF_LIVES)
+            'recent_averages': ewm_summary(stats) if data_count else {}
         })
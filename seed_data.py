@@ -266,6 +266,20 @@ for patient in patients:
         
         print(f"  ✓ Messages créés entre {patient.username} et {patient.medecin.username}")
 
+# ============================================================
+# AGRÉGATS (les dates created_at ont été réécrites après insertion)
+# ============================================================
+from devices.analytics import rebuild_baselines
+from devices.rollups import rebuild_rollups
+from health.running_stats import rebuild_running_stats
+from health.summaries import rebuild_daily_summaries
+
+rebuild_rollups()
+rebuild_daily_summaries()
+rebuild_running_stats()
+rebuild_baselines()
+print("\n✓ Agrégats capteurs, résumés journaliers, statistiques cumulées et références patients reconstruits")
+
 # ============================================================
 # RÉSUMÉ
 # ============================================================
@@ -0,0 +1,154 @@
+"""
+Vue d'ensemble des patients d'un médecin (User.patients).
+
+Une seule requête pour toute la patientèle : chaque patient est annoté par
+des sous-requêtes corrélées (dernière SensorData et dernière HealthData en
+objets JSON, statut IA, alertes non lues, dernier battement de cœur de ses
+devices, écart à sa référence de devices.analytics) et la liste est triée
+par gravité en SQL (SEVERITY) : statut IA de la dernière lecture, puis
+alertes non lues. Une lecture dont l'analyse IA a échoué (ai_status=-1)
+passe en tête : l'état du patient est inconnu, le médecin doit la voir ;
+les patients sans lecture sont en dernier.
+
+Avec COHORT_CACHE_BACKEND (cache Django partagé entre workers, ex: Redis),
+le résultat est gardé COHORT_CACHE_TTL secondes par médecin. L'ingestion
+d'une lecture d'un patient et les modifications de ses alertes invalident
+l'entrée de son médecin, pour tous les workers. Sans ce réglage, rien n'est
+mis en cache : un cache propre à chaque process (LocMem) ne verrait pas les
+invalidations faites par les autres et servirait une patientèle périmée.
+L'état en ligne des devices est recalculé à chaque réponse.
+"""
+
+from datetime import timedelta, timezone as dt_timezone
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db.models import Case, Count, F, IntegerField, JSONField, OuterRef, Subquery, Value, When
+from django.db.models.functions import Coalesce, JSONObject
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from alerts.models import Alert
+from devices.models import Device, SensorData
+from health.models import HealthData
+from .models import User
+
+SENSOR_FIELDS = ['cov_ppb', 'eco2_ppm', 'heart_rate', 'spo2', 'temperature',
+                 'ai_status', 'ai_status_name', 'ai_confidence', 'measured_at', 'created_at']
+HEALTH_FIELDS = ['heart_rate', 'oxygen_level', 'temperature', 'respiratory_rate', 'air_quality',
+                 'status', 'created_at']
+
+# Rang de tri de la dernière lecture : erreur IA, hypoxie sévère ... sain, aucune lecture
+SEVERITY = Case(
+    When(ai_status=-1, then=Value(4)),
+    When(ai_status__isnull=True, then=Value(-1)),
+    default=F('ai_status'),
+    output_field=IntegerField(),
+)
+
+
+def cohort_cache():
+    """Cache partagé de COHORT_CACHE_BACKEND, None si le cache est désactivé"""
+    alias = getattr(settings, 'COHORT_CACHE_BACKEND', None)
+    return caches[alias] if alias else None
+
+
+def _cache_key(doctor_id):
+    return f"cohort:{doctor_id}"
+
+
+def invalidate_cohort(*doctor_ids):
+    """Retire du cache la patientèle des médecins donnés (None ignorés)"""
+    cache = cohort_cache()
+    keys = [_cache_key(doctor_id) for doctor_id in doctor_ids if doctor_id is not None]
+    if cache is not None and keys:
+        cache.delete_many(keys)
+
+
+def cohort_queryset(doctor_id):
+    """Patients du médecin avec leur dernier état, du plus grave au moins grave (une requête)"""
+    latest_sensor = SensorData.objects.filter(device__user=OuterRef('pk')).order_by('-created_at', '-pk')
+    latest_health = HealthData.objects.filter(user=OuterRef('pk')).order_by('-created_at', '-pk')
+    unread_alerts = (
+        Alert.objects.filter(user=OuterRef('pk'), is_read=False)
+        .order_by().values('user').annotate(n=Count('pk')).values('n')
+    )
+    last_seen = (
+        Device.objects.filter(user=OuterRef('pk'), is_active=True)
+        .order_by(F('last_data_at').desc(nulls_last=True)).values('last_data_at')[:1]
+    )
+    return (
+        User.objects.filter(medecin_id=doctor_id)
+        .annotate(
+            sensor=Subquery(
+                latest_sensor.values(data=JSONObject(**{field: field for field in SENSOR_FIELDS}))[:1],
+                output_field=JSONField(),
+            ),
+            health=Subquery(
+                latest_health.values(data=JSONObject(**{field: field for field in HEALTH_FIELDS}))[:1],
+                output_field=JSONField(),
+            ),
+            ai_status=Subquery(latest_sensor.values('ai_status')[:1]),
+            unread_alerts=Coalesce(Subquery(unread_alerts), Value(0), output_field=IntegerField()),
+            last_seen=Subquery(last_seen),
+            deviations=F('baseline__deviations'),
+        )
+        .order_by(SEVERITY.desc(), F('unread_alerts').desc(), 'username')
+        .values('id', 'username', 'email', 'sensor', 'health', 'ai_status', 'unread_alerts', 'last_seen', 'deviations')
+    )
+
+
+def _moment(value):
+    """Date lue dans un objet JSON (texte ISO sur PostgreSQL, texte UTC sans fuseau sur SQLite)"""
+    if not value:
+        return None
+    moment = parse_datetime(value)
+    if moment is not None and timezone.is_naive(moment):
+        moment = timezone.make_aware(moment, dt_timezone.utc)
+    return moment.isoformat() if moment else value
+
+
+def _snapshot(data, fields):
+    if not data:
+        return None
+    return {field: _moment(data.get(field)) if field.endswith('_at') else data.get(field) for field in fields}
+
+
+def load_cohort(doctor_id):
+    """Lignes de la patientèle, depuis le cache ou la base"""
+    cache = cohort_cache()
+    rows = cache.get(_cache_key(doctor_id)) if cache is not None else None
+    if rows is None:
+        rows = [
+            {
+                'patient': {'id': row['id'], 'username': row['username'], 'email': row['email']},
+                'ai_status': row['ai_status'],
+                'sensor': _snapshot(row['sensor'], SENSOR_FIELDS),
+                'health': _snapshot(row['health'], HEALTH_FIELDS),
+                'unread_alerts': row['unread_alerts'],
+                'last_seen': row['last_seen'],
+                'anomaly': {
+                    'max_abs_z': row['deviations'].get('max_abs_z'),
+                    'at': row['deviations'].get('at'),
+                } if row['deviations'] else None,
+            }
+            for row in cohort_queryset(doctor_id)
+        ]
+        if cache is not None:
+            cache.set(_cache_key(doctor_id), rows, getattr(settings, 'COHORT_CACHE_TTL', 30))
+    return rows
+
+
+def cohort(doctor_id, now=None):
+    """Patientèle avec l'état en ligne des devices à l'instant now"""
+    online_since = (now or timezone.now()) - timedelta(seconds=getattr(settings, 'DEVICE_ONLINE_WINDOW', 300))
+    return [
+        {
+            **{key: value for key, value in row.items() if key != 'last_seen'},
+            'device': {
+                'last_seen': row['last_seen'].isoformat() if row['last_seen'] else None,
+                'online': bool(row['last_seen'] and row['last_seen'] >= online_since),
+            },
+        }
+        for row in load_cohort(doctor_id)
+    ]
@@ -7,7 +7,11 @@ from django.core.management.base import BaseCommand
 from django.utils import timezone
 from users.models import User
 from devices.models import Device, SensorData
+from devices.analytics import rebuild_baselines
+from devices.rollups import rebuild_rollups
 from health.models import HealthData
+from health.running_stats import rebuild_running_stats
+from health.summaries import rebuild_daily_summaries
 from alerts.models import Alert
 from chat.models import Message
 from rest_framework.authtoken.models import Token
@@ -241,6 +245,13 @@ class Command(BaseCommand):
                 
                 self.stdout.write(f"  ✓ Messages créés pour {patient.username}")
 
+        # Agrégats : les dates created_at ont été réécrites après insertion
+        rebuild_rollups()
+        rebuild_daily_summaries()
+        rebuild_running_stats()
+        rebuild_baselines()
+        self.stdout.write("\n✓ Agrégats capteurs, résumés journaliers, statistiques cumulées et références patients reconstruits")
+
         # RÉSUMÉ
         self.stdout.write("\n" + "=" * 60)
         self.stdout.write(self.style.SUCCESS("SEEDING TERMINÉ AVEC SUCCÈS!"))
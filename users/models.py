@@ -21,6 +21,9 @@ class User(AbstractUser):
         limit_choices_to={'role': 'doctor'}
     )
 
+    # Fuseau IANA de l'utilisateur (ex: Africa/Abidjan) : découpage des journées du tableau de bord
+    timezone = models.CharField(max_length=64, default='UTC')
+
     USERNAME_FIELD = 'email'
     REQUIRED_FIELDS = ['username']
 
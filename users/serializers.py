@@ -1,13 +1,22 @@
 from rest_framework import serializers
 from django.contrib.auth import authenticate
 from .models import User
+from zoneinfo import available_timezones
+
+def validate_timezone_name(value):
+    """Nom de fuseau IANA (ex: Africa/Abidjan)"""
+    if value not in available_timezones():
+        raise serializers.ValidationError("Fuseau horaire inconnu")
+    return value
+
 
 class RegisterSerializer(serializers.ModelSerializer):
     password = serializers.CharField(write_only=True)
 
     class Meta:
         model = User
-        fields = ('email', 'username', 'password', 'role')  # <--- Ajout role
+        fields = ('email', 'username', 'password', 'role', 'timezone')  # <--- Ajout role
+        extra_kwargs = {'timezone': {'required': False}}
 
     def validate_email(self, value):
         if User.objects.filter(email=value).exists():
@@ -19,12 +28,16 @@ class RegisterSerializer(serializers.ModelSerializer):
             raise serializers.ValidationError("Un utilisateur avec ce nom existe déjà")
         return value
 
+    def validate_timezone(self, value):
+        return validate_timezone_name(value)
+
     def create(self, validated_data):
         user = User.objects.create_user(
             email=validated_data['email'],
             username=validated_data['username'],
             password=validated_data['password'],
-            role=validated_data.get('role', 'patient')  # Défaut patient
+            role=validated_data.get('role', 'patient'),  # Défaut patient
+            timezone=validated_data.get('timezone', 'UTC')
         )
         return user
 
@@ -42,3 +55,7 @@ class LoginSerializer(serializers.Serializer):
         if not user:
             raise serializers.ValidationError("Identifiants incorrects")
         return user
+
+
+class TimezoneSerializer(serializers.Serializer):
+    timezone = serializers.CharField(validators=[validate_timezone_name])
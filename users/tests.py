@@ -1,3 +1,124 @@
-from django.test import TestCase
+from django.test import TestCase, override_settings
 
-# Create your tests here.
+from alerts.models import Alert
+from devices.ai_service.medical_classifier import _error_result
+from devices.auth_cache import device_key_cache
+from devices.ingestion import ingest_readings
+from devices.models import Device
+from .cohort import cohort_cache
+from .models import User
+
+READING = {
+    "cov_ppb": 400,
+    "eco2_ppm": 420,
+    "heart_rate": 75,
+    "spo2": 98,
+    "temperature": 36.8,
+}
+
+# Lecture classée en hypoxie sévère par le modèle
+HYPOXIA_READING = {
+    "cov_ppb": 300,
+    "eco2_ppm": 1500,
+    "heart_rate": 130,
+    "spo2": 85,
+    "temperature": 39.0,
+}
+
+# Cache partagé entre workers (Redis en production)
+SHARED_CACHES = {
+    'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'default'},
+    'cohort': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'cohort'},
+}
+
+
+@override_settings(CACHES=SHARED_CACHES, COHORT_CACHE_BACKEND='cohort')
+class DoctorCohortTest(TestCase):
+    """Patientèle d'un médecin : une requête, triée par gravité, cache invalidé à l'ingestion"""
+
+    def setUp(self):
+        device_key_cache.clear()
+        cohort_cache().clear()
+        self.doctor = User.objects.create_user(username='doc', email='doc@example.com', password='x', role='doctor')
+        self.patients = []
+        for index in range(3):
+            patient = User.objects.create_user(username=f'patient{index}', email=f'p{index}@example.com',
+                                               password='x', medecin=self.doctor)
+            Device.objects.create(user=patient, device_key=f'{index}' * 64)
+            self.patients.append(patient)
+        self.client.force_login(self.doctor)
+
+    def post_reading(self, patient, reading):
+        response = self.client.post(
+            '/api/devices/data/',
+            {"device_key": patient.devices.get().device_key, **reading},
+            content_type='application/json'
+        )
+        self.assertEqual(response.status_code, 201)
+        return response.json()['ai_result']['status']
+
+    def test_one_query_sorted_by_severity(self):
+        for patient in self.patients:
+            self.post_reading(patient, READING)
+        Alert.objects.create(user=self.patients[0], title="Test", message="Test")
+        cohort_cache().clear()
+
+        # Session, utilisateur, patientèle
+        with self.assertNumQueries(3):
+            response = self.client.get('/api/users/cohort/')
+        self.assertEqual(response.status_code, 200)
+        patients = response.json()['patients']
+        self.assertEqual(response.json()['count'], 3)
+        self.assertEqual(patients[0]['patient']['username'], 'patient0')
+        self.assertEqual(patients[0]['unread_alerts'], 1)
+        self.assertEqual(patients[1]['sensor']['heart_rate'], 75)
+        self.assertEqual(patients[1]['health']['oxygen_level'], 98)
+        self.assertTrue(patients[1]['device']['online'])
+
+        # Servie par le cache : plus de requête sur la patientèle
+        with self.assertNumQueries(2):
+            self.client.get('/api/users/cohort/')
+
+    def test_ingestion_invalidates_cache(self):
+        for patient in self.patients:
+            self.post_reading(patient, READING)
+        self.client.get('/api/users/cohort/')
+
+        with self.captureOnCommitCallbacks(execute=True):
+            status = self.post_reading(self.patients[2], HYPOXIA_READING)
+        self.assertGreater(status, 0)
+
+        patients = self.client.get('/api/users/cohort/').json()['patients']
+        self.assertEqual(patients[0]['patient']['username'], 'patient2')
+        self.assertEqual(patients[0]['ai_status'], status)
+
+    @override_settings(COHORT_CACHE_BACKEND=None)
+    def test_without_shared_cache_every_request_reads_the_database(self):
+        self.post_reading(self.patients[0], READING)
+        for _ in range(2):
+            with self.assertNumQueries(3):
+                self.client.get('/api/users/cohort/')
+
+        # Sans invalidation (pas de on_commit) : la nouvelle lecture est tout de même servie
+        status = self.post_reading(self.patients[1], HYPOXIA_READING)
+        patients = self.client.get('/api/users/cohort/').json()['patients']
+        self.assertEqual(patients[0]['patient']['username'], 'patient1')
+        self.assertEqual(patients[0]['ai_status'], status)
+
+    def test_ai_errors_come_first(self):
+        self.post_reading(self.patients[0], READING)
+        self.post_reading(self.patients[1], HYPOXIA_READING)
+        device = device_key_cache.get(self.patients[2].devices.get().device_key)
+        ingest_readings(device, [list(READING.values())], ai_results=[_error_result("modèle indisponible")])
+        patient = User.objects.create_user(username='patient3', email='p3@example.com', password='x',
+                                           medecin=self.doctor)
+        cohort_cache().clear()
+
+        patients = self.client.get('/api/users/cohort/').json()['patients']
+        self.assertEqual([row['patient']['username'] for row in patients],
+                         ['patient2', 'patient1', 'patient0', patient.username])
+        self.assertEqual(patients[0]['ai_status'], -1)
+
+    def test_patients_are_refused(self):
+        self.client.force_login(self.patients[0])
+        self.assertEqual(self.client.get('/api/users/cohort/').status_code, 403)
@@ -1,5 +1,5 @@
 from django.urls import path
-from .views import RegisterView, LoginView, doctor_list, patient_list, contacts_list, assign_doctor
+from .views import RegisterView, LoginView, doctor_list, patient_list, contacts_list, assign_doctor, set_timezone, doctor_cohort
 
 urlpatterns = [
     path('register/', RegisterView.as_view(), name='register'),
@@ -8,4 +8,6 @@ urlpatterns = [
     path('patients/', patient_list, name='patient-list'),
     path('contacts/', contacts_list, name='contacts-list'),
     path('assign-doctor/', assign_doctor, name='assign-doctor'),
+    path('timezone/', set_timezone, name='set-timezone'),
+    path('cohort/', doctor_cohort, name='doctor-cohort'),
 ]
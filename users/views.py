@@ -3,9 +3,13 @@ from rest_framework.response import Response
 from rest_framework import status
 from rest_framework.authtoken.models import Token
 from django.contrib.auth import login
-from rest_framework.decorators import api_view
-from .serializers import RegisterSerializer, LoginSerializer
+from rest_framework.decorators import api_view, permission_classes
+from rest_framework.permissions import IsAuthenticated
+from django.db import transaction
+from health.summaries import rebuild_daily_summaries
+from .serializers import RegisterSerializer, LoginSerializer, TimezoneSerializer
 from .models import User
+from .cohort import cohort, invalidate_cohort
 
 # Inscription
 class RegisterView(APIView):
@@ -19,7 +23,8 @@ class RegisterView(APIView):
                     "id": user.id,
                     "username": user.username,
                     "email": user.email,
-                    "role": user.role
+                    "role": user.role,
+                    "timezone": user.timezone
                 },
                 "token": token.key
             }, status=status.HTTP_201_CREATED)
@@ -38,7 +43,8 @@ class LoginView(APIView):
                     "id": user.id,
                     "username": user.username,
                     "email": user.email,
-                    "role": user.role
+                    "role": user.role,
+                    "timezone": user.timezone
                 },
                 "token": token.key
             }, status=status.HTTP_200_OK)
@@ -133,8 +139,10 @@ def assign_doctor(request):
     except User.DoesNotExist:
         return Response({"error": "Docteur non trouvé"}, status=status.HTTP_404_NOT_FOUND)
     
+    previous_doctor_id = patient.medecin_id
     patient.medecin = doctor
     patient.save()
+    invalidate_cohort(previous_doctor_id, doctor.id)
     
     return Response({
         "success": True,
@@ -142,3 +150,40 @@ def assign_doctor(request):
         "patient": {"id": patient.id, "email": patient.email, "username": patient.username},
         "doctor": {"id": doctor.id, "email": doctor.email, "username": doctor.username}
     }, status=status.HTTP_200_OK)
+
+# Fuseau horaire de l'utilisateur connecté
+@api_view(['PUT', 'PATCH'])
+@permission_classes([IsAuthenticated])
+def set_timezone(request):
+    """
+    Change le fuseau horaire de l'utilisateur (découpage des journées du
+    tableau de bord). Les résumés journaliers sont recalculés.
+    Body: {"timezone": "Africa/Abidjan"}
+    """
+    serializer = TimezoneSerializer(data=request.data)
+    if not serializer.is_valid():
+        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+    
+    user = request.user
+    with transaction.atomic():
+        user.timezone = serializer.validated_data['timezone']
+        user.save(update_fields=['timezone'])
+        rebuild_daily_summaries(user_ids=[user.id])
+    
+    return Response({"timezone": user.timezone}, status=status.HTTP_200_OK)
+
+
+# Patientèle du médecin connecté
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def doctor_cohort(request):
+    """
+    Dernier état de tous les patients du médecin connecté, du plus grave au
+    moins grave : dernière lecture capteur et statut IA, dernière mesure de
+    santé, alertes non lues, état en ligne des devices (users.cohort).
+    """
+    if request.user.role != 'doctor':
+        return Response({"error": "Réservé aux médecins"}, status=status.HTTP_403_FORBIDDEN)
+    
+    patients = cohort(request.user.id)
+    return Response({"count": len(patients), "patients": patients}, status=status.HTTP_200_OK)